@@ -0,0 +1,181 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS transcripciones (
+    id INTEGER PRIMARY KEY,
+    clave TEXT NOT NULL UNIQUE,
+    fuente TEXT NOT NULL,
+    idioma TEXT,
+    tipo TEXT,
+    creado REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transcripciones_idioma ON transcripciones(idioma);
+
+CREATE TABLE IF NOT EXISTS segmentos (
+    id INTEGER PRIMARY KEY,
+    transcripcion_id INTEGER NOT NULL REFERENCES transcripciones(id) ON DELETE CASCADE,
+    orden INTEGER NOT NULL,
+    etiqueta TEXT,
+    hablante TEXT,
+    inicio INTEGER,
+    fin INTEGER,
+    texto TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_segmentos_transcripcion ON segmentos(transcripcion_id);
+CREATE INDEX IF NOT EXISTS idx_segmentos_hablante ON segmentos(hablante);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS segmentos_fts USING fts5(
+    texto, content='segmentos', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS segmentos_ai AFTER INSERT ON segmentos BEGIN
+    INSERT INTO segmentos_fts(rowid, texto) VALUES (new.id, new.texto);
+END;
+CREATE TRIGGER IF NOT EXISTS segmentos_ad AFTER DELETE ON segmentos BEGIN
+    INSERT INTO segmentos_fts(segmentos_fts, rowid, texto) VALUES ('delete', old.id, old.texto);
+END;
+"""
+
+
+def consulta_frase(texto: str) -> str:
+    """
+    Convierte texto libre en una consulta FTS5 de frase exacta (sin operadores).
+    """
+    return '"' + texto.replace('"', '""') + '"'
+
+
+class AlmacenTranscripciones:
+    """
+    Índice SQLite (FTS5) de transcripciones: segmentos con hablante, tiempos e idioma.
+
+    Usa una conexión por hilo y modo WAL, así que lo pueden compartir los hilos
+    de gunicorn y los procesos de la CLI al mismo tiempo.
+    """
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._local = threading.local()
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        with self._conexion() as con:
+            con.executescript(_ESQUEMA)
+
+    def _conexion(self) -> sqlite3.Connection:
+        con = getattr(self._local, "conexion", None)
+        # Una conexión heredada de un fork (p. ej. gunicorn --preload) no se puede usar en el hijo
+        if con is None or self._local.pid != os.getpid():
+            con = sqlite3.connect(self.ruta, timeout=30)
+            con.row_factory = sqlite3.Row
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            con.execute("PRAGMA foreign_keys=ON")
+            self._local.conexion = con
+            self._local.pid = os.getpid()
+        return con
+
+    def guardar(
+        self,
+        clave: str,
+        fuente: str,
+        transcripcion_obj,
+        tipo: str | None = None,
+        mapa_nombres: dict | None = None,
+        texto: str | None = None,
+    ) -> int:
+        """
+        Indexa (o reemplaza, si la clave ya existe) una transcripción.
+        Sin utterances, el texto completo se guarda como un único segmento sin hablante.
+        """
+        idioma = getattr(transcripcion_obj, "language_code", None)
+        utterances = getattr(transcripcion_obj, "utterances", None) or []
+        mapa_nombres = mapa_nombres or {}
+
+        def _filas(transcripcion_id: int):
+            if utterances:
+                for orden, u in enumerate(utterances):
+                    etiqueta = str(u.speaker)
+                    yield (transcripcion_id, orden, etiqueta, mapa_nombres.get(etiqueta, f"Speaker {etiqueta}"),
+                           u.start, u.end, u.text)
+            else:
+                contenido = texto if texto is not None else (getattr(transcripcion_obj, "text", None) or "")
+                yield (transcripcion_id, 0, None, None, None, None, contenido)
+
+        con = self._conexion()
+        with con:
+            con.execute("DELETE FROM transcripciones WHERE clave = ?", (clave,))
+            cursor = con.execute(
+                "INSERT INTO transcripciones (clave, fuente, idioma, tipo, creado) VALUES (?, ?, ?, ?, ?)",
+                (clave, fuente, str(idioma) if idioma is not None else None, tipo, time.time()),
+            )
+            transcripcion_id = cursor.lastrowid
+            con.executemany(
+                "INSERT INTO segmentos (transcripcion_id, orden, etiqueta, hablante, inicio, fin, texto) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                _filas(transcripcion_id),
+            )
+        return transcripcion_id
+
+    def buscar(
+        self,
+        consulta: str,
+        hablante: str | None = None,
+        idioma: str | None = None,
+        limite: int = 50,
+        por_relevancia: bool = False,
+    ) -> list[dict]:
+        """
+        Busca una frase en los segmentos; filtra opcionalmente por hablante
+        (nombre asignado o etiqueta) e idioma.
+
+        Por defecto devuelve primero lo más reciente: FTS5 recorre los rowid en
+        orden y se detiene al llegar al límite. Con por_relevancia=True ordena
+        por bm25, lo que obliga a puntuar todas las coincidencias.
+        """
+        condiciones = ["segmentos_fts MATCH ?"]
+        parametros: list = [consulta_frase(consulta)]
+        if hablante:
+            condiciones.append("(s.hablante = ? OR s.etiqueta = ?)")
+            parametros += [hablante, hablante]
+        if idioma:
+            condiciones.append("t.idioma = ?")
+            parametros.append(idioma)
+        parametros.append(limite)
+
+        filas = self._conexion().execute(
+            "SELECT t.fuente, t.idioma, t.tipo, s.hablante, s.etiqueta, s.inicio, s.fin, "
+            "snippet(segmentos_fts, 0, '[', ']', '…', 16) AS fragmento "
+            "FROM segmentos_fts "
+            "JOIN segmentos s ON s.id = segmentos_fts.rowid "
+            "JOIN transcripciones t ON t.id = s.transcripcion_id "
+            f"WHERE {' AND '.join(condiciones)} "
+            f"ORDER BY {'segmentos_fts.rank' if por_relevancia else 'segmentos_fts.rowid DESC'} LIMIT ?",
+            parametros,
+        ).fetchall()
+        return [dict(fila) for fila in filas]
+
+
+_almacen_por_defecto: AlmacenTranscripciones | None = None
+_candado_por_defecto = threading.Lock()
+
+
+def almacen_por_defecto() -> AlmacenTranscripciones | None:
+    """
+    Índice compartido por la CLI y la app web, configurado por variables de entorno.
+    Retorna None si está desactivado con INDICE_TRANSCRIPCIONES=0.
+    """
+    global _almacen_por_defecto
+    if os.getenv("INDICE_TRANSCRIPCIONES", "1") == "0":
+        return None
+    with _candado_por_defecto:
+        if _almacen_por_defecto is None:
+            ruta = os.getenv(
+                "RUTA_INDICE_TRANSCRIPCIONES",
+                os.path.join(os.path.expanduser("~"), ".cache", "transcriptor", "indice.sqlite3"),
+            )
+            _almacen_por_defecto = AlmacenTranscripciones(ruta)
+        return _almacen_por_defecto
@@ -0,0 +1,222 @@
+"""
+Analítica de hablantes sobre los utterances de una transcripción.
+
+Los utterances se pasan una vez a columnas (inicio, fin, hablante y palabras
+como arreglos de NumPy) y todas las métricas salen de operaciones vectorizadas
+sobre esas columnas: tiempo de habla, palabras, turnos, solapamientos,
+interrupciones y silencios. El resultado es un dict de tipos nativos (se
+guarda tal cual en los trabajos y en el estado compartido).
+
+Definiciones (tiempos en ms):
+- Turno: utterances seguidos del mismo hablante; dura desde el inicio del
+  primero hasta el fin del último.
+- Solapamiento: un hablante empieza antes de que termine otro. "Otro" es
+  quien tiene el fin más tardío hasta ese momento (no el utterance anterior:
+  tras un "ajá" ajeno, quien retoma su propio turno no se solapa consigo mismo).
+- Interrupción: un solapamiento en el que quien entra sigue hablando después
+  de que el otro termine (un "ajá" dentro del turno ajeno no cuenta); se le
+  atribuye a quien tenía la palabra.
+- Silencio: hueco entre el fin de todo lo anterior y el siguiente utterance;
+  los de UMBRAL_SILENCIO_MS o más se cuentan aparte.
+"""
+import csv
+import os
+import threading
+
+from exportacion import nombre_hablante
+
+
+UMBRAL_SILENCIO_MS = int(os.getenv("UMBRAL_SILENCIO_MS", "2000"))
+
+# Columnas del CSV de resumen: una fila por fuente y hablante
+COLUMNAS_CSV = (
+    "fuente", "etiqueta", "hablante", "tiempo_habla_ms", "porcentaje_habla", "palabras",
+    "palabras_por_minuto", "turnos", "turno_medio_ms", "turno_max_ms", "interrupciones",
+    "interrumpido", "solapamiento_ms", "silencios_largos", "silencio_total_ms", "silencio_max_ms",
+)
+
+
+def columnas(utterances) -> dict:
+    """
+    Convierte los utterances en arreglos ordenados por inicio: "inicio", "fin",
+    "palabras" y "hablante" (índice en "etiquetas", ordenadas alfabéticamente).
+    """
+    import numpy as np
+
+    cantidad = len(utterances)
+    inicio = np.fromiter((u.start for u in utterances), dtype=np.int64, count=cantidad)
+    fin = np.fromiter((u.end for u in utterances), dtype=np.int64, count=cantidad)
+    # Sin palabras con marcas de tiempo, se cuentan las del texto
+    palabras = np.fromiter(
+        (len(getattr(u, "words", None) or ()) or len((u.text or "").split()) for u in utterances),
+        dtype=np.int64, count=cantidad,
+    )
+    codigos: dict[str, int] = {}
+    hablante = np.fromiter(
+        (codigos.setdefault(str(u.speaker), len(codigos)) for u in utterances), dtype=np.int64, count=cantidad,
+    )
+    etiquetas = sorted(codigos)
+    # Códigos en orden de aparición -> posición de la etiqueta en orden alfabético
+    posicion = np.empty(len(codigos), dtype=np.int64)
+    posicion[[codigos[e] for e in etiquetas]] = np.arange(len(etiquetas))
+    orden = np.argsort(inicio, kind="stable")
+    return {
+        "etiquetas": etiquetas,
+        "hablante": posicion[hablante[orden]],
+        "inicio": inicio[orden],
+        "fin": fin[orden],
+        "palabras": palabras[orden],
+    }
+
+
+def analizar(utterances, mapa_nombres: dict | None = None, umbral_silencio_ms: int = UMBRAL_SILENCIO_MS) -> dict | None:
+    """
+    Calcula las métricas por hablante y del conjunto. Retorna None sin utterances.
+    """
+    if not utterances:
+        return None
+    import numpy as np
+
+    datos = columnas(utterances)
+    etiquetas = datos["etiquetas"]
+    hablante, inicio, fin = datos["hablante"], datos["inicio"], datos["fin"]
+    n = len(etiquetas)
+    duracion = np.maximum(fin - inicio, 0)
+
+    tiempo = np.bincount(hablante, weights=duracion, minlength=n)
+    palabras = np.bincount(hablante, weights=datos["palabras"], minlength=n)
+
+    # Turnos: cortes donde cambia el hablante; cada turno va de su primer inicio a su último fin
+    cambia = hablante[1:] != hablante[:-1]
+    cortes = np.flatnonzero(np.concatenate(([True], cambia)))
+    largo_turno = np.maximum(np.maximum.reduceat(fin, cortes) - inicio[cortes], 0)
+    hablante_turno = hablante[cortes]
+    turnos = np.bincount(hablante_turno, minlength=n)
+    suma_turnos = np.bincount(hablante_turno, weights=largo_turno, minlength=n)
+    turno_max = np.zeros(n, dtype=np.int64)
+    np.maximum.at(turno_max, hablante_turno, largo_turno)
+
+    # Cada utterance contra el fin más tardío de todo lo anterior: hueco > 0 es
+    # silencio y < 0 solapamiento. El dueño de ese fin es el utterance que lo
+    # fijó; solapes e interrupciones se cuentan contra su hablante
+    fin_acumulado = np.maximum.accumulate(fin)
+    fin_previo = fin_acumulado[:-1]
+    fija_fin = np.concatenate(([True], fin[1:] > fin_previo))
+    dueno = np.maximum.accumulate(np.where(fija_fin, np.arange(len(fin)), 0))[:-1]
+    hablante_dueno = hablante[dueno]
+    otro_hablante = hablante[1:] != hablante_dueno
+    hueco = inicio[1:] - fin_previo
+    solape = np.where(otro_hablante, np.maximum(np.minimum(fin[1:], fin_previo) - inicio[1:], 0), 0)
+    interrumpe = otro_hablante & (hueco < 0) & (fin[1:] > fin_previo)
+    interrupciones = np.bincount(hablante[1:][interrumpe], minlength=n)
+    interrumpido = np.bincount(hablante_dueno[interrumpe], minlength=n)
+    solapamiento = np.bincount(hablante[1:], weights=solape, minlength=n)
+    silencios = hueco[hueco > 0]
+
+    total_habla = tiempo.sum()
+    porcentaje = tiempo / total_habla * 100 if total_habla else np.zeros(n)
+    minutos = tiempo / 60000
+    por_minuto = np.divide(palabras, minutos, out=np.zeros(n), where=minutos > 0)
+    turno_medio = np.divide(suma_turnos, turnos, out=np.zeros(n), where=turnos > 0)
+
+    return {
+        "hablantes": [
+            {
+                "etiqueta": etiqueta,
+                "nombre": nombre_hablante(etiqueta, mapa_nombres),
+                "tiempo_habla_ms": int(tiempo[i]),
+                "porcentaje_habla": round(float(porcentaje[i]), 1),
+                "palabras": int(palabras[i]),
+                "palabras_por_minuto": round(float(por_minuto[i]), 1),
+                "turnos": int(turnos[i]),
+                "turno_medio_ms": int(turno_medio[i]),
+                "turno_max_ms": int(turno_max[i]),
+                "interrupciones": int(interrupciones[i]),
+                "interrumpido": int(interrumpido[i]),
+                "solapamiento_ms": int(solapamiento[i]),
+            }
+            for i, etiqueta in enumerate(etiquetas)
+        ],
+        "turnos": int(len(cortes)),
+        "solapamientos": int(np.count_nonzero(solape)),
+        "solapamiento_ms": int(solape.sum()),
+        "interrupciones": int(np.count_nonzero(interrumpe)),
+        "silencio_total_ms": int(silencios.sum()),
+        "silencio_medio_ms": int(silencios.sum() / len(silencios)) if len(silencios) else 0,
+        "silencio_max_ms": int(silencios.max()) if len(silencios) else 0,
+        "silencios_largos": int(np.count_nonzero(silencios >= umbral_silencio_ms)),
+        "umbral_silencio_ms": umbral_silencio_ms,
+    }
+
+
+def formatear_ms(ms: int) -> str:
+    segundos = int(ms) // 1000
+    if segundos >= 3600:
+        return f"{segundos // 3600}:{segundos % 3600 // 60:02d}:{segundos % 60:02d}"
+    return f"{segundos // 60}:{segundos % 60:02d}"
+
+
+def lineas_tabla(analisis: dict) -> list[str]:
+    """
+    Tabla de texto con una fila por hablante y una línea de totales.
+    """
+    ancho = max(8, *(len(h["nombre"]) for h in analisis["hablantes"]))
+    lineas = [
+        f"{'hablante':<{ancho}} {'habla':>8} {'%':>6} {'palabras':>8} {'ppm':>6} {'turnos':>6} "
+        f"{'medio':>6} {'máx':>7} {'interr.':>7} {'solape':>7}"
+    ]
+    for h in analisis["hablantes"]:
+        lineas.append(
+            f"{h['nombre']:<{ancho}} {formatear_ms(h['tiempo_habla_ms']):>8} {h['porcentaje_habla']:>6.1f} "
+            f"{h['palabras']:>8} {h['palabras_por_minuto']:>6.0f} {h['turnos']:>6} "
+            f"{h['turno_medio_ms'] / 1000:>5.1f}s {h['turno_max_ms'] / 1000:>6.1f}s "
+            f"{h['interrupciones']:>7} {h['solapamiento_ms'] / 1000:>6.1f}s"
+        )
+    lineas.append(
+        f"Turnos: {analisis['turnos']}  Solapamientos: {analisis['solapamientos']} "
+        f"({analisis['solapamiento_ms'] / 1000:.1f} s)  Interrupciones: {analisis['interrupciones']}"
+    )
+    lineas.append(
+        f"Silencios: {formatear_ms(analisis['silencio_total_ms'])} en total, máximo "
+        f"{analisis['silencio_max_ms'] / 1000:.1f} s, {analisis['silencios_largos']} de "
+        f"{analisis['umbral_silencio_ms'] / 1000:g} s o más"
+    )
+    return lineas
+
+
+def filas_csv(fuente: str, analisis: dict):
+    """
+    Genera una fila de COLUMNAS_CSV por hablante (los silencios se repiten en cada una).
+    """
+    for h in analisis["hablantes"]:
+        yield (
+            fuente, h["etiqueta"], h["nombre"], h["tiempo_habla_ms"], h["porcentaje_habla"], h["palabras"],
+            h["palabras_por_minuto"], h["turnos"], h["turno_medio_ms"], h["turno_max_ms"], h["interrupciones"],
+            h["interrumpido"], h["solapamiento_ms"], analisis["silencios_largos"], analisis["silencio_total_ms"],
+            analisis["silencio_max_ms"],
+        )
+
+
+class ResumenCsv:
+    """
+    CSV de analítica de un lote. Cada fuente se escribe (y se vuelca a disco) al
+    terminar, así un lote interrumpido conserva lo ya analizado. Seguro entre hilos.
+    """
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._archivo = open(ruta, "w", encoding="utf-8", newline="")
+        self._escritor = csv.writer(self._archivo)
+        self._escritor.writerow(COLUMNAS_CSV)
+        self._candado = threading.Lock()
+
+    def agregar(self, fuente: str, analisis: dict | None) -> None:
+        if not analisis:
+            return
+        with self._candado:
+            self._escritor.writerows(filas_csv(fuente, analisis))
+            self._archivo.flush()
+
+    def cerrar(self) -> None:
+        with self._candado:
+            self._archivo.close()
@@ -1,105 +1,731 @@
+import functools
+import hashlib
+import hmac
+import itertools
+import json
 import os
+import secrets
+import shutil
 import tempfile
-from flask import Flask, request, render_template, redirect, url_for, send_from_directory, flash
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from flask import Flask, Response, request, render_template, redirect, url_for, send_from_directory, flash, jsonify, session, make_response, stream_template
+from markupsafe import Markup
+from werkzeug.utils import secure_filename
 
 # Reuse logic from transcribe.py
 import transcribe as trans
+import metricas
+import catalogo_idiomas
+import motores
+import planificador as planificador_llamadas
 
 
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "dev-secret")
 
+# Tope de tamaño para cualquier subida; también limita lo que Werkzeug vuelca a disco
+LIMITE_SUBIDA_BYTES = int(os.environ.get("MAX_TAMANO_SUBIDA_MB", "2048")) * 1024 * 1024
+app.config["MAX_CONTENT_LENGTH"] = LIMITE_SUBIDA_BYTES
+
+# Líneas que se envían en la página de resultado; el resto se pide por partes
+LINEAS_POR_PAGINA = 500
+MAX_LINEAS_POR_PAGINA = 5000
+
+# Trabajos, avisos, métricas y sesiones en vivo son visibles desde todos los
+# workers de gunicorn a través de estado_compartido.estado_por_defecto() (None
+# con ESTADO_COMPARTIDO=0). La base, el pool de trabajos (trabajos.gestor_por_defecto)
+# y las sesiones en vivo se crean en el primer uso, ya dentro de cada worker; sus
+# módulos (como el índice, las exportaciones y la analítica) se importan ahí mismo,
+# al estilo de clientes.sdk(), para que importar la app sea rápido.
+SEGUNDOS_PUBLICACION_METRICAS = float(os.environ.get("SEGUNDOS_PUBLICACION_METRICAS", "5"))
+
+# Límite de ritmo y cola de admisión compartidos con las llamadas al proveedor
+planificador = planificador_llamadas.planificador_por_defecto()
+
+# Motor de MOTOR_TRANSCRIPCION; se resuelve al arrancar para fallar pronto si no está disponible
+motor_transcripcion = motores.motor_por_defecto()
+
+# Cada cuánto se envía un comentario por SSE para que proxies y navegador no corten la conexión
+SEGUNDOS_LATIDO_SSE = 15
+
+# Con una URL pública, AssemblyAI avisa por webhook al terminar y ningún hilo
+# queda esperando; sin ella, el pool espera a que cada transcripción termine.
+URL_PUBLICA_WEBHOOK = os.environ.get("URL_PUBLICA_WEBHOOK", "").rstrip("/")
+CABECERA_WEBHOOK = "X-Transcriptor-Firma"
+_secreto_webhook: str | None = os.environ.get("SECRETO_WEBHOOK") or None
+_candado_secreto = threading.Lock()
+
+
+# Página de inicio ya renderizada: (versión del catálogo, html)
+_pagina_inicio: tuple[str, str] | None = None
+
+
+@app.before_request
+def _publicar_metricas_compartidas():
+    import estado_compartido
+
+    # Cada worker publica sus métricas en segundo plano para el /metrics de los demás
+    estado = estado_compartido.estado_por_defecto()
+    if estado is not None:
+        estado_compartido.iniciar_publicacion_metricas(estado, SEGUNDOS_PUBLICACION_METRICAS)
+
 
 @app.route("/", methods=["GET"]) 
 def index():
-    # Construir lista de idiomas desde CSV (o fallback interno)
-    brutos = trans.listar_idiomas_disponibles()
-    idiomas = []  # lista de tuplas (codigo, etiqueta)
-    for item in brutos:
-        # item viene como "xx (Nombre)"; separar el código del resto para usar como value
-        codigo = (item.split(" ")[0] or "").strip()
-        etiqueta = item
-        if codigo:
-            idiomas.append((codigo, etiqueta))
-    return render_template("index.html", idiomas=idiomas)
+    # Las opciones de idioma vienen pre-renderizadas del catálogo (CSV o fallback interno)
+    global _pagina_inicio
+    opciones_idiomas, version = catalogo_idiomas.obtener_catalogo().opciones_html()
+
+    # Con mensajes flash pendientes la página es distinta: se renderiza sin caché
+    if session.get("_flashes"):
+        return render_template("index.html", opciones_idiomas=Markup(opciones_idiomas))
+
+    cacheada = _pagina_inicio
+    if cacheada is None or cacheada[0] != version:
+        cacheada = (version, render_template("index.html", opciones_idiomas=Markup(opciones_idiomas)))
+        _pagina_inicio = cacheada
+
+    respuesta = make_response(cacheada[1])
+    respuesta.set_etag(version)
+    respuesta.headers["Cache-Control"] = "no-cache"
+    return respuesta.make_conditional(request)
+
+
+def _opciones_web(fuente: str, idioma_elegido: str, nombre_archivo: str, clave_api: str) -> dict:
+    """
+    Opciones mínimas para la web: detectar idioma automáticamente salvo que se elija uno.
+    La clave viaja en las opciones para no tocar aai.settings desde cada hilo.
+    """
+    return {
+        "listar_idiomas": False,
+        "mostrar_ayuda": False,
+        "forzar_cancion": False,
+        "salida_cruda": False,
+        "canal_dual": False,
+        "etiquetas_hablantes": False,
+        "sin_formato_texto": False,
+        "lista_palabras_clave": [],
+        "nivel_impulso": None,
+        "codigo_idioma": None if idioma_elegido == "auto" else idioma_elegido,
+        "fuente": fuente,
+        "detectar_idioma": idioma_elegido == "auto",
+        "ruta_idiomas_csv": None,
+        "mapa_nombres_hablantes": {},
+        "usar_cache": True,
+        "nombre_archivo": nombre_archivo,
+        "clave_indice": f"web:{uuid.uuid4().hex}",
+        "clave_api": clave_api,
+    }
+
+
+def _procesar_transcripcion(fuente: str, opciones: dict) -> dict:
+    """
+    Transcribe y formatea; devuelve el contexto que usa result.html.
+    Se ejecuta dentro del pool de trabajos, fuera del hilo de la petición.
+    """
+    informe: dict = {}
+    texto, transcripcion_obj = trans.transcribir_audio(fuente, opciones, informe)
+    return _finalizar_transcripcion(texto, transcripcion_obj, opciones, informe)
+
+
+def _clave_webhook() -> str:
+    """
+    Clave de la firma de los webhooks: SECRETO_WEBHOOK o, sin ella, la del estado
+    compartido (el webhook puede llegar a cualquier worker, que debe poder verificarlo).
+    """
+    global _secreto_webhook
+    import estado_compartido
+
+    with _candado_secreto:
+        if _secreto_webhook is None:
+            estado = estado_compartido.estado_por_defecto()
+            _secreto_webhook = estado.secreto("webhook") if estado is not None else secrets.token_hex(32)
+        return _secreto_webhook
+
+
+def _firma_webhook(id_trabajo: str) -> str:
+    return hmac.new(_clave_webhook().encode("utf-8"), id_trabajo.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def _enviar_con_webhook(fuente: str, opciones: dict, url_webhook: str, firma: str):
+    """
+    Primera mitad de un trabajo con webhook: consulta la caché y, si no hay
+    resultado, envía la transcripción y libera el hilo hasta que llegue el aviso.
+    """
+    import trabajos
+
+    clave_cache, cacheada = trans.consultar_cache(fuente, opciones)
+    if cacheada is not None:
+        return _finalizar_transcripcion(cacheada.text or "", cacheada, opciones)
+
+    informe: dict = {}
+    id_remoto = trans.enviar_transcripcion(fuente, opciones, url_webhook, CABECERA_WEBHOOK, firma, informe)
+    return trabajos.EnEspera(
+        id_remoto,
+        functools.partial(_completar_desde_webhook, id_remoto, clave_cache, opciones, informe),
+    )
+
+
+def _completar_desde_webhook(id_remoto: str, clave_cache: str | None, opciones: dict, informe: dict) -> dict:
+    transcripcion_obj = trans.obtener_transcripcion(id_remoto, opciones.get("clave_api"))
+    trans.guardar_en_cache(clave_cache, transcripcion_obj)
+    return _finalizar_transcripcion(transcripcion_obj.text or "", transcripcion_obj, opciones, informe)
+
+
+def _encolar_transcripcion(
+    fuente: str, opciones: dict, nombre: str, reserva: float, directorio_temporal: str | None = None,
+):
+    """
+    Envía el trabajo al pool; la plaza `reserva` de la cola de admisión se libera
+    cuando el trabajo termina (también si el proveedor nunca avisa por webhook).
+    """
+    import trabajos
+
+    al_terminar = lambda _trabajo: planificador.liberar(reserva)
+    # Los archivos descargables viven mientras se conserve el trabajo
+    opciones["directorio_exportaciones"] = tempfile.mkdtemp(prefix="exportaciones-")
+    try:
+        if not URL_PUBLICA_WEBHOOK or not motor_transcripcion.admite_webhooks:
+            return trabajos.gestor_por_defecto().enviar(
+                _procesar_transcripcion, fuente, opciones,
+                nombre=nombre, directorio_temporal=directorio_temporal, al_terminar=al_terminar,
+                directorio_resultados=opciones["directorio_exportaciones"],
+            )
+        id_trabajo = uuid.uuid4().hex
+        url_webhook = URL_PUBLICA_WEBHOOK + url_for("webhook_transcripcion", id_trabajo=id_trabajo)
+        return trabajos.gestor_por_defecto().enviar(
+            _enviar_con_webhook, fuente, opciones, url_webhook, _firma_webhook(id_trabajo),
+            nombre=nombre, directorio_temporal=directorio_temporal, id_trabajo=id_trabajo,
+            al_terminar=al_terminar, directorio_resultados=opciones["directorio_exportaciones"],
+        )
+    except Exception:
+        shutil.rmtree(opciones["directorio_exportaciones"], ignore_errors=True)
+        raise
+
+
+def _finalizar_transcripcion(texto: str, transcripcion_obj, opciones: dict, informe: dict | None = None) -> dict:
+    """
+    Clasifica, formatea e indexa una transcripción ya obtenida.
+    `informe` trae los bytes originales y subidos si hubo preprocesado.
+    """
+    import analitica
+    import exportacion
+
+    with metricas.medir("clasificacion"):
+        tipo = "cancion" if opciones["forzar_cancion"] else trans._classify_transcript_simple(texto)
+    with metricas.medir("formato"):
+        texto_formateado = (
+            texto if opciones["salida_cruda"] else
+            trans._format_as_lyrics(texto) if tipo == "cancion" else
+            trans._format_as_dialogue(texto)
+        )
+
+    utterances = getattr(transcripcion_obj, 'utterances', []) or []
+    num_speakers = len({str(u.speaker) for u in utterances}) if utterances else 0
+    usar_speakers = bool(opciones["etiquetas_hablantes"]) or num_speakers > 1
+
+    # Si se usa formato con speakers, construimos una representación simple para la web
+    lineas_speakers = []
+    if usar_speakers and utterances:
+        with metricas.medir("hablantes"):
+            lineas_speakers = list(trans.iterar_lineas_hablantes(utterances, opciones.get("mapa_nombres_hablantes")))
+    with metricas.medir("analitica"):
+        analisis = analitica.analizar(utterances, opciones.get("mapa_nombres_hablantes"))
+
+    idioma_detectado = getattr(transcripcion_obj, 'language_code', None) or getattr(transcripcion_obj, 'language', None)
+
+    # Todos los formatos descargables se escriben en una sola pasada por los utterances
+    formatos_exportados = []
+    directorio = opciones.get("directorio_exportaciones")
+    if directorio:
+        with metricas.medir("exportacion"):
+            exportacion.exportar_a_rutas(
+                transcripcion_obj,
+                {f: os.path.join(directorio, f"transcripcion.{f}") for f in exportacion.FORMATOS},
+                texto=texto_formateado,
+                tipo=tipo,
+                con_speakers=usar_speakers,
+                mapa_nombres=opciones.get("mapa_nombres_hablantes"),
+            )
+        formatos_exportados = list(exportacion.FORMATOS)
+
+    trans.indexar_transcripcion(
+        opciones["clave_indice"],
+        opciones["nombre_archivo"],
+        transcripcion_obj,
+        tipo,
+        opciones.get("mapa_nombres_hablantes"),
+        texto,
+    )
+
+    return {
+        "texto": texto_formateado,
+        "tipo": tipo,
+        "usar_speakers": usar_speakers,
+        "lineas_speakers": lineas_speakers,
+        "analitica": analisis,
+        "idioma_detectado": idioma_detectado,
+        "preprocesado": informe or None,
+        "formatos": formatos_exportados,
+    }
+
+
+def _idioma_valido(idioma: str) -> bool:
+    return idioma == "auto" or catalogo_idiomas.obtener_catalogo().contiene(idioma)
+
+
+def _quiere_json() -> bool:
+    """
+    True si el cliente pide JSON (cabecera Accept o ?formato=json) en lugar de HTML.
+    """
+    if request.args.get("formato") == "json":
+        return True
+    mejor = request.accept_mimetypes.best_match(["text/html", "application/json"])
+    return mejor == "application/json"
+
+
+def _respuesta_cola_llena(error: planificador_llamadas.ColaLlenaError, como_json: bool):
+    """
+    429 con Retry-After para clientes JSON; en HTML se avisa y se vuelve al formulario.
+    """
+    if not como_json:
+        flash(f"{error} Vuelve a intentarlo en unos {error.reintentar_en} segundos.")
+        return redirect(url_for("index"))
+    respuesta = jsonify({"error": str(error), "reintentar_en": error.reintentar_en})
+    respuesta.status_code = 429
+    respuesta.headers["Retry-After"] = str(error.reintentar_en)
+    return respuesta
+
+
+def _respuesta_trabajo_enviado(trabajo):
+    url_estado = url_for("estado_trabajo", id_trabajo=trabajo.id)
+    if _quiere_json():
+        respuesta = jsonify(trabajo.a_dict(incluir_resultado=False))
+        respuesta.status_code = 202
+        respuesta.headers["Location"] = url_estado
+        return respuesta
+    return redirect(url_estado)
 
 
 @app.route("/transcribe", methods=["POST"]) 
 def transcribe_upload():
+    # La plaza se pide antes de leer el cuerpo: con la cola llena no se recibe el archivo
+    try:
+        reserva = planificador.reservar()
+    except planificador_llamadas.ColaLlenaError as e:
+        return _respuesta_cola_llena(e, _quiere_json())
+    try:
+        respuesta = _transcribe_upload(reserva)
+    except Exception:
+        planificador.liberar(reserva)
+        raise
+    if respuesta is None:
+        planificador.liberar(reserva)
+        return redirect(url_for("index"))
+    return respuesta
+
+
+def _transcribe_upload(reserva: float):
+    """
+    Guarda el archivo y encola el trabajo; retorna None (tras avisar con flash)
+    si la petición no es válida.
+    """
     archivo = request.files.get("file")
     idioma_elegido = request.form.get("idioma", "auto").strip()
     if not archivo or archivo.filename == "":
         flash("Sube un archivo de audio o video.")
+        return None
+    if not _idioma_valido(idioma_elegido):
+        flash(f"Idioma no soportado: {idioma_elegido}")
+        return None
+
+    # La clave se pasa a cada llamada; los clientes del SDK se reutilizan por proceso
+    aai_key = trans.obtener_clave_api()
+    if not aai_key:
+        flash("Falta la clave de API de AssemblyAI. Configura CLAVE_API_ASSEMBLYAI.")
+        return None
+
+    # Guardar temporalmente; el directorio pasa a ser propiedad del trabajo,
+    # que lo elimina al terminar la transcripción
+    tmpdir = tempfile.mkdtemp(prefix="transcripcion-")
+    nombre = secure_filename(archivo.filename) or "media"
+    ruta_tmp = os.path.join(tmpdir, nombre)
+    try:
+        with metricas.medir("guardado_subida"):
+            archivo.save(ruta_tmp)
+        opciones = _opciones_web(ruta_tmp, idioma_elegido, archivo.filename, aai_key)
+        opciones["preprocesar"] = bool(request.form.get("preprocesar"))
+        trabajo = _encolar_transcripcion(ruta_tmp, opciones, archivo.filename, reserva, tmpdir)
+    except Exception:
+        # Sin trabajo encolado, el directorio sigue siendo de la petición
+        shutil.rmtree(tmpdir, ignore_errors=True)
+        raise
+    return _respuesta_trabajo_enviado(trabajo)
+
+
+@app.route("/transcribe/stream", methods=["POST"])
+def transcribe_stream():
+    """
+    Recibe el archivo como cuerpo crudo de la petición (no multipart) y lo reenvía
+    por bloques al proveedor, sin guardarlo en disco (con el motor local se copia a
+    un temporal). El nombre y el idioma van en la URL:
+    POST /transcribe/stream?nombre=audio.mp3&idioma=auto
+    """
+    nombre = request.args.get("nombre") or "media"
+    idioma_elegido = request.args.get("idioma", "auto").strip()
+    if not _idioma_valido(idioma_elegido):
+        return jsonify({"error": f"Idioma no soportado: {idioma_elegido}"}), 400
+
+    aai_key = trans.obtener_clave_api()
+    if not aai_key:
+        return jsonify({"error": "Falta la clave de API de AssemblyAI. Configura CLAVE_API_ASSEMBLYAI."}), 500
+
+    # Antes de leer el cuerpo: con la cola llena no se sube nada al proveedor
+    try:
+        reserva = planificador.reservar()
+    except planificador_llamadas.ColaLlenaError as e:
+        return _respuesta_cola_llena(e, como_json=True)
+
+    tmpdir = None
+    try:
+        if motor_transcripcion.admite_flujos:
+            with metricas.medir("subida_flujo"):
+                fuente, hash_medio, bytes_subidos = trans.subir_flujo(request.stream, LIMITE_SUBIDA_BYTES, aai_key)
+            metricas.BYTES_PROCESADOS.incrementar(bytes_subidos, origen="flujo")
+        else:
+            # El directorio pasa a ser del trabajo, que lo elimina al terminar
+            tmpdir = tempfile.mkdtemp(prefix="transcripcion-")
+            fuente = os.path.join(tmpdir, secure_filename(nombre) or "media")
+            with metricas.medir("guardado_subida"):
+                hash_medio, _ = trans.guardar_flujo(request.stream, fuente, LIMITE_SUBIDA_BYTES)
+    except trans.TamanoExcedidoError as e:
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+        planificador.liberar(reserva)
+        return jsonify({"error": str(e)}), 413
+    except Exception as e:
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+        planificador.liberar(reserva)
+        return jsonify({"error": str(e)}), 502
+
+    opciones = _opciones_web(fuente, idioma_elegido, nombre, aai_key)
+    opciones["hash_medio"] = hash_medio
+    try:
+        trabajo = _encolar_transcripcion(fuente, opciones, nombre, reserva, tmpdir)
+    except Exception:
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+        planificador.liberar(reserva)
+        raise
+    return _respuesta_trabajo_enviado(trabajo)
+
+
+@app.route("/live", methods=["GET"])
+def en_vivo():
+    import tiempo_real
+
+    return render_template("en_vivo.html", tasa_muestreo=tiempo_real.TASA_MUESTREO)
+
+
+@app.route("/live", methods=["POST"])
+def iniciar_en_vivo():
+    """
+    Abre una sesión de subtítulos en vivo. Cuerpo JSON opcional:
+    {"idioma": "es", "nombres_hablantes": {"A": "Ana"}}. El audio se envía
+    luego como PCM de 16 bits, mono, 16 kHz a la URL "audio", por tramas.
+    """
+    import tiempo_real
+
+    aai_key = trans.obtener_clave_api()
+    if not aai_key:
+        return jsonify({"error": "Falta la clave de API de AssemblyAI. Configura CLAVE_API_ASSEMBLYAI."}), 500
+    datos = request.get_json(silent=True) or {}
+    idioma = (datos.get("idioma") or "auto").strip()
+    if not _idioma_valido(idioma):
+        return jsonify({"error": f"Idioma no soportado: {idioma}"}), 400
+    nombres = datos.get("nombres_hablantes") or {}
+    if not isinstance(nombres, dict):
+        return jsonify({"error": "nombres_hablantes debe ser un objeto {etiqueta: nombre}."}), 400
+
+    try:
+        sesion = tiempo_real.gestor_por_defecto().crear(
+            mapa_nombres={str(k): str(v) for k, v in nombres.items() if v},
+            idioma=None if idioma == "auto" else idioma,
+            clave_api=aai_key,
+        )
+    except planificador_llamadas.ColaLlenaError as e:
+        return _respuesta_cola_llena(e, como_json=True)
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 502
+
+    respuesta = jsonify({
+        "id": sesion.id,
+        "audio": url_for("audio_en_vivo", id_sesion=sesion.id),
+        "eventos": url_for("eventos_en_vivo", id_sesion=sesion.id),
+        "terminar": url_for("terminar_en_vivo", id_sesion=sesion.id),
+        "formato": {"codificacion": "pcm_s16le", "tasa_muestreo": tiempo_real.TASA_MUESTREO, "canales": 1},
+    })
+    respuesta.status_code = 201
+    return respuesta
+
+
+@app.route("/live/<id_sesion>/audio", methods=["POST"])
+def audio_en_vivo(id_sesion: str):
+    import tiempo_real
+
+    audio = request.get_data(cache=False)
+    if not tiempo_real.gestor_por_defecto().enviar_audio(id_sesion, audio):
+        return jsonify({"error": "Sesión no encontrada o terminada"}), 404
+    metricas.BYTES_PROCESADOS.incrementar(len(audio), origen="tiempo_real")
+    return "", 204
+
+
+@app.route("/live/<id_sesion>/events", methods=["GET"])
+def eventos_en_vivo(id_sesion: str):
+    """
+    Resultados de la sesión como Server-Sent Events ("parcial", "final", "error", "fin").
+    """
+    import tiempo_real
+
+    eventos = tiempo_real.gestor_por_defecto().eventos(id_sesion, espera=SEGUNDOS_LATIDO_SSE)
+    if eventos is None:
+        return jsonify({"error": "Sesión no encontrada"}), 404
+
+    def _generar():
+        for evento in eventos:
+            if evento is None:
+                yield ": latido\n\n"
+                continue
+            yield f"event: {evento['tipo']}\ndata: {json.dumps(evento, ensure_ascii=False)}\n\n"
+
+    return Response(
+        _generar(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/live/<id_sesion>/end", methods=["POST"])
+def terminar_en_vivo(id_sesion: str):
+    import tiempo_real
+
+    if not tiempo_real.gestor_por_defecto().terminar(id_sesion):
+        return jsonify({"error": "Sesión no encontrada"}), 404
+    return "", 204
+
+
+@app.route("/webhooks/assemblyai/<id_trabajo>", methods=["POST"])
+def webhook_transcripcion(id_trabajo: str):
+    """
+    Aviso de AssemblyAI al terminar una transcripción: {"transcript_id": ..., "status": ...}.
+    Solo retoma el trabajo; la descarga y el formato se hacen en el pool.
+    """
+    import trabajos
+
+    firma = request.headers.get(CABECERA_WEBHOOK, "")
+    if not hmac.compare_digest(firma, _firma_webhook(id_trabajo)):
+        return jsonify({"error": "Firma no válida."}), 403
+
+    datos = request.get_json(silent=True) or {}
+    id_remoto = datos.get("transcript_id")
+    if not id_remoto:
+        return jsonify({"error": "Falta transcript_id."}), 400
+
+    if trabajos.gestor_por_defecto().reanudar(id_trabajo, id_remoto) is None:
+        return jsonify({"error": "Trabajo no encontrado."}), 404
+    return "", 204
+
+
+@app.route("/jobs/<id_trabajo>", methods=["GET"])
+def estado_trabajo(id_trabajo: str):
+    import trabajos
+
+    trabajo = trabajos.gestor_por_defecto().obtener(id_trabajo)
+    if trabajo is None:
+        if _quiere_json():
+            return jsonify({"error": "Trabajo no encontrado."}), 404
+        flash("El trabajo no existe o ya expiró.")
         return redirect(url_for("index"))
 
-    # Guardar temporalmente y ejecutar transcripción
-    with tempfile.TemporaryDirectory() as tmpdir:
-        ruta_tmp = os.path.join(tmpdir, archivo.filename)
-        archivo.save(ruta_tmp)
-
-        # Configurar API key
-        aai_key = trans.obtener_clave_api()
-        if not aai_key:
-            flash("Falta la clave de API de AssemblyAI. Configura CLAVE_API_ASSEMBLYAI.")
-            return redirect(url_for("index"))
-
-        # Preparar opciones mínimas: detectar idioma automáticamente
-        opciones = {
-            "listar_idiomas": False,
-            "mostrar_ayuda": False,
-            "forzar_cancion": False,
-            "salida_cruda": False,
-            "canal_dual": False,
-            "etiquetas_hablantes": False,
-            "sin_formato_texto": False,
-            "lista_palabras_clave": [],
-            "nivel_impulso": None,
-            "codigo_idioma": None if idioma_elegido == "auto" else idioma_elegido,
-            "fuente": ruta_tmp,
-            "detectar_idioma": idioma_elegido == "auto",
-            "ruta_idiomas_csv": None,
-            "mapa_nombres_hablantes": {},
-        }
-
-        try:
-            # Establecer API key en settings del SDK
-            import assemblyai as aai
-            aai.settings.api_key = aai_key
-
-            texto, transcripcion_obj = trans.transcribir_audio(ruta_tmp, opciones)
-            tipo = "cancion" if opciones["forzar_cancion"] else trans._classify_transcript_simple(texto)
-            texto_formateado = (
-                texto if opciones["salida_cruda"] else
-                trans._format_as_lyrics(texto) if tipo == "cancion" else
-                trans._format_as_dialogue(texto)
-            )
+    if _quiere_json():
+        datos = trabajo.a_dict()
+        if trabajo.estado == trabajos.ESTADO_COMPLETADO:
+            datos["descargas"] = _urls_descarga(trabajo)
+        return jsonify(datos)
+
+    if trabajo.estado == trabajos.ESTADO_ERROR:
+        flash(f"Error: {trabajo.error}")
+        return redirect(url_for("index"))
+    if trabajo.estado == trabajos.ESTADO_COMPLETADO:
+        return _respuesta_resultado(trabajo)
+    return render_template("trabajo.html", trabajo=trabajo)
 
-            utterances = getattr(transcripcion_obj, 'utterances', []) or []
-            num_speakers = len({str(u.speaker) for u in utterances}) if utterances else 0
-            usar_speakers = bool(opciones["etiquetas_hablantes"]) or num_speakers > 1
 
-            # Si se usa formato con speakers, construimos una representación simple para la web
-            lineas_speakers = []
-            if usar_speakers and utterances:
-                for u in utterances:
-                    etiqueta = str(u.speaker)
-                    prefijo = opciones.get("mapa_nombres_hablantes", {}).get(etiqueta, f"Speaker {etiqueta}")
-                    lineas_speakers.append(f"{prefijo}: {u.text}")
+def _urls_descarga(trabajo) -> dict:
+    return {
+        formato: url_for("descargar_trabajo", id_trabajo=trabajo.id, formato=formato)
+        for formato in trabajo.resultado.get("formatos") or []
+    }
 
-            idioma_detectado = getattr(transcripcion_obj, 'language_code', None) or getattr(transcripcion_obj, 'language', None)
 
-            return render_template(
-                "result.html",
-                texto=texto_formateado,
-                tipo=tipo,
-                usar_speakers=usar_speakers,
-                lineas_speakers=lineas_speakers,
-                idioma_detectado=idioma_detectado,
-            )
-        except Exception as e:
-            flash(f"Error: {e}")
-            return redirect(url_for("index"))
+@app.route("/jobs/<id_trabajo>/descargar/<formato>", methods=["GET"])
+def descargar_trabajo(id_trabajo: str, formato: str):
+    """
+    Descarga el resultado en uno de los formatos exportados (txt, srt, vtt o json).
+    """
+    import trabajos
+
+    trabajo = trabajos.gestor_por_defecto().obtener(id_trabajo)
+    if trabajo is None or trabajo.estado != trabajos.ESTADO_COMPLETADO or not trabajo.directorio_resultados:
+        return jsonify({"error": "Trabajo no encontrado o sin terminar."}), 404
+    if formato not in (trabajo.resultado.get("formatos") or []):
+        return jsonify({"error": f"Formato no disponible: {formato}"}), 404
+    base = os.path.splitext(secure_filename(trabajo.nombre or "") or "transcripcion")[0]
+    return send_from_directory(
+        trabajo.directorio_resultados,
+        f"transcripcion.{formato}",
+        as_attachment=True,
+        download_name=f"{base}.{formato}",
+    )
+
+
+def _pagina(lineas: list[str], desde: int, cantidad: int) -> tuple:
+    """
+    Retorna (iterador_de_lineas, siguiente_desde | None) sin copiar la lista completa.
+    """
+    hasta = min(len(lineas), desde + cantidad)
+    siguiente = hasta if hasta < len(lineas) else None
+    return itertools.islice(lineas, desde, hasta), siguiente
+
+
+# Líneas del texto formateado de los últimos trabajos mostrados, por (id, actualizado):
+# un trabajo leído del estado compartido es un objeto nuevo en cada petición
+MAX_TRABAJOS_CON_LINEAS = 16
+_lineas_por_trabajo: OrderedDict[tuple[str, float], list[str]] = OrderedDict()
+_candado_lineas = threading.Lock()
+
+
+def _lineas_texto(trabajo) -> list[str]:
+    clave = (trabajo.id, trabajo.actualizado)
+    with _candado_lineas:
+        lineas = _lineas_por_trabajo.get(clave)
+        if lineas is not None:
+            _lineas_por_trabajo.move_to_end(clave)
+            return lineas
+    lineas = (trabajo.resultado.get("texto") or "").split("\n")
+    with _candado_lineas:
+        _lineas_por_trabajo[clave] = lineas
+        while len(_lineas_por_trabajo) > MAX_TRABAJOS_CON_LINEAS:
+            _lineas_por_trabajo.popitem(last=False)
+    return lineas
+
+
+def _lineas_seccion(trabajo, seccion: str) -> list[str]:
+    if seccion == "hablantes":
+        return trabajo.resultado.get("lineas_speakers") or []
+    return _lineas_texto(trabajo)
+
+
+def _respuesta_resultado(trabajo):
+    """
+    Renderiza result.html en streaming con solo la primera página de cada sección;
+    el resto se carga bajo demanda desde /jobs/<id>/lineas.
+    """
+    todas_speakers = _lineas_seccion(trabajo, "hablantes")
+    lineas_speakers, siguiente_speakers = _pagina(todas_speakers, 0, LINEAS_POR_PAGINA)
+    lineas_texto, siguiente_texto = _pagina(_lineas_seccion(trabajo, "texto"), 0, LINEAS_POR_PAGINA)
+    contexto = dict(trabajo.resultado)
+    contexto.update(
+        id_trabajo=trabajo.id,
+        descargas=_urls_descarga(trabajo),
+        total_speakers=len(todas_speakers),
+        lineas_speakers=lineas_speakers,
+        siguiente_speakers=siguiente_speakers,
+        lineas_texto=lineas_texto,
+        siguiente_texto=siguiente_texto,
+    )
+    return app.response_class(
+        metricas.medir_iterable("render", stream_template("result.html", **contexto)),
+        mimetype="text/html",
+    )
+
+
+@app.route("/jobs/<id_trabajo>/lineas", methods=["GET"])
+def lineas_trabajo(id_trabajo: str):
+    """
+    Página de líneas de un resultado: ?seccion=texto|hablantes&desde=0&cantidad=500
+    """
+    import trabajos
+
+    trabajo = trabajos.gestor_por_defecto().obtener(id_trabajo)
+    if trabajo is None or trabajo.estado != trabajos.ESTADO_COMPLETADO:
+        return jsonify({"error": "Trabajo no encontrado o sin terminar."}), 404
+
+    seccion = request.args.get("seccion", "texto")
+    if seccion not in {"texto", "hablantes"}:
+        return jsonify({"error": "Sección no válida."}), 400
+    desde = max(request.args.get("desde", 0, type=int), 0)
+    cantidad = min(max(request.args.get("cantidad", LINEAS_POR_PAGINA, type=int), 1), MAX_LINEAS_POR_PAGINA)
+
+    lineas = _lineas_seccion(trabajo, seccion)
+    pagina, siguiente = _pagina(lineas, desde, cantidad)
+    return jsonify({"lineas": list(pagina), "siguiente": siguiente, "total": len(lineas)})
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    Métricas en formato de texto de Prometheus: la suma de todos los procesos
+    con estado compartido (las de otros workers, con hasta
+    SEGUNDOS_PUBLICACION_METRICAS de retraso), o las de este proceso sin él.
+    """
+    import estado_compartido
+
+    estado = estado_compartido.estado_por_defecto()
+    if estado is None:
+        return app.response_class(metricas.exportar(), mimetype="text/plain; version=0.0.4")
+    estado.publicar_metricas(estado_compartido.proceso_actual(), metricas.instantanea())
+    return app.response_class(metricas.exportar(estado.metricas()), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/search", methods=["GET"])
+def buscar():
+    """
+    Búsqueda de frases en transcripciones anteriores:
+    /search?q=<frase>&hablante=<nombre|etiqueta>&idioma=<código>&limite=<n>&orden=reciente|relevancia
+    """
+    import sqlite3
+    import almacen as almacen_transcripciones
+
+    consulta = (request.args.get("q") or "").strip()
+    if not consulta:
+        return jsonify({"error": "Falta el parámetro q."}), 400
+    limite = min(max(request.args.get("limite", 20, type=int), 1), 200)
+    inicio = time.perf_counter()
+    try:
+        almacen = almacen_transcripciones.almacen_por_defecto()
+        if almacen is None:
+            return jsonify({"error": "El índice de transcripciones está desactivado."}), 503
+        resultados = almacen.buscar(
+            consulta,
+            hablante=request.args.get("hablante") or None,
+            idioma=request.args.get("idioma") or None,
+            limite=limite,
+            por_relevancia=request.args.get("orden") == "relevancia",
+        )
+    except (sqlite3.Error, OSError):
+        metricas.ERRORES.incrementar(origen="indice")
+        return jsonify({"error": "El índice de transcripciones no está disponible."}), 503
+    return jsonify({
+        "consulta": consulta,
+        "resultados": resultados,
+        "milisegundos": round((time.perf_counter() - inicio) * 1000, 2),
+    })
 
 
 if __name__ == "__main__":
@@ -0,0 +1,1197 @@
+"""
+Benchmarks de rendimiento del transcriptor (no forman parte de la app).
+
+Uso:
+  python benchmark.py <suite> [--tamano-max-mb=<n>] [--escala=<factor>] [--corpus=<directorio>]
+  python benchmark.py --listar
+
+--escala multiplica la cantidad de elementos generados (p. ej. 0.1 para una corrida rápida).
+--corpus usa los medios de un directorio en lugar del corpus sintético (suite motores).
+
+Cada suite imprime rendimiento y memoria pico (tracemalloc) por tamaño de entrada.
+"""
+import random
+import sys
+import time
+import tracemalloc
+
+
+def _medir(funcion, *args) -> tuple[object, float, int]:
+    """
+    Ejecuta funcion(*args) y retorna (resultado, segundos, bytes_pico).
+
+    El tiempo se mide en una ejecución sin tracemalloc (que la ralentiza mucho)
+    y la memoria pico en una segunda ejecución instrumentada.
+    """
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    duracion = time.perf_counter() - inicio
+
+    tracemalloc.start()
+    try:
+        funcion(*args)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return resultado, duracion, pico
+
+
+def _mb(n_bytes: float) -> str:
+    return f"{n_bytes / (1024 * 1024):8.2f} MB"
+
+
+_VOCABULARIO = (
+    "hola gracias entonces reunión proyecto cliente semana pregunta respuesta "
+    "importante tiempo equipo datos informe llamada problema solución próximo "
+    "corazón noche baila amor siempre contigo cielo luna vuelve canción"
+).split()
+
+
+def texto_sintetico(tamano_bytes: int, tipo: str = "diálogo", semilla: int = 7) -> str:
+    """
+    Genera una transcripción sintética de ~tamano_bytes caracteres.
+    "diálogo": oraciones largas con puntuación en pocas líneas; "canción": versos cortos y repetitivos.
+    """
+    azar = random.Random(semilla)
+    partes: list[str] = []
+    total = 0
+    while total < tamano_bytes:
+        if tipo == "canción":
+            verso = " ".join(azar.choice(_VOCABULARIO[-10:]) for _ in range(azar.randint(3, 6)))
+            parte = verso + ("\n\n" if azar.random() < 0.15 else "\n")
+        else:
+            oracion = " ".join(azar.choice(_VOCABULARIO) for _ in range(azar.randint(8, 25)))
+            parte = oracion.capitalize() + azar.choice([". ", "? ", "! ", ", "])
+        partes.append(parte)
+        total += len(parte)
+    return "".join(partes)[:tamano_bytes]
+
+
+def _tamanos(tamano_max_mb: float) -> list[int]:
+    tamanos = [10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024, 50 * 1024 * 1024]
+    return [t for t in tamanos if t <= tamano_max_mb * 1024 * 1024]
+
+
+def _clasificar_referencia(text: str) -> str:
+    """
+    Implementación original de _classify_transcript_simple (varias pasadas), como referencia.
+    """
+    if not text:
+        return "diálogo"
+    texto_minusculas = text.lower()
+    conteo_puntuacion = sum(texto_minusculas.count(ch) for ch in ".?!")
+    densidad_puntuacion = conteo_puntuacion / max(len(text), 1)
+    palabras = [w for w in ''.join(ch if ch.isalnum() or ch.isspace() else ' ' for ch in texto_minusculas).split() if w]
+    frecuencia = {}
+    for palabra in palabras:
+        frecuencia[palabra] = frecuencia.get(palabra, 0) + 1
+    repeticiones = sum(1 for _, conteo in frecuencia.items() if conteo >= 4)
+    proporcion_repeticion = repeticiones / max(len(frecuencia), 1)
+    lineas = [ln.strip() for ln in text.splitlines() if ln.strip()]
+    longitud_promedio_linea = sum(len(ln) for ln in lineas) / max(len(lineas), 1)
+    puntuacion_cancion = 0.0
+    if proporcion_repeticion > 0.03:
+        puntuacion_cancion += 1.0
+    if densidad_puntuacion < 0.005:
+        puntuacion_cancion += 1.0
+    if longitud_promedio_linea < 45:
+        puntuacion_cancion += 1.0
+    return "canción" if puntuacion_cancion >= 2.0 else "diálogo"
+
+
+def suite_clasificador(parametros: dict) -> int:
+    """
+    Compara el clasificador de una pasada con la implementación original.
+    """
+    import transcribe
+
+    print(f"{'tamaño':>10} {'tipo':>8} {'impl':>10} {'MB/s':>9} {'pico':>11}  decisión")
+    distintas = 0
+    for tamano in _tamanos(parametros["tamano_max_mb"]):
+        for tipo in ("diálogo", "canción"):
+            texto = texto_sintetico(tamano, tipo)
+            decisiones = {}
+            for nombre, funcion in (("original", _clasificar_referencia), ("una-pasada", transcribe._classify_transcript_simple)):
+                decision, segundos, pico = _medir(funcion, texto)
+                decisiones[nombre] = decision
+                print(f"{tamano // 1024:>8}KB {tipo:>8} {nombre:>10} {tamano / segundos / (1024 * 1024):>9.1f} {_mb(pico)}  {decision}")
+            if len(set(decisiones.values())) != 1:
+                distintas += 1
+    if distintas:
+        print(f"\nERROR: {distintas} casos con decisiones distintas.", file=sys.stderr)
+        return 1
+    print("\nDecisiones idénticas en todos los casos.")
+    return 0
+
+
+def _letras_referencia(text: str) -> str:
+    """
+    Implementación original de _format_as_lyrics (texto completo), como referencia.
+    """
+    if not text:
+        return text
+    estrofas = [estrofa.strip() for estrofa in text.split("\n\n") if estrofa.strip()]
+    letras_formateadas = []
+    for estrofa in estrofas:
+        versos = [verso.strip() for verso in estrofa.split("\n") if verso.strip()]
+        for verso in versos:
+            letras_formateadas.append(f"  {verso}")
+        letras_formateadas.append("")
+    return "\n".join(letras_formateadas).strip()
+
+
+def _dialogo_referencia(text: str) -> str:
+    """
+    Implementación original de _format_as_dialogue (texto completo), como referencia.
+    """
+    import re
+    import textwrap
+
+    if not text:
+        return text
+    partes = re.split(r"(?<=[\.\?!])\s+", " ".join(text.split()))
+    lineas_envueltas: list[str] = []
+    for parte in partes:
+        if parte:
+            lineas_envueltas.extend(textwrap.wrap(parte, width=80))
+    return "\n".join(lineas_envueltas)
+
+
+def suite_formato(parametros: dict) -> int:
+    """
+    Formateadores por trozos frente a los originales: misma salida byte a byte y memoria acotada.
+    """
+    import hashlib
+
+    import transcribe
+
+    def _consumir(generador, texto: str) -> str:
+        # Como un escritor en flujo: cada línea se procesa y se descarta
+        resumen = hashlib.sha256()
+        for i, linea in enumerate(generador(transcribe.trozos_de_texto(texto, 64 * 1024))):
+            resumen.update(b"\n" if i else b"")
+            resumen.update(linea.encode("utf-8"))
+        return resumen.hexdigest()
+
+    casos = (
+        ("canción", _letras_referencia, transcribe.formatear_letras_incremental),
+        ("diálogo", _dialogo_referencia, transcribe.formatear_dialogo_incremental),
+    )
+    print(f"{'tamaño':>10} {'tipo':>8} {'impl':>11} {'MB/s':>9} {'pico':>11}")
+    distintas = 0
+    for tamano in _tamanos(parametros["tamano_max_mb"]):
+        for tipo, referencia, generador in casos:
+            texto = texto_sintetico(tamano, tipo)
+            esperado, segundos, pico = _medir(referencia, texto)
+            print(f"{tamano // 1024:>8}KB {tipo:>8} {'original':>11} {tamano / segundos / (1024 * 1024):>9.1f} {_mb(pico)}")
+            obtenido, segundos, pico = _medir(_consumir, generador, texto)
+            print(f"{tamano // 1024:>8}KB {tipo:>8} {'por-trozos':>11} {tamano / segundos / (1024 * 1024):>9.1f} {_mb(pico)}")
+            if obtenido != hashlib.sha256(esperado.encode("utf-8")).hexdigest():
+                distintas += 1
+    if distintas:
+        print(f"\nERROR: {distintas} casos con salida distinta.", file=sys.stderr)
+        return 1
+    print("\nSalida idéntica en todos los casos.")
+    return 0
+
+
+def utterances_sinteticas(cantidad: int, hablantes: int = 4, semilla: int = 11) -> list:
+    """
+    Genera `cantidad` utterances sintéticas con tiempos, hablantes y palabras.
+    """
+    from modelos import Palabra, Segmento
+
+    azar = random.Random(semilla)
+    resultado = []
+    tiempo = 0
+    for _ in range(cantidad):
+        speaker = chr(ord("A") + azar.randrange(hablantes))
+        palabras = []
+        for _ in range(azar.randint(3, 18)):
+            duracion = azar.randint(120, 600)
+            palabras.append(Palabra(azar.choice(_VOCABULARIO), tiempo, tiempo + duracion, 0.9, speaker))
+            tiempo += duracion + azar.randint(0, 80)
+        texto = " ".join(p.text for p in palabras).capitalize() + "."
+        resultado.append(Segmento(speaker, texto, palabras[0].start, palabras[-1].end, 0.9, palabras))
+        tiempo += azar.randint(0, 1500)
+    return resultado
+
+
+def _renderizar_concatenando(utterances, ruta: str) -> None:
+    # Implementación anterior de guardar_transcripcion: concatena todo en memoria y escribe al final
+    contenido = ""
+    for utterance in utterances:
+        contenido += f"Speaker {utterance.speaker}: {utterance.text}\n"
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        archivo.write(contenido.strip())
+
+
+def _renderizar_en_flujo(utterances, ruta: str) -> None:
+    import transcribe
+
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        transcribe.escribir_lineas(archivo, transcribe.iterar_lineas_hablantes(utterances))
+
+
+def suite_renderizado(parametros: dict) -> int:
+    """
+    Escritura de transcripciones con hablantes: concatenación vs. escritura en flujo.
+    """
+    import os
+    import tempfile
+
+    # Una llamada fuera de la medición, para no contar la importación de transcribe
+    _renderizar_en_flujo([], os.devnull)
+    print(f"{'utterances':>10} {'impl':>12} {'seg':>8} {'pico':>11}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for cantidad in (1_000, 10_000, 100_000):
+            cantidad = max(1, int(cantidad * parametros["escala"]))
+            utterances = utterances_sinteticas(cantidad)
+            salidas = []
+            for nombre, funcion in (("concatenar", _renderizar_concatenando), ("flujo", _renderizar_en_flujo)):
+                ruta = os.path.join(tmpdir, f"{nombre}.txt")
+                _, segundos, pico = _medir(funcion, utterances, ruta)
+                with open(ruta, "rb") as f:
+                    salidas.append(f.read())
+                print(f"{cantidad:>10} {nombre:>12} {segundos:>8.3f} {_mb(pico)}")
+            if salidas[0] != salidas[1]:
+                print("ERROR: las salidas difieren.", file=sys.stderr)
+                return 1
+    print("\nSalidas idénticas en todos los casos.")
+    return 0
+
+
+def _transcripcion_sintetica(palabras: int):
+    from modelos import TranscripcionLocal
+
+    # utterances_sinteticas genera en promedio ~10,5 palabras por utterance
+    utterances = utterances_sinteticas(max(1, palabras // 10))
+    texto = " ".join(u.text for u in utterances)
+    return TranscripcionLocal(texto, utterances, [p for u in utterances for p in u.words], "es")
+
+
+def _exportar_por_formato(transcripcion, rutas: dict) -> None:
+    # Un recorrido completo de los utterances por cada formato pedido
+    import exportacion
+
+    for formato, ruta in rutas.items():
+        exportacion.exportar_a_rutas(transcripcion, {formato: ruta}, texto=transcripcion.text, con_speakers=True)
+
+
+def _exportar_una_pasada(transcripcion, rutas: dict) -> None:
+    import exportacion
+
+    exportacion.exportar_a_rutas(transcripcion, rutas, texto=transcripcion.text, con_speakers=True)
+
+
+def suite_exportacion(parametros: dict) -> int:
+    """
+    Exportación a txt, srt, vtt y json: una pasada por formato vs. una sola pasada.
+    """
+    import os
+    import tempfile
+    import exportacion
+
+    print(f"{'palabras':>10} {'impl':>12} {'seg':>8} {'pico':>11} {'salida':>11}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for palabras in (10_000, 100_000):
+            palabras = max(10, int(palabras * parametros["escala"]))
+            transcripcion = _transcripcion_sintetica(palabras)
+            salidas = []
+            for nombre, funcion in (("por_formato", _exportar_por_formato), ("una_pasada", _exportar_una_pasada)):
+                rutas = {f: os.path.join(tmpdir, f"{nombre}.{f}") for f in exportacion.FORMATOS}
+                _, segundos, pico = _medir(funcion, transcripcion, rutas)
+                contenido = {}
+                for formato, ruta in rutas.items():
+                    with open(ruta, "rb") as f:
+                        contenido[formato] = f.read()
+                salidas.append(contenido)
+                total = sum(len(c) for c in contenido.values())
+                print(f"{len(transcripcion.words):>10} {nombre:>12} {segundos:>8.3f} {_mb(pico)} {_mb(total)}")
+            if salidas[0] != salidas[1]:
+                print("ERROR: las salidas difieren.", file=sys.stderr)
+                return 1
+    print("\nSalidas idénticas en todos los casos.")
+    return 0
+
+
+def suite_busqueda(parametros: dict) -> int:
+    """
+    Consultas al índice FTS5 con 100 000 transcripciones sintéticas indexadas.
+    """
+    import os
+    import tempfile
+    from almacen import AlmacenTranscripciones
+    from modelos import TranscripcionLocal
+
+    cantidad = max(1, int(100_000 * parametros["escala"]))
+    azar = random.Random(3)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        almacen = AlmacenTranscripciones(os.path.join(tmpdir, "indice.sqlite3"))
+        inicio = time.perf_counter()
+        base = utterances_sinteticas(2_000)
+        for i in range(cantidad):
+            desde = azar.randrange(len(base) - 8)
+            transcripcion = TranscripcionLocal("", base[desde:desde + 8], language_code=azar.choice(["es", "en", "pt"]))
+            almacen.guardar(f"bench:{i}", f"grabacion_{i:06d}.mp3", transcripcion, "diálogo")
+        print(f"Indexadas {cantidad} transcripciones ({cantidad * 8} segmentos) en {time.perf_counter() - inicio:.1f} s")
+
+        consultas = [
+            ("frase", {"consulta": "proyecto cliente"}),
+            ("frase+hablante", {"consulta": "informe", "hablante": "Speaker B"}),
+            ("frase+idioma", {"consulta": "llamada", "idioma": "pt"}),
+            ("rara", {"consulta": "solución próximo corazón"}),
+        ]
+        print(f"{'consulta':>16} {'orden':>10} {'ms (mediana)':>13} {'resultados':>11}")
+        for nombre, argumentos in consultas:
+            for por_relevancia in (False, True):
+                tiempos = []
+                for _ in range(7):
+                    t0 = time.perf_counter()
+                    resultados = almacen.buscar(
+                        argumentos["consulta"], argumentos.get("hablante"), argumentos.get("idioma"), 20, por_relevancia,
+                    )
+                    tiempos.append((time.perf_counter() - t0) * 1000)
+                tiempos.sort()
+                orden = "relevancia" if por_relevancia else "reciente"
+                print(f"{nombre:>16} {orden:>10} {tiempos[len(tiempos) // 2]:>13.2f} {len(resultados):>11}")
+    return 0
+
+
+def _servir_en_hilo(app_wsgi):
+    """
+    Sirve `app_wsgi` en 127.0.0.1 (puerto libre) en un hilo; retorna (servidor, url_base).
+    """
+    import logging
+    import threading
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    servidor = make_server("127.0.0.1", 0, app_wsgi, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_port}"
+
+
+def suite_webhooks(parametros: dict) -> int:
+    """
+    Prueba de carga offline: cientos de trabajos web completados por webhook contra proveedor_falso.py.
+    """
+    import json
+    import os
+    import tempfile
+    import threading
+    import urllib.request
+    from concurrent.futures import ThreadPoolExecutor
+
+    import proveedor_falso
+
+    cantidad = max(1, int(400 * parametros["escala"]))
+    retardo = 3.0
+    proveedor = proveedor_falso.ProveedorFalso(retardo=retardo, tasa_error=0.02)
+    servidor_proveedor, url_proveedor = _servir_en_hilo(proveedor_falso.crear_app(proveedor))
+
+    tmpdir = tempfile.mkdtemp(prefix="bench-webhooks-")
+    os.environ.update({
+        "URL_API_ASSEMBLYAI": url_proveedor,
+        "ASSEMBLYAI_API_KEY": "falsa",
+        "CACHE_TRANSCRIPCIONES": "0",
+        "RUTA_INDICE_TRANSCRIPCIONES": os.path.join(tmpdir, "indice.sqlite3"),
+        "RUTA_ESTADO_COMPARTIDO": os.path.join(tmpdir, "estado.sqlite3"),
+        # Se mide el flujo de webhooks, no el límite de ritmo ni la cola de admisión
+        "LIMITE_PETICIONES_POR_SEGUNDO": "0",
+        "MAX_TRABAJOS_EN_COLA": str(cantidad),
+    })
+    import app as aplicacion
+
+    servidor_app, url_app = _servir_en_hilo(aplicacion.app)
+    aplicacion.URL_PUBLICA_WEBHOOK = url_app
+
+    def _pedir(url: str, cuerpo: bytes | None = None) -> tuple[int, dict]:
+        peticion = urllib.request.Request(url, cuerpo, {"Accept": "application/json"})
+        with urllib.request.urlopen(peticion, timeout=30) as respuesta:
+            return respuesta.status, json.loads(respuesta.read() or b"{}")
+
+    def _enviar(i: int) -> str:
+        _, datos = _pedir(f"{url_app}/transcribe/stream?nombre=carga_{i}.mp3&idioma=es", b"\0" * 64 * 1024)
+        return datos["id"]
+
+    hilos_pico = threading.active_count()
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=32) as clientes:
+        ids = list(clientes.map(_enviar, range(cantidad)))
+    envio = time.perf_counter() - inicio
+
+    pendientes = set(ids)
+    estados: dict[str, int] = {}
+    limite = time.monotonic() + retardo + 120
+    while pendientes and time.monotonic() < limite:
+        hilos_pico = max(hilos_pico, threading.active_count())
+        for id_trabajo in list(pendientes):
+            _, datos = _pedir(f"{url_app}/jobs/{id_trabajo}")
+            if datos["estado"] in ("completado", "error"):
+                estados[datos["estado"]] = estados.get(datos["estado"], 0) + 1
+                pendientes.discard(id_trabajo)
+        time.sleep(0.2)
+    total = time.perf_counter() - inicio
+
+    servidor_app.shutdown()
+    servidor_proveedor.shutdown()
+
+    print(f"Trabajos enviados:        {cantidad} en {envio:.2f} s ({cantidad / envio:.0f}/s)")
+    print(f"Terminados:               {estados} en {total:.2f} s (retardo del proveedor {retardo:.0f} s)")
+    print(f"Sin terminar:             {len(pendientes)}")
+    print(f"Hilos del proceso (pico): {hilos_pico}")
+    print(f"Proveedor: {proveedor.subidas} subidas, {proveedor.envios} envíos, "
+          f"{proveedor.consultas} consultas, {proveedor.webhooks_entregados} webhooks "
+          f"({proveedor.webhooks_fallidos} fallidos)")
+    # Sin sondeo, cada transcripción se consulta una sola vez: al recibir su webhook
+    if pendientes or proveedor.consultas > proveedor.envios:
+        print("ERROR: trabajos sin terminar o consultas de sondeo al proveedor.", file=sys.stderr)
+        return 1
+    return 0
+
+
+def _servidor_subidas_keep_alive():
+    """
+    Servidor HTTP/1.1 mínimo que responde como /v2/upload y cuenta conexiones TCP.
+    (El servidor de desarrollo de Werkzeug cierra cada conexión, así que no sirve para medir keep-alive.)
+    """
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    conexiones = [0]
+    candado = threading.Lock()
+
+    class _Manejador(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Cabeceras y cuerpo en un solo segmento: evita la espera de Nagle + ACK retardado
+        disable_nagle_algorithm = True
+        wbufsize = 64 * 1024
+
+        def setup(self):
+            super().setup()
+            with candado:
+                conexiones[0] += 1
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            cuerpo = b'{"upload_url": "https://cdn.example/audio"}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), _Manejador)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_port}", conexiones
+
+
+def suite_clientes(parametros: dict) -> int:
+    """
+    Costo por petición del cliente del SDK: nuevo en cada llamada vs. compartido por proceso.
+    """
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    import assemblyai as aai
+    import clientes
+
+    servidor, url_base, conexiones = _servidor_subidas_keep_alive()
+    aai.settings.base_url = url_base
+    clave = "falsa"
+    datos = b"\0" * 1024
+    llamadas = max(1, int(500 * parametros["escala"]))
+
+    def _cliente_nuevo():
+        # Con api_key explícita el SDK crea un cliente (y un pool httpx) por Transcriber
+        aai.Transcriber(api_key=clave).upload_file(datos)
+
+    def _anterior():
+        # Lo que hacía cada trabajo: fijar la clave global y crear un Transcriber
+        aai.settings.api_key = clave
+        aai.Transcriber().upload_file(datos)
+
+    def _compartido():
+        clientes.transcriptor(clave).upload_file(datos)
+
+    print(f"{'modo':>14} {'hilos':>6} {'µs/llamada':>11} {'conexiones':>11}")
+    for hilos in (1, 8):
+        for nombre, funcion in (("cliente-nuevo", _cliente_nuevo), ("anterior", _anterior), ("compartido", _compartido)):
+            conexiones[0] = 0
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=hilos) as ejecutor:
+                for futuro in [ejecutor.submit(funcion) for _ in range(llamadas)]:
+                    futuro.result()
+            segundos = time.perf_counter() - inicio
+            print(f"{nombre:>14} {hilos:>6} {segundos / llamadas * 1e6:>11.0f} {conexiones[0]:>11}")
+    print(f"\nHilos vivos al terminar: {threading.active_count()}")
+    print("El servidor es local y sin TLS; contra la API real cada conexión nueva cuesta además un handshake TLS.")
+    servidor.shutdown()
+    return 0
+
+
+def suite_planificador(parametros: dict) -> int:
+    """
+    Ráfaga de transcripciones contra un proveedor falso que responde 429/500: con y sin reintentos.
+    """
+    import contextlib
+    import io
+    import os
+    import tempfile
+
+    import assemblyai as aai
+
+    import lote
+    import metricas
+    import motores
+    import planificador
+    import proveedor_falso
+
+    cantidad = max(1, int(200 * parametros["escala"]))
+    proveedor = proveedor_falso.ProveedorFalso(retardo=0.5, tasa_429=0.1, tasa_500=0.05, max_concurrentes=24)
+    servidor, url_proveedor = _servir_en_hilo(proveedor_falso.crear_app(proveedor))
+    aai.settings.base_url = url_proveedor
+    aai.settings.api_key = "falsa"
+    aai.settings.polling_interval = 0.1
+
+    tmpdir = tempfile.mkdtemp(prefix="bench-planificador-")
+    fuentes = []
+    for i in range(cantidad):
+        ruta = os.path.join(tmpdir, f"audio_{i}.mp3")
+        with open(ruta, "wb") as f:
+            f.write(b"\0" * 4096)
+        fuentes.append(ruta)
+
+    def _procesar(fuente: str) -> None:
+        motores.MotorAssemblyAI().transcribir(fuente, {})
+
+    print(f"{cantidad} transcripciones, 64 hilos; el proveedor rechaza ~10% de los envíos, falla ~5% de las consultas "
+          f"y rechaza con 429 por encima de {proveedor.max_concurrentes} en curso.\n")
+    print(f"{'modo':>14} {'correctas':>10} {'fallidas':>9} {'reintentos':>11} {'429':>6} {'500':>6} {'segundos':>9}")
+    codigo = 0
+    for nombre, reintentos in (("sin-reintentos", 0), ("planificador", 8)):
+        plan = planificador.Planificador(
+            tasa_por_segundo=200, rafaga=50, max_en_vuelo=16, max_en_cola=32,
+            max_reintentos=reintentos, espera_base=0.05, espera_max=2,
+        )
+        planificador._planificador_por_defecto = plan
+        previos = metricas.REINTENTOS.valor()
+        rechazos_429, errores_500 = proveedor.rechazos_429, proveedor.errores_500
+        inicio = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            resumen = lote.ejecutar_lote(fuentes, _procesar, concurrencia=64, planificador=plan)
+        segundos = time.perf_counter() - inicio
+        reintentados = metricas.REINTENTOS.valor() - previos
+        print(f"{nombre:>14} {resumen['correctas']:>10} {resumen['fallidas']:>9} {reintentados:>11.0f} "
+              f"{proveedor.rechazos_429 - rechazos_429:>6} {proveedor.errores_500 - errores_500:>6} {segundos:>9.2f}")
+        if reintentos and resumen["fallidas"]:
+            codigo = 1
+
+    # Contrapresión en la web: con la cola llena, /transcribe/stream responde 429 sin leer el cuerpo
+    import app as aplicacion
+
+    plan = planificador.Planificador(max_en_cola=1)
+    aplicacion.planificador = plan
+    reserva = plan.reservar()
+    respuesta = aplicacion.app.test_client().post(
+        "/transcribe/stream?nombre=a.mp3", data=b"\0" * 1024, headers={"Accept": "application/json"},
+    )
+    plan.liberar(reserva)
+    print(f"\nCola llena en la web: HTTP {respuesta.status_code}, Retry-After: {respuesta.headers.get('Retry-After')}")
+    if respuesta.status_code != 429 or not respuesta.headers.get("Retry-After"):
+        codigo = 1
+
+    servidor.shutdown()
+    return codigo
+
+
+def _corpus_sintetico(directorio: str, cantidad: int, segundos: int = 30) -> list[str]:
+    """
+    Genera con ffmpeg `cantidad` WAV mono de 16 kHz con voz sintética de tonos y
+    ruido (semilla fija: el mismo corpus en cada corrida).
+    """
+    import subprocess
+
+    rutas = []
+    for i in range(cantidad):
+        ruta = f"{directorio}/corpus_{i:03d}.wav"
+        subprocess.run(
+            [
+                "ffmpeg", "-v", "error", "-y",
+                "-f", "lavfi", "-i", f"sine=frequency={180 + 20 * i}:duration={segundos}",
+                "-f", "lavfi", "-i", f"anoisesrc=seed={i}:amplitude=0.05:duration={segundos}",
+                "-filter_complex", "amix=inputs=2,volume=2,tremolo=f=4:d=0.9",
+                "-ac", "1", "-ar", "16000", ruta,
+            ],
+            check=True,
+        )
+        rutas.append(ruta)
+    return rutas
+
+
+def suite_motores(parametros: dict) -> int:
+    """
+    Rendimiento de los motores (assemblyai contra el proveedor falso, local en CPU) sobre un corpus fijo.
+    """
+    import os
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+
+    import assemblyai as aai
+
+    import lote
+    import medios
+    import motores
+    import proveedor_falso
+    import transcribe
+
+    tmpdir = tempfile.mkdtemp(prefix="bench-motores-")
+    if parametros["corpus"]:
+        corpus = lote.expandir_fuentes([parametros["corpus"]])
+        origen = parametros["corpus"]
+    else:
+        corpus = _corpus_sintetico(tmpdir, max(1, int(8 * parametros["escala"])))
+        origen = "sintético (tonos y ruido; usa --corpus con grabaciones reales para cifras representativas)"
+    if not corpus:
+        print("El corpus está vacío.", file=sys.stderr)
+        return 1
+    segundos_audio = sum(medios.duracion_segundos(ruta) for ruta in corpus)
+
+    # El proveedor falso tarda lo que AssemblyAI suele tardar: ~25% de la duración del audio
+    retardo = 0.25 * segundos_audio / len(corpus)
+    proveedor = proveedor_falso.ProveedorFalso(retardo=retardo)
+    servidor, url_proveedor = _servir_en_hilo(proveedor_falso.crear_app(proveedor))
+    aai.settings.base_url = url_proveedor
+    aai.settings.api_key = "falsa"
+    aai.settings.polling_interval = 0.25
+    os.environ["RUTA_INDICE_TRANSCRIPCIONES"] = os.path.join(tmpdir, "indice.sqlite3")
+
+    concurrencia = 8
+    print(f"Corpus: {len(corpus)} archivos, {segundos_audio / 60:.1f} min de audio ({origen})")
+    print(f"Proveedor falso con {retardo:.1f} s de espera por archivo; concurrencia {concurrencia}; {os.cpu_count()} núcleos\n")
+    print(f"{'motor':>10} {'correctas':>10} {'fallidas':>9} {'segundos':>9} {'x tiempo real':>14} {'palabras':>9}")
+
+    codigo = 0
+    for nombre in motores.MOTORES:
+        try:
+            motor = motores.obtener_motor(nombre)
+        except RuntimeError as e:
+            print(f"{nombre:>10} no disponible: {e}")
+            continue
+        opciones = transcribe.procesar_argumentos(["--idioma=es", "--sin-cache", f"--motor={nombre}"])
+        errores: list[str] = []
+
+        def _procesar(ruta: str) -> int:
+            try:
+                _, transcripcion = transcribe.transcribir_audio(ruta, opciones)
+                return len(getattr(transcripcion, "words", None) or [])
+            except Exception as e:
+                errores.append(str(e))
+                return 0
+
+        # Carga del modelo fuera de la medición (la paga una vez cada proceso)
+        if nombre == "local":
+            _procesar(corpus[0])
+            errores.clear()
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrencia) as ejecutor:
+            palabras = sum(ejecutor.map(_procesar, corpus))
+        duracion = time.perf_counter() - inicio
+        correctas = len(corpus) - len(errores)
+        print(f"{nombre:>10} {correctas:>10} {len(errores):>9} {duracion:>9.2f} "
+              f"{segundos_audio / duracion:>13.1f}x {palabras:>9}")
+        if errores:
+            print(f"{'':>10} primer error: {errores[0]}")
+            codigo = 1
+        if hasattr(motor, "cerrar"):
+            motor.cerrar()
+
+    servidor.shutdown()
+    return codigo
+
+
+def _puerto_libre() -> int:
+    import socket
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _leer_eventos_sse(url: str, eventos: list, limite: float) -> None:
+    """
+    Agrega a `eventos` los eventos de un flujo SSE hasta "fin"; un fallo se anota como {"tipo": "fallo"}.
+    """
+    import json
+    import urllib.request
+
+    try:
+        with urllib.request.urlopen(url, timeout=limite) as respuesta:
+            for linea in respuesta:
+                if linea.startswith(b"data: "):
+                    evento = json.loads(linea[6:])
+                    eventos.append(evento)
+                    if evento["tipo"] == "fin":
+                        return
+    except Exception as e:
+        eventos.append({"tipo": "fallo", "mensaje": str(e)})
+
+
+def suite_multiproceso(parametros: dict) -> int:
+    """
+    Prueba de carga con gunicorn y varios workers: trabajos, descargas, webhooks, /metrics y sesiones en vivo desde cualquier worker.
+    """
+    import json
+    import logging
+    import os
+    import re
+    import sqlite3
+    import subprocess
+    import tempfile
+    import threading
+    import urllib.error
+    import urllib.request
+    from concurrent.futures import ThreadPoolExecutor
+
+    import proveedor_falso
+
+    workers = 4
+    cantidad = max(1, int(200 * parametros["escala"]))
+    sesiones = max(1, int(4 * parametros["escala"]))
+    retardo = 2.0
+    proveedor = proveedor_falso.ProveedorFalso(retardo=retardo)
+    servidor_proveedor, url_proveedor = _servir_en_hilo(proveedor_falso.crear_app(proveedor))
+    puerto_tiempo_real = _puerto_libre()
+    servidor_tiempo_real = proveedor_falso.servir_tiempo_real(puerto_tiempo_real)
+    # Al detener gunicorn, los WebSockets de las sesiones sin cerrar se cortan: no es un fallo de la prueba
+    logging.getLogger("websockets").setLevel(logging.CRITICAL)
+    directorio = os.path.dirname(os.path.abspath(__file__))
+
+    def _pedir(url: str, cuerpo: bytes | None = None) -> tuple[int, bytes]:
+        # Una conexión nueva por petición: el sistema reparte cada una entre los workers
+        peticion = urllib.request.Request(url, cuerpo, {"Accept": "application/json"})
+        try:
+            with urllib.request.urlopen(peticion, timeout=30) as respuesta:
+                return respuesta.status, respuesta.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def _trabajos(url_app: str, compartido: bool) -> dict:
+        def _enviar(i: int) -> str:
+            _, cuerpo = _pedir(f"{url_app}/transcribe/stream?nombre=carga_{i}.mp3&idioma=es", b"\0" * 16 * 1024)
+            return json.loads(cuerpo)["id"]
+
+        def _consultar(id_trabajo: str) -> tuple[str, int, dict]:
+            codigo, cuerpo = _pedir(f"{url_app}/jobs/{id_trabajo}")
+            return id_trabajo, codigo, json.loads(cuerpo)
+
+        with ThreadPoolExecutor(max_workers=32) as ejecutor:
+            pendientes = set(ejecutor.map(_enviar, range(cantidad)))
+        r = {"completados": 0, "errores": 0, "no_encontrados": 0, "descargas_fallidas": 0}
+        # Sin estado compartido los webhooks que llegan a otro worker se pierden: no se espera tanto
+        limite = time.monotonic() + retardo + (60 if compartido else 15)
+        while pendientes and time.monotonic() < limite:
+            with ThreadPoolExecutor(max_workers=16) as ejecutor:
+                respuestas = list(ejecutor.map(_consultar, list(pendientes)))
+            for id_trabajo, codigo, datos in respuestas:
+                if codigo == 404:
+                    r["no_encontrados"] += 1
+                elif datos["estado"] == "completado":
+                    pendientes.discard(id_trabajo)
+                    r["completados"] += 1
+                    if _pedir(url_app + datos["descargas"]["txt"])[0] != 200:
+                        r["descargas_fallidas"] += 1
+                elif datos["estado"] == "error":
+                    pendientes.discard(id_trabajo)
+                    r["errores"] += 1
+            time.sleep(0.2)
+        r["sin_terminar"] = len(pendientes)
+        return r
+
+    def _sesion_en_vivo(url_app: str) -> tuple[int, int, bool]:
+        """
+        Retorna (tramas rechazadas, turnos finales recibidos, llegó "fin").
+        """
+        codigo, cuerpo = _pedir(f"{url_app}/live", b"{}")
+        if codigo != 201:
+            return -1, 0, False
+        urls = json.loads(cuerpo)
+        eventos: list = []
+        lector = threading.Thread(target=_leer_eventos_sse, args=(url_app + urls["eventos"], eventos, 60), daemon=True)
+        lector.start()
+        rechazadas = 0
+        for _ in range(40):
+            if _pedir(url_app + urls["audio"], b"\0" * 3200)[0] != 204:
+                rechazadas += 1
+            time.sleep(0.1)
+        _pedir(url_app + urls["terminar"], b"")
+        # Sin estado compartido el cierre puede llegar a otro worker y el flujo no termina nunca
+        lector.join(15)
+        finales = sum(1 for e in eventos if e["tipo"] == "final")
+        return rechazadas, finales, any(e["tipo"] == "fin" for e in eventos)
+
+    def _probar(compartido: bool) -> dict:
+        tmpdir = tempfile.mkdtemp(prefix="bench-multiproceso-")
+        puerto = _puerto_libre()
+        url_app = f"http://127.0.0.1:{puerto}"
+        entorno = dict(
+            os.environ,
+            URL_API_ASSEMBLYAI=url_proveedor,
+            URL_TIEMPO_REAL_ASSEMBLYAI=f"ws://127.0.0.1:{puerto_tiempo_real}",
+            CLAVE_API_ASSEMBLYAI="falsa",
+            URL_PUBLICA_WEBHOOK=url_app,
+            CACHE_TRANSCRIPCIONES="0",
+            RUTA_INDICE_TRANSCRIPCIONES=os.path.join(tmpdir, "indice.sqlite3"),
+            ESTADO_COMPARTIDO="1" if compartido else "0",
+            RUTA_ESTADO_COMPARTIDO=os.path.join(tmpdir, "estado.sqlite3"),
+            SEGUNDOS_PUBLICACION_METRICAS="1",
+            LIMITE_PETICIONES_POR_SEGUNDO="0",
+            MAX_TRABAJOS_EN_COLA=str(cantidad),
+        )
+        servidor = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "app:app", f"--workers={workers}", "--threads=8",
+             f"--bind=127.0.0.1:{puerto}", "--log-level=warning", "--graceful-timeout=5"],
+            cwd=directorio, env=entorno,
+        )
+        try:
+            limite = time.monotonic() + 30
+            while True:
+                try:
+                    if _pedir(f"{url_app}/metrics")[0] == 200:
+                        break
+                except OSError:
+                    pass
+                if time.monotonic() > limite:
+                    raise RuntimeError("gunicorn no respondió a tiempo")
+                time.sleep(0.2)
+
+            resultado = _trabajos(url_app, compartido)
+            with ThreadPoolExecutor(max_workers=sesiones) as ejecutor:
+                en_vivo = list(ejecutor.map(lambda _: _sesion_en_vivo(url_app), range(sesiones)))
+            resultado["tramas_rechazadas"] = sum(max(r, 0) for r, _, _ in en_vivo)
+            resultado["sesiones_ok"] = sum(1 for r, finales, fin in en_vivo if r == 0 and finales and fin)
+
+            # Cada worker publica sus métricas cada segundo; todas las respuestas deben coincidir
+            time.sleep(1.5)
+            webhooks = set()
+            for _ in range(2 * workers):
+                texto = _pedir(f"{url_app}/metrics")[1].decode("utf-8")
+                valor = re.search(r'transcriptor_etapa_segundos_count\{etapa="espera_webhook"\} (\S+)', texto)
+                webhooks.add(float(valor.group(1)) if valor else 0.0)
+            resultado["metricas"] = sorted(webhooks)
+
+            resultado["por_worker"] = []
+            if compartido:
+                with sqlite3.connect(entorno["RUTA_ESTADO_COMPARTIDO"]) as con:
+                    resultado["por_worker"] = [n for (n,) in con.execute("SELECT COUNT(*) FROM trabajos GROUP BY proceso")]
+            return resultado
+        finally:
+            servidor.terminate()
+            servidor.wait(timeout=30)
+
+    print(f"{cantidad} trabajos con webhook y {sesiones} sesiones en vivo contra gunicorn con {workers} workers.\n")
+    print(f"{'modo':>12} {'completados':>12} {'sin terminar':>13} {'404 estado':>11} {'descargas 404':>14} "
+          f"{'webhooks en /metrics':>21} {'en vivo ok':>11} {'tramas 404':>11}")
+    codigo = 0
+    for nombre, compartido in (("en-memoria", False), ("compartido", True)):
+        r = _probar(compartido)
+        metricas_vistas = "/".join(f"{v:.0f}" for v in r["metricas"])
+        print(f"{nombre:>12} {r['completados']:>12} {r['sin_terminar']:>13} {r['no_encontrados']:>11} "
+              f"{r['descargas_fallidas']:>14} {metricas_vistas:>21} {r['sesiones_ok']:>7}/{sesiones:<3} "
+              f"{r['tramas_rechazadas']:>11}")
+        if r["por_worker"]:
+            print(f"{'':>12} trabajos por worker: {sorted(r['por_worker'], reverse=True)}")
+        if compartido and (
+            r["completados"] != cantidad or r["no_encontrados"] or r["descargas_fallidas"]
+            or r["metricas"] != [float(cantidad)] or r["sesiones_ok"] != sesiones
+        ):
+            print("ERROR: con estado compartido todos los workers deben ver lo mismo.", file=sys.stderr)
+            codigo = 1
+
+    servidor_proveedor.shutdown()
+    servidor_tiempo_real.shutdown()
+    return codigo
+
+
+def _analizar_referencia(utterances, umbral_silencio_ms: int) -> dict:
+    """
+    Misma analítica que analitica.analizar, recorriendo los utterances uno a uno en Python.
+    """
+    from exportacion import nombre_hablante
+
+    ordenados = sorted(utterances, key=lambda u: u.start)
+    por_hablante: dict[str, dict] = {}
+    for etiqueta in sorted({str(u.speaker) for u in ordenados}):
+        por_hablante[etiqueta] = dict.fromkeys(
+            ("tiempo", "palabras", "turnos", "suma_turnos", "turno_max", "interrupciones", "interrumpido", "solape"), 0,
+        )
+    total = dict(turnos=0, solapamientos=0, solapamiento_ms=0, interrupciones=0)
+    silencios = []
+    anterior = None
+    fin_previo = 0
+    dueno = None  # hablante del fin más tardío hasta ahora
+    turno = None  # [etiqueta, inicio, fin]
+
+    def _cerrar_turno():
+        datos = por_hablante[turno[0]]
+        largo = max(turno[2] - turno[1], 0)
+        datos["turnos"] += 1
+        datos["suma_turnos"] += largo
+        datos["turno_max"] = max(datos["turno_max"], largo)
+        total["turnos"] += 1
+
+    for u in ordenados:
+        etiqueta = str(u.speaker)
+        datos = por_hablante[etiqueta]
+        datos["tiempo"] += max(u.end - u.start, 0)
+        datos["palabras"] += len(u.words or ()) or len(u.text.split())
+        if anterior is not None:
+            hueco = u.start - fin_previo
+            if hueco > 0:
+                silencios.append(hueco)
+            if etiqueta != dueno:
+                solape = max(min(u.end, fin_previo) - u.start, 0)
+                if solape:
+                    total["solapamientos"] += 1
+                    total["solapamiento_ms"] += solape
+                    datos["solape"] += solape
+                if hueco < 0 and u.end > fin_previo:
+                    total["interrupciones"] += 1
+                    datos["interrupciones"] += 1
+                    por_hablante[dueno]["interrumpido"] += 1
+        if turno is not None and turno[0] == etiqueta:
+            turno[2] = max(turno[2], u.end)
+        else:
+            if turno is not None:
+                _cerrar_turno()
+            turno = [etiqueta, u.start, u.end]
+        if anterior is None or u.end > fin_previo:
+            dueno = etiqueta
+        anterior = etiqueta
+        fin_previo = max(fin_previo, u.end)
+    _cerrar_turno()
+
+    total_habla = sum(d["tiempo"] for d in por_hablante.values())
+    return {
+        "hablantes": [
+            {
+                "etiqueta": etiqueta,
+                "nombre": nombre_hablante(etiqueta),
+                "tiempo_habla_ms": d["tiempo"],
+                "porcentaje_habla": round(d["tiempo"] / total_habla * 100, 1) if total_habla else 0.0,
+                "palabras": d["palabras"],
+                "palabras_por_minuto": round(d["palabras"] / (d["tiempo"] / 60000), 1) if d["tiempo"] else 0.0,
+                "turnos": d["turnos"],
+                "turno_medio_ms": int(d["suma_turnos"] / d["turnos"]) if d["turnos"] else 0,
+                "turno_max_ms": d["turno_max"],
+                "interrupciones": d["interrupciones"],
+                "interrumpido": d["interrumpido"],
+                "solapamiento_ms": d["solape"],
+            }
+            for etiqueta, d in por_hablante.items()
+        ],
+        **total,
+        "silencio_total_ms": sum(silencios),
+        "silencio_medio_ms": int(sum(silencios) / len(silencios)) if silencios else 0,
+        "silencio_max_ms": max(silencios, default=0),
+        "silencios_largos": sum(1 for s in silencios if s >= umbral_silencio_ms),
+        "umbral_silencio_ms": umbral_silencio_ms,
+    }
+
+
+def _conversacion_sintetica(turnos: int, semilla: int) -> list:
+    """
+    Llamada sintética de 2 a 3 hablantes con silencios, "ajás" dentro del turno
+    ajeno e interrupciones.
+    """
+    from modelos import Palabra, Segmento
+
+    azar = random.Random(semilla)
+    # Como en las transcripciones reales, cada utterance trae sus palabras; la
+    # analítica solo las cuenta, así que se comparte una lista por largo
+    palabras_por_largo = {n: [Palabra("x", 0, 0)] * n for n in range(1, 41)}
+    hablantes = "ABC"[:azar.randint(2, 3)]
+    resultado = []
+    tiempo = 0
+    actual = "A"
+    for _ in range(turnos):
+        palabras = azar.randint(2, 40)
+        duracion = palabras * azar.randint(250, 450)
+        texto = " ".join(azar.choice(_VOCABULARIO) for _ in range(palabras))
+        resultado.append(Segmento(actual, texto, tiempo, tiempo + duracion, words=palabras_por_largo[palabras]))
+        if azar.random() < 0.15:
+            medio = tiempo + duracion // 2
+            resultado.append(Segmento(azar.choice(hablantes.replace(actual, "")), "ajá", medio, medio + 400, words=palabras_por_largo[1]))
+        actual = azar.choice(hablantes.replace(actual, ""))
+        # Silencio, respuesta inmediata o interrupción
+        tiempo += duracion + azar.choice((azar.randint(100, 900), azar.randint(2000, 6000), -azar.randint(200, 1500)))
+        tiempo = max(tiempo, 0)
+    return resultado
+
+
+def suite_analitica(parametros: dict) -> int:
+    """
+    Analítica de hablantes de muchas llamadas: bucle por utterance vs. columnas de NumPy.
+    """
+    import analitica
+
+    umbral = analitica.UMBRAL_SILENCIO_MS
+    print(f"{'llamadas':>9} {'turnos':>7} {'impl':>12} {'seg':>8} {'llamadas/s':>11}")
+    for llamadas, turnos in ((10_000, 80), (2_000, 600), (100, 20_000)):
+        llamadas = max(1, int(llamadas * parametros["escala"]))
+        corpus = [_conversacion_sintetica(turnos, semilla) for semilla in range(llamadas)]
+        resultados = []
+        for nombre, funcion in (
+            ("bucle", lambda: [_analizar_referencia(u, umbral) for u in corpus]),
+            ("vectorizada", lambda: [analitica.analizar(u, umbral_silencio_ms=umbral) for u in corpus]),
+        ):
+            inicio = time.perf_counter()
+            resultados.append(funcion())
+            segundos = time.perf_counter() - inicio
+            print(f"{llamadas:>9} {turnos:>7} {nombre:>12} {segundos:>8.3f} {llamadas / segundos:>11.0f}")
+        if resultados[0] != resultados[1]:
+            print("ERROR: los resultados difieren.", file=sys.stderr)
+            return 1
+    print("\nResultados idénticos en todos los casos.")
+    return 0
+
+
+# Presupuesto de arranque (ms de importación, mediana) por comando; los módulos
+# de MODULOS_PESADOS solo deben cargarse al transcribir
+PRESUPUESTO_ARRANQUE_MS = {
+    "import transcribe": 150,
+    "import app": 400,
+    "transcribe.py --ayuda": 150,
+    "transcribe.py --listar-idiomas": 150,
+}
+MODULOS_PESADOS = ("assemblyai", "httpx", "pydantic", "websockets", "faster_whisper", "multiprocessing", "numpy")
+
+
+def _importaciones(argumentos: list[str], directorio: str, entorno: dict) -> tuple[dict[str, int], set[str], float]:
+    """
+    Ejecuta `python -X importtime <argumentos>` y retorna ({módulo de primer
+    nivel: µs acumulados}, todos los módulos importados, segundos del proceso).
+    """
+    import subprocess
+
+    inicio = time.perf_counter()
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", *argumentos],
+        cwd=directorio, env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True,
+    )
+    duracion = time.perf_counter() - inicio
+    primer_nivel: dict[str, int] = {}
+    todos: set[str] = set()
+    for linea in proceso.stderr.splitlines():
+        # "import time:   propio |  acumulado | <2 espacios por nivel>módulo"
+        partes = linea.split("|")
+        if len(partes) != 3 or not partes[1].strip().isdigit():
+            continue
+        nombre = partes[2][1:]
+        todos.add(nombre.strip())
+        if not nombre.startswith(" "):
+            primer_nivel[nombre] = int(partes[1])
+    return primer_nivel, todos, duracion
+
+
+def suite_arranque(parametros: dict) -> int:
+    """
+    Tiempo de importación (-X importtime) de la CLI y la app web frente a un presupuesto.
+    """
+    import os
+    import statistics
+
+    directorio = os.path.dirname(os.path.abspath(__file__))
+    # main() pide una clave antes de mirar los argumentos; no se usa para nada más
+    entorno = dict(os.environ, CLAVE_API_ASSEMBLYAI="falsa")
+    repeticiones = max(1, int(5 * parametros["escala"]))
+    comandos = {
+        "import transcribe": ["-c", "import transcribe"],
+        "import app": ["-c", "import app"],
+        "transcribe.py --ayuda": ["transcribe.py", "--ayuda"],
+        "transcribe.py --listar-idiomas": ["transcribe.py", "--listar-idiomas"],
+    }
+
+    # Lo que el intérprete ya importa al arrancar no cuenta para el presupuesto
+    _, base, _ = _importaciones(["-c", "pass"], directorio, entorno)
+    procesos_base = [_importaciones(["-c", "pass"], directorio, entorno)[2] for _ in range(repeticiones)]
+    print(f"Arranque del intérprete sin importar nada: {statistics.median(procesos_base) * 1000:.0f} ms\n")
+
+    codigo = 0
+    print(f"{'comando':<32} {'importación':>12} {'proceso':>9} {'presupuesto':>12}  resultado")
+    for nombre, argumentos in comandos.items():
+        totales = []
+        procesos = []
+        cargados: set[str] = set()
+        for _ in range(repeticiones):
+            primer_nivel, todos, duracion = _importaciones(argumentos, directorio, entorno)
+            totales.append(sum(us for m, us in primer_nivel.items() if m not in base) / 1000)
+            procesos.append(duracion * 1000)
+            cargados |= {m.split(".")[0] for m in todos} & set(MODULOS_PESADOS)
+        importacion = statistics.median(totales)
+        presupuesto = PRESUPUESTO_ARRANQUE_MS[nombre]
+        pesados = sorted(cargados)
+        if importacion > presupuesto or pesados:
+            codigo = 1
+            resultado = "EXCEDE" + (f" (carga {', '.join(pesados)})" if pesados else "")
+        else:
+            resultado = "ok"
+        print(f"{nombre:<32} {importacion:>9.0f} ms {statistics.median(procesos):>6.0f} ms {presupuesto:>9} ms  {resultado}")
+
+    # Referencia: lo que cuesta el SDK que ya no se importa al arrancar
+    try:
+        sdk, _, _ = _importaciones(["-c", "import assemblyai"], directorio, entorno)
+        print(f"\nReferencia: import assemblyai cuesta {sdk.get('assemblyai', 0) / 1000:.0f} ms")
+    except Exception:
+        pass
+    return codigo
+
+
+SUITES = {
+    "clasificador": suite_clasificador,
+    "formato": suite_formato,
+    "renderizado": suite_renderizado,
+    "exportacion": suite_exportacion,
+    "busqueda": suite_busqueda,
+    "analitica": suite_analitica,
+    "webhooks": suite_webhooks,
+    "clientes": suite_clientes,
+    "planificador": suite_planificador,
+    "motores": suite_motores,
+    "multiproceso": suite_multiproceso,
+    "arranque": suite_arranque,
+}
+
+
+def main() -> int:
+    args = sys.argv[1:]
+    parametros = {"tamano_max_mb": 50.0, "escala": 1.0, "corpus": None}
+    suite = None
+    for arg in args:
+        if arg == "--listar":
+            for nombre, funcion in SUITES.items():
+                print(f"- {nombre}: {(funcion.__doc__ or '').strip().splitlines()[0]}")
+            return 0
+        elif arg.startswith("--tamano-max-mb="):
+            parametros["tamano_max_mb"] = float(arg.split("=", 1)[1])
+        elif arg.startswith("--escala="):
+            parametros["escala"] = float(arg.split("=", 1)[1])
+        elif arg.startswith("--corpus="):
+            parametros["corpus"] = arg.split("=", 1)[1]
+        elif suite is None:
+            suite = arg
+
+    if suite not in SUITES:
+        print(__doc__)
+        print("Suites disponibles: " + ", ".join(SUITES))
+        return 1
+    return SUITES[suite](parametros)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,182 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from modelos import TranscripcionLocal
+
+
+# Tamaño de bloque para calcular el hash del archivo sin cargarlo completo
+TAMANO_BLOQUE_HASH = 1024 * 1024
+# Al superar max_bytes se desaloja hasta quedar en esta fracción del máximo
+FRACCION_TRAS_DESALOJO = 0.9
+
+
+def nuevo_hash():
+    return hashlib.blake2b(digest_size=32)
+
+
+def hash_archivo(ruta: str) -> str:
+    """
+    Calcula el hash BLAKE2b del contenido del archivo, leyéndolo por bloques.
+    """
+    h = nuevo_hash()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(TAMANO_BLOQUE_HASH), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def calcular_clave(hash_medio: str, configuracion: dict) -> str:
+    """
+    Clave de caché: hash del medio + configuración de transcripción normalizada.
+    """
+    h = nuevo_hash()
+    h.update(hash_medio.encode("ascii"))
+    h.update(json.dumps(configuracion, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    return h.hexdigest()
+
+
+class CacheTranscripciones:
+    """
+    Caché en disco de transcripciones, direccionada por contenido.
+
+    Cada entrada es un JSON comprimido. La fecha de modificación del archivo se
+    actualiza en cada acierto y se usa como orden LRU al desalojar; las entradas
+    más antiguas que `ttl_segundos` (desde su creación) se consideran vencidas.
+
+    El directorio completo solo se recorre en la primera escritura, cuando el
+    total estimado supera max_bytes o cada `intervalo_barrido` segundos (para los
+    vencimientos y lo que escriban otros procesos); entre tanto cada escritura
+    suma su tamaño al total.
+    """
+
+    def __init__(self, directorio: str, max_bytes: int, ttl_segundos: float, intervalo_barrido: float = 3600):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.ttl_segundos = ttl_segundos
+        self.intervalo_barrido = intervalo_barrido
+        self._candado = threading.Lock()
+        # Bytes ocupados según el último barrido más lo escrito después (None = sin barrer)
+        self._total: int | None = None
+        self._ultimo_barrido = 0.0
+
+    def _ruta(self, clave: str) -> str:
+        return os.path.join(self.directorio, clave[:2], f"{clave}.json.gz")
+
+    def obtener(self, clave: str) -> TranscripcionLocal | None:
+        ruta = self._ruta(clave)
+        try:
+            with gzip.open(ruta, "rt", encoding="utf-8") as f:
+                datos = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - datos.get("creado", 0) > self.ttl_segundos:
+            self._eliminar(ruta)
+            return None
+
+        try:
+            os.utime(ruta)  # marca de uso reciente para el LRU
+        except OSError:
+            pass
+        return TranscripcionLocal.desde_dict(datos["transcripcion"])
+
+    def guardar(self, clave: str, transcripcion: TranscripcionLocal) -> None:
+        ruta = self._ruta(clave)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        datos = {"creado": time.time(), "transcripcion": transcripcion.a_dict()}
+
+        # Escritura atómica: otro proceso nunca ve una entrada a medio escribir
+        fd, ruta_tmp = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as crudo, gzip.open(crudo, "wt", encoding="utf-8") as f:
+                json.dump(datos, f, ensure_ascii=False, separators=(",", ":"))
+            tamano = os.path.getsize(ruta_tmp)
+            os.replace(ruta_tmp, ruta)
+        except Exception:
+            self._eliminar(ruta_tmp)
+            raise
+
+        with self._candado:
+            if self._total is not None:
+                self._total += tamano
+            barrer = (
+                self._total is None
+                or self._total > self.max_bytes
+                or time.monotonic() - self._ultimo_barrido >= self.intervalo_barrido
+            )
+        if barrer:
+            self._desalojar()
+
+    def _desalojar(self) -> None:
+        """
+        Recorre la caché: elimina entradas vencidas y, si se supera max_bytes, las
+        menos usadas recientemente. Deja el total exacto en `_total`.
+        """
+        with self._candado:
+            ahora = time.time()
+            entradas = []
+            total = 0
+            for raiz, _, archivos in os.walk(self.directorio):
+                for nombre in archivos:
+                    if not nombre.endswith(".json.gz"):
+                        continue
+                    ruta = os.path.join(raiz, nombre)
+                    try:
+                        info = os.stat(ruta)
+                    except OSError:
+                        continue
+                    # mtime >= creación, así que si el último uso ya venció, la entrada también
+                    if ahora - info.st_mtime > self.ttl_segundos:
+                        self._eliminar(ruta)
+                        continue
+                    entradas.append((info.st_mtime, info.st_size, ruta))
+                    total += info.st_size
+
+            if total > self.max_bytes:
+                # Se baja hasta FRACCION_TRAS_DESALOJO del máximo para que las
+                # siguientes escrituras no vuelvan a disparar un barrido enseguida
+                objetivo = self.max_bytes * FRACCION_TRAS_DESALOJO
+                entradas.sort()
+                for _, tamano, ruta in entradas:
+                    if total <= objetivo:
+                        break
+                    self._eliminar(ruta)
+                    total -= tamano
+            self._total = total
+            self._ultimo_barrido = time.monotonic()
+
+    @staticmethod
+    def _eliminar(ruta: str) -> None:
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
+
+
+_cache_por_defecto: CacheTranscripciones | None = None
+_candado_por_defecto = threading.Lock()
+
+
+def cache_por_defecto() -> CacheTranscripciones | None:
+    """
+    Caché compartida por la CLI y la app web, configurada por variables de entorno.
+    Retorna None si está desactivada con CACHE_TRANSCRIPCIONES=0.
+    """
+    global _cache_por_defecto
+    if os.getenv("CACHE_TRANSCRIPCIONES", "1") == "0":
+        return None
+    with _candado_por_defecto:
+        if _cache_por_defecto is None:
+            directorio = os.getenv(
+                "RUTA_CACHE_TRANSCRIPCIONES",
+                os.path.join(os.path.expanduser("~"), ".cache", "transcriptor", "transcripciones"),
+            )
+            max_bytes = int(float(os.getenv("CACHE_MAX_MB", "1024")) * 1024 * 1024)
+            ttl = float(os.getenv("CACHE_TTL_DIAS", "30")) * 86400
+            _cache_por_defecto = CacheTranscripciones(directorio, max_bytes, ttl)
+        return _cache_por_defecto
@@ -0,0 +1,161 @@
+import csv
+import hashlib
+import html
+import os
+import threading
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Ruta al CSV con el catálogo completo de idiomas
+RUTA_CSV_POR_DEFECTO = os.path.join(BASE_DIR, "Grid view.csv")
+
+# Fallback mínimo por si el CSV no existe o falla la lectura
+IDIOMAS_RESPALDO = [
+    ("en", "Inglés"),
+    ("es", "Español"),
+    ("fr", "Francés"),
+    ("de", "Alemán"),
+    ("it", "Italiano"),
+    ("pt", "Portugués"),
+    ("nl", "Holandés"),
+    ("ru", "Ruso"),
+    ("zh", "Chino Mandarín"),
+    ("ja", "Japonés"),
+    ("ko", "Coreano"),
+]
+
+
+class EntradaIdioma:
+    def __init__(self, codigo: str, nombre: str):
+        self.codigo = codigo
+        self.nombre = nombre
+        self.etiqueta = f"{codigo} ({nombre})"
+        # Misma clave que se usaba al ordenar las etiquetas "xx (Nombre)"
+        self.clave_orden = self.etiqueta.split("(")[-1].lower()
+
+
+def _leer_csv(ruta_csv: str) -> list[EntradaIdioma] | None:
+    """
+    Lee las columnas "Language" y "Language Code"; None si el CSV no sirve.
+    """
+    entradas: list[EntradaIdioma] = []
+    codigos_vistos: set[str] = set()
+
+    # utf-8-sig maneja BOM al inicio del archivo (p. ej., exportado desde hojas de cálculo)
+    with open(ruta_csv, "r", encoding="utf-8-sig") as f:
+        lector = csv.reader(f)
+        encabezados = next(lector, None)
+        if not encabezados:
+            return None
+
+        # Determina índices de columnas relevantes
+        try:
+            idx_nombre = encabezados.index("Language")
+            idx_codigo = encabezados.index("Language Code")
+        except ValueError:
+            return None
+
+        for fila in lector:
+            if not fila or len(fila) <= max(idx_nombre, idx_codigo):
+                continue
+            nombre = (fila[idx_nombre] or "").strip()
+            codigo = (fila[idx_codigo] or "").strip()
+            if not nombre or not codigo or codigo in codigos_vistos:
+                continue
+            codigos_vistos.add(codigo)
+            entradas.append(EntradaIdioma(codigo, nombre))
+
+    # Ordena por nombre visible para facilitar la lectura
+    entradas.sort(key=lambda e: e.clave_orden)
+    return entradas or None
+
+
+class CatalogoIdiomas:
+    """
+    Catálogo de idiomas cargado una sola vez y recargado solo si cambia el CSV.
+
+    Ofrece las entradas ya ordenadas, búsqueda por código en O(1) y la lista de
+    <option> ya renderizada, junto con una versión apta para usar como ETag.
+    """
+
+    def __init__(self, ruta_csv: str):
+        self.ruta_csv = ruta_csv
+        self._candado = threading.Lock()
+        self._firma = object()  # fuerza la primera carga
+        self._entradas: list[EntradaIdioma] = []
+        self._por_codigo: dict[str, EntradaIdioma] = {}
+        self._opciones_html = ""
+        self.version = ""
+
+    def _firma_actual(self):
+        try:
+            info = os.stat(self.ruta_csv)
+            return (info.st_mtime_ns, info.st_size)
+        except OSError:
+            return None
+
+    def _asegurar_cargado(self) -> None:
+        firma = self._firma_actual()
+        if firma == self._firma:
+            return
+        with self._candado:
+            if firma == self._firma:
+                return
+            entradas = None
+            if firma is not None:
+                try:
+                    entradas = _leer_csv(self.ruta_csv)
+                except Exception:
+                    # Ante cualquier error inesperado, no interrumpir el flujo principal
+                    entradas = None
+            if entradas is None:
+                entradas = [EntradaIdioma(c, n) for c, n in IDIOMAS_RESPALDO]
+
+            self._entradas = entradas
+            self._por_codigo = {e.codigo: e for e in entradas}
+            self._opciones_html = "\n".join(
+                f'<option value="{html.escape(e.codigo)}">{html.escape(e.etiqueta)}</option>'
+                for e in entradas
+            )
+            self.version = hashlib.blake2b(
+                f"{self.ruta_csv}|{firma}".encode("utf-8"), digest_size=8
+            ).hexdigest()
+            self._firma = firma
+
+    def entradas(self) -> list[EntradaIdioma]:
+        self._asegurar_cargado()
+        return self._entradas
+
+    def etiquetas(self) -> list[str]:
+        return [e.etiqueta for e in self.entradas()]
+
+    def buscar(self, codigo: str) -> EntradaIdioma | None:
+        self._asegurar_cargado()
+        return self._por_codigo.get(codigo)
+
+    def contiene(self, codigo: str) -> bool:
+        return self.buscar(codigo) is not None
+
+    def opciones_html(self) -> tuple[str, str]:
+        """
+        Retorna (html_de_opciones, version) de una misma carga del catálogo.
+        """
+        self._asegurar_cargado()
+        with self._candado:
+            return self._opciones_html, self.version
+
+
+_catalogos: dict[str, CatalogoIdiomas] = {}
+_candado_catalogos = threading.Lock()
+
+
+def obtener_catalogo(ruta_csv: str | None = None) -> CatalogoIdiomas:
+    """
+    Catálogo compartido por ruta de CSV (uno por proceso).
+    """
+    ruta = os.path.abspath(ruta_csv or RUTA_CSV_POR_DEFECTO)
+    with _candado_catalogos:
+        catalogo = _catalogos.get(ruta)
+        if catalogo is None:
+            catalogo = _catalogos[ruta] = CatalogoIdiomas(ruta)
+        return catalogo
@@ -0,0 +1,134 @@
+"""
+Clientes del SDK de AssemblyAI compartidos por todo el proceso.
+
+Cada aai.Client tiene su propio pool de conexiones httpx; reutilizarlo mantiene
+las conexiones keep-alive (y su TLS) entre trabajos, lotes y fragmentos. El
+cliente y el Transcriber no guardan estado por petición, así que los pueden
+usar a la vez los hilos de gunicorn y los pools de trabajos.
+
+El SDK se importa la primera vez que se usa (ver sdk()): su carga cuesta más
+que el resto del programa y los comandos que no transcriben no lo necesitan.
+"""
+import os
+import threading
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import assemblyai as aai
+
+
+_sdk = None
+_clave_por_defecto: str | None = None
+
+
+def sdk():
+    """
+    Retorna el módulo `assemblyai`, importándolo (y aplicando URL_API_ASSEMBLYAI
+    y la clave de configurar_clave) la primera vez.
+    """
+    global _sdk
+    if _sdk is None:
+        import assemblyai
+
+        # Permite apuntar el SDK a otro servidor compatible (p. ej. proveedor_falso.py en pruebas de carga)
+        if os.getenv("URL_API_ASSEMBLYAI"):
+            assemblyai.settings.base_url = os.getenv("URL_API_ASSEMBLYAI")
+        if _clave_por_defecto:
+            assemblyai.settings.api_key = _clave_por_defecto
+        _sdk = assemblyai
+    return _sdk
+
+
+def configurar_clave(clave_api: str) -> None:
+    """
+    Clave por defecto del SDK; no lo importa si aún no se usó.
+    """
+    global _clave_por_defecto
+    _clave_por_defecto = clave_api
+    if _sdk is not None:
+        _sdk.settings.api_key = clave_api
+
+
+class GestorClientes:
+    """
+    Un cliente (y su Transcriber) por combinación de API key y URL base.
+    """
+
+    def __init__(self):
+        self._candado = threading.Lock()
+        self._clientes: dict[tuple, "aai.Client"] = {}
+        self._transcriptores: dict[tuple, "aai.Transcriber"] = {}
+
+    def _clave(self, clave_api: str | None) -> tuple:
+        aai = sdk()
+        return (clave_api or aai.settings.api_key, aai.settings.base_url)
+
+    def _cliente(self, clave: tuple) -> "aai.Client":
+        # Se llama con el candado tomado
+        cliente = self._clientes.get(clave)
+        if cliente is None:
+            aai = sdk()
+            cliente = self._clientes[clave] = aai.Client(settings=aai.settings, api_key=clave[0])
+        return cliente
+
+    def cliente(self, clave_api: str | None = None) -> "aai.Client":
+        """
+        Cliente reutilizable; sin `clave_api` usa la de aai.settings (o ASSEMBLYAI_API_KEY).
+        """
+        clave = self._clave(clave_api)
+        cliente = self._clientes.get(clave)
+        if cliente is not None:
+            return cliente
+        with self._candado:
+            return self._cliente(clave)
+
+    def transcriptor(self, clave_api: str | None = None) -> "aai.Transcriber":
+        clave = self._clave(clave_api)
+        transcriptor = self._transcriptores.get(clave)
+        if transcriptor is not None:
+            return transcriptor
+        with self._candado:
+            transcriptor = self._transcriptores.get(clave)
+            if transcriptor is None:
+                # max_workers=1: el pool interno del SDK solo se usa en los métodos *_async
+                transcriptor = self._transcriptores[clave] = sdk().Transcriber(
+                    client=self._cliente(clave), max_workers=1,
+                )
+            return transcriptor
+
+    def transcripcion(self, id_transcripcion: str, clave_api: str | None = None) -> "aai.Transcript":
+        """
+        Objeto Transcript para `id_transcripcion` ligado al cliente compartido (sin consultarlo aún).
+        """
+        return sdk().Transcript(id_transcripcion, client=self.cliente(clave_api))
+
+    def cerrar(self) -> None:
+        with self._candado:
+            for cliente in self._clientes.values():
+                cliente.http_client.close()
+            self._clientes.clear()
+            self._transcriptores.clear()
+
+
+_gestor_por_defecto: GestorClientes | None = None
+_candado_por_defecto = threading.Lock()
+
+
+def gestor_por_defecto() -> GestorClientes:
+    """
+    Gestor compartido por la CLI, la app web y los pools de lotes y fragmentos.
+    """
+    global _gestor_por_defecto
+    if _gestor_por_defecto is None:
+        with _candado_por_defecto:
+            if _gestor_por_defecto is None:
+                _gestor_por_defecto = GestorClientes()
+    return _gestor_por_defecto
+
+
+def transcriptor(clave_api: str | None = None) -> "aai.Transcriber":
+    return gestor_por_defecto().transcriptor(clave_api)
+
+
+def transcripcion(id_transcripcion: str, clave_api: str | None = None) -> "aai.Transcript":
+    return gestor_por_defecto().transcripcion(id_transcripcion, clave_api)
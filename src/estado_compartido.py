@@ -0,0 +1,441 @@
+"""
+Estado compartido entre los procesos de la app web (workers de gunicorn).
+
+Una base SQLite en modo WAL guarda los trabajos con su resultado, los avisos de
+webhook pendientes, el secreto de los webhooks, las métricas de cada proceso y
+los mensajes de las sesiones en vivo. Así cualquier worker puede responder
+/jobs/<id>, las descargas, los webhooks y /metrics sin sesiones pegajosas.
+
+Lo que no se puede mover de proceso (el hilo que ejecuta un trabajo, el
+WebSocket de una sesión en vivo) sigue en el worker que lo creó, que recoge de
+la base los avisos y el audio que llegan a los demás. Los workers deben
+compartir disco (la base y los directorios de exportación son archivos locales).
+"""
+import json
+import os
+import secrets
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    id TEXT PRIMARY KEY,
+    proceso TEXT NOT NULL,
+    nombre TEXT,
+    estado TEXT NOT NULL,
+    error TEXT,
+    resultado TEXT,
+    directorio_resultados TEXT,
+    creado REAL NOT NULL,
+    actualizado REAL NOT NULL,
+    aviso TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_trabajos_actualizado ON trabajos(actualizado);
+CREATE INDEX IF NOT EXISTS idx_trabajos_avisos ON trabajos(proceso) WHERE aviso IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS procesos (
+    proceso TEXT PRIMARY KEY,
+    latido REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS ajustes (
+    clave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS metricas (
+    proceso TEXT PRIMARY KEY,
+    valores TEXT NOT NULL,
+    actualizado REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS sesiones_tiempo_real (
+    id TEXT PRIMARY KEY,
+    proceso TEXT NOT NULL,
+    latido REAL NOT NULL,
+    terminada INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS mensajes_tiempo_real (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sesion TEXT NOT NULL,
+    destino TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    datos BLOB
+);
+CREATE INDEX IF NOT EXISTS idx_mensajes_tiempo_real ON mensajes_tiempo_real(sesion, destino, id);
+"""
+
+# Campos de un trabajo que escribe su proceso; `aviso` lo escriben los demás
+_CAMPOS_TRABAJO = (
+    "id", "proceso", "nombre", "estado", "error", "resultado", "directorio_resultados", "creado", "actualizado",
+)
+
+_MAQUINA = socket.gethostname()
+
+# Fila de `metricas` con la suma de los procesos que ya terminaron
+_METRICAS_PLEGADAS = "procesos-terminados"
+# Un proceso que no publica sus métricas en este tiempo (o en diez intervalos de
+# publicación, si es más) se da por terminado
+_METRICAS_VENCIDAS = 600
+
+
+def _crear_privado(ruta: str) -> None:
+    """
+    Crea la base (y ajusta la que ya existe, con sus archivos -wal y -shm) con
+    permisos 0600: guarda el secreto de los webhooks. SQLite crea los archivos
+    auxiliares con los permisos de la base.
+    """
+    os.close(os.open(ruta, os.O_RDWR | os.O_CREAT, 0o600))
+    for sufijo in ("", "-wal", "-shm"):
+        if os.path.exists(ruta + sufijo):
+            os.chmod(ruta + sufijo, 0o600)
+
+
+def directorio_por_defecto() -> str:
+    """
+    Directorio de la base por defecto: propio del usuario dentro del temporal del
+    sistema (compartido con otros usuarios), con permisos 0700. Lanza RuntimeError
+    si ya existe y es de otro usuario.
+    """
+    usuario = os.getuid() if hasattr(os, "getuid") else os.getenv("USERNAME", "")
+    directorio = os.path.join(tempfile.gettempdir(), f"transcriptor-{usuario}")
+    os.makedirs(directorio, mode=0o700, exist_ok=True)
+    if hasattr(os, "getuid"):
+        if os.stat(directorio).st_uid != os.getuid():
+            raise RuntimeError(f"{directorio} pertenece a otro usuario; define RUTA_ESTADO_COMPARTIDO.")
+        os.chmod(directorio, 0o700)
+    return directorio
+
+
+def proceso_actual() -> str:
+    """
+    Identificador del proceso (máquina y pid). Se calcula en cada llamada:
+    con gunicorn --preload la app se importa antes de crear los workers.
+    """
+    return f"{_MAQUINA}:{os.getpid()}"
+
+
+class EstadoCompartido:
+    """
+    Base SQLite compartida por los procesos de la app. Como el índice de
+    transcripciones, usa una conexión por hilo (y por proceso) y modo WAL, así
+    que las lecturas no esperan a las escrituras de otros workers.
+    """
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._local = threading.local()
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, mode=0o700, exist_ok=True)
+        _crear_privado(ruta)
+        with self._conexion() as con:
+            con.executescript(_ESQUEMA)
+
+    def _conexion(self) -> sqlite3.Connection:
+        con = getattr(self._local, "conexion", None)
+        # Una conexión heredada de un fork no se puede usar en el proceso hijo
+        if con is None or self._local.pid != os.getpid():
+            con = sqlite3.connect(self.ruta, timeout=30)
+            con.row_factory = sqlite3.Row
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexion = con
+            self._local.pid = os.getpid()
+        return con
+
+    # --- Trabajos ---
+
+    def guardar_trabajo(self, datos: dict) -> None:
+        """
+        Inserta o actualiza un trabajo; `datos` trae los campos de _CAMPOS_TRABAJO
+        (el resultado ya serializado). No toca el aviso pendiente.
+        """
+        columnas = ", ".join(_CAMPOS_TRABAJO)
+        marcas = ", ".join("?" for _ in _CAMPOS_TRABAJO)
+        actualizar = ", ".join(f"{c} = excluded.{c}" for c in _CAMPOS_TRABAJO[1:])
+        con = self._conexion()
+        with con:
+            con.execute(
+                f"INSERT INTO trabajos ({columnas}) VALUES ({marcas}) ON CONFLICT(id) DO UPDATE SET {actualizar}",
+                [datos.get(c) for c in _CAMPOS_TRABAJO],
+            )
+
+    def obtener_trabajo(self, id_trabajo: str) -> dict | None:
+        fila = self._conexion().execute("SELECT * FROM trabajos WHERE id = ?", (id_trabajo,)).fetchone()
+        return dict(fila) if fila is not None else None
+
+    def avisar_trabajo(self, id_trabajo: str, referencia: str) -> bool:
+        """
+        Deja un aviso (p. ej. un webhook) para el proceso dueño del trabajo.
+        Retorna False si el trabajo no existe.
+        """
+        con = self._conexion()
+        with con:
+            cursor = con.execute("UPDATE trabajos SET aviso = ? WHERE id = ?", (referencia, id_trabajo))
+        return cursor.rowcount > 0
+
+    def tomar_avisos(self, proceso: str) -> list[tuple[str, str]]:
+        """
+        Retorna y borra los avisos pendientes de los trabajos de `proceso`: [(id, referencia)].
+        """
+        con = self._conexion()
+        with con:
+            avisos = [
+                (fila["id"], fila["aviso"])
+                for fila in con.execute(
+                    "SELECT id, aviso FROM trabajos WHERE proceso = ? AND aviso IS NOT NULL", (proceso,),
+                )
+            ]
+            # Si otro aviso llegó mientras tanto, se conserva para la próxima vuelta
+            con.executemany("UPDATE trabajos SET aviso = NULL WHERE id = ? AND aviso = ?", avisos)
+        return avisos
+
+    def latido_proceso(self, proceso: str) -> None:
+        """
+        Anuncia que `proceso` sigue vivo y atendiendo sus trabajos.
+        """
+        con = self._conexion()
+        with con:
+            con.execute("INSERT OR REPLACE INTO procesos (proceso, latido) VALUES (?, ?)", (proceso, time.time()))
+
+    def vencer_trabajos(self, limite_latido: float, estados_activos: tuple, proceso: str, error: str) -> int:
+        """
+        Marca como error los trabajos activos de otros procesos cuyo dueño no da
+        señales de vida desde `limite_latido` (terminó o se colgó), y olvida esos
+        procesos. Un trabajo largo de un proceso vivo no vence aunque lleve tiempo
+        sin cambios. Retorna cuántos trabajos venció.
+        """
+        marcas = ", ".join("?" for _ in estados_activos)
+        con = self._conexion()
+        with con:
+            cursor = con.execute(
+                f"UPDATE trabajos SET estado = 'error', error = ?, actualizado = ? "
+                f"WHERE proceso != ? AND estado IN ({marcas}) "
+                f"AND proceso NOT IN (SELECT proceso FROM procesos WHERE latido >= ?)",
+                (error, time.time(), proceso, *estados_activos, limite_latido),
+            )
+            con.execute("DELETE FROM procesos WHERE latido < ?", (limite_latido,))
+        return cursor.rowcount
+
+    def purgar_trabajos(self, limite: float, estados_terminados: tuple) -> list[str]:
+        """
+        Borra los trabajos terminados antes de `limite` y retorna sus directorios de resultados.
+        """
+        marcas = ", ".join("?" for _ in estados_terminados)
+        condicion = f"actualizado < ? AND estado IN ({marcas})"
+        con = self._conexion()
+        with con:
+            directorios = [
+                fila[0] for fila in con.execute(
+                    f"SELECT directorio_resultados FROM trabajos WHERE {condicion} AND directorio_resultados IS NOT NULL",
+                    (limite, *estados_terminados),
+                )
+            ]
+            con.execute(f"DELETE FROM trabajos WHERE {condicion}", (limite, *estados_terminados))
+        return directorios
+
+    # --- Ajustes ---
+
+    def secreto(self, clave: str) -> str:
+        """
+        Valor aleatorio común a todos los procesos; el primero que lo pide lo crea.
+        """
+        con = self._conexion()
+        with con:
+            con.execute("INSERT OR IGNORE INTO ajustes (clave, valor) VALUES (?, ?)", (clave, secrets.token_hex(32)))
+            return con.execute("SELECT valor FROM ajustes WHERE clave = ?", (clave,)).fetchone()[0]
+
+    # --- Métricas ---
+
+    def publicar_metricas(self, proceso: str, valores: dict) -> None:
+        con = self._conexion()
+        with con:
+            con.execute(
+                "INSERT OR REPLACE INTO metricas (proceso, valores, actualizado) VALUES (?, ?, ?)",
+                (proceso, json.dumps(valores), time.time()),
+            )
+
+    def plegar_metricas(self, limite: float, sumar) -> int:
+        """
+        Junta en una sola fila las métricas de los procesos que no publican desde
+        `limite` (terminaron, p. ej. un worker reciclado por gunicorn): sus
+        contadores siguen sumando y la tabla no crece con cada worker nuevo.
+        `sumar(instantaneas)` retorna su suma. Retorna cuántos procesos plegó.
+        """
+        con = self._conexion()
+        with con:
+            # Leer y reescribir en la misma transacción: dos procesos no pliegan la misma fila dos veces
+            con.execute("BEGIN IMMEDIATE")
+            filas = con.execute(
+                "SELECT proceso, valores FROM metricas WHERE actualizado < ? AND proceso != ?",
+                (limite, _METRICAS_PLEGADAS),
+            ).fetchall()
+            if not filas:
+                return 0
+            instantaneas = [json.loads(fila["valores"]) for fila in filas]
+            previa = con.execute("SELECT valores FROM metricas WHERE proceso = ?", (_METRICAS_PLEGADAS,)).fetchone()
+            if previa is not None:
+                instantaneas.append(json.loads(previa[0]))
+            con.executemany("DELETE FROM metricas WHERE proceso = ?", [(fila["proceso"],) for fila in filas])
+            con.execute(
+                "INSERT OR REPLACE INTO metricas (proceso, valores, actualizado) VALUES (?, ?, ?)",
+                (_METRICAS_PLEGADAS, json.dumps(sumar(instantaneas)), time.time()),
+            )
+        return len(filas)
+
+    def metricas(self) -> list[dict]:
+        """
+        Las últimas métricas publicadas por cada proceso, más la suma de los que
+        ya terminaron (para que los contadores no retrocedan).
+        """
+        return [json.loads(fila[0]) for fila in self._conexion().execute("SELECT valores FROM metricas")]
+
+    # --- Sesiones en vivo ---
+
+    def registrar_sesion(self, id_sesion: str, proceso: str) -> None:
+        con = self._conexion()
+        with con:
+            con.execute(
+                "INSERT OR REPLACE INTO sesiones_tiempo_real (id, proceso, latido) VALUES (?, ?, ?)",
+                (id_sesion, proceso, time.time()),
+            )
+
+    def latido_sesiones(self, ids: list[str]) -> None:
+        con = self._conexion()
+        with con:
+            con.executemany(
+                "UPDATE sesiones_tiempo_real SET latido = ? WHERE id = ? AND terminada = 0",
+                [(time.time(), id_sesion) for id_sesion in ids],
+            )
+
+    def terminar_sesion(self, id_sesion: str) -> None:
+        con = self._conexion()
+        with con:
+            con.execute("UPDATE sesiones_tiempo_real SET terminada = 1, latido = ? WHERE id = ?", (time.time(), id_sesion))
+
+    def obtener_sesion(self, id_sesion: str) -> dict | None:
+        fila = self._conexion().execute("SELECT * FROM sesiones_tiempo_real WHERE id = ?", (id_sesion,)).fetchone()
+        return dict(fila) if fila is not None else None
+
+    def purgar_sesiones(self, limite: float) -> None:
+        """
+        Borra las sesiones sin latido desde `limite` y sus mensajes.
+        """
+        con = self._conexion()
+        with con:
+            con.execute(
+                "DELETE FROM mensajes_tiempo_real WHERE sesion IN "
+                "(SELECT id FROM sesiones_tiempo_real WHERE latido < ?)",
+                (limite,),
+            )
+            con.execute("DELETE FROM sesiones_tiempo_real WHERE latido < ?", (limite,))
+
+    def enviar_mensaje(self, id_sesion: str, destino: str, tipo: str, datos: bytes | None = None) -> None:
+        con = self._conexion()
+        with con:
+            con.execute(
+                "INSERT INTO mensajes_tiempo_real (sesion, destino, tipo, datos) VALUES (?, ?, ?, ?)",
+                (id_sesion, destino, tipo, datos),
+            )
+
+    def tomar_mensajes(self, ids: list[str], destino: str) -> list[tuple[str, str, bytes | None]]:
+        """
+        Retorna y borra, en orden de llegada, los mensajes para `destino` de las
+        sesiones `ids`: [(sesión, tipo, datos)]. Para un único lector por sesión.
+        """
+        if not ids:
+            return []
+        marcas = ", ".join("?" for _ in ids)
+        con = self._conexion()
+        with con:
+            filas = con.execute(
+                f"SELECT id, sesion, tipo, datos FROM mensajes_tiempo_real "
+                f"WHERE destino = ? AND sesion IN ({marcas}) ORDER BY id",
+                (destino, *ids),
+            ).fetchall()
+            if filas:
+                con.execute(
+                    f"DELETE FROM mensajes_tiempo_real WHERE destino = ? AND sesion IN ({marcas}) AND id <= ?",
+                    (destino, *ids, filas[-1]["id"]),
+                )
+        return [(fila["sesion"], fila["tipo"], fila["datos"]) for fila in filas]
+
+    def leer_mensajes(self, id_sesion: str, destino: str, desde: int = 0) -> list[tuple[int, str, bytes | None]]:
+        """
+        Mensajes para `destino` de la sesión posteriores a `desde`, sin borrarlos: [(id, tipo, datos)].
+        """
+        filas = self._conexion().execute(
+            "SELECT id, tipo, datos FROM mensajes_tiempo_real WHERE sesion = ? AND destino = ? AND id > ? ORDER BY id",
+            (id_sesion, destino, desde),
+        ).fetchall()
+        return [(fila["id"], fila["tipo"], fila["datos"]) for fila in filas]
+
+
+_estado_por_defecto: EstadoCompartido | None = None
+_candado_por_defecto = threading.Lock()
+
+
+def estado_por_defecto() -> EstadoCompartido | None:
+    """
+    Estado compartido de la app web, configurado por variables de entorno.
+    Retorna None si está desactivado con ESTADO_COMPARTIDO=0 (todo queda en
+    memoria de cada proceso, lo que exige un solo worker).
+    """
+    global _estado_por_defecto
+    if os.getenv("ESTADO_COMPARTIDO", "1") == "0":
+        return None
+    with _candado_por_defecto:
+        if _estado_por_defecto is None:
+            # En el temporal, como los directorios de exportación: no sobrevive a un reinicio de la máquina
+            ruta = os.getenv("RUTA_ESTADO_COMPARTIDO") or os.path.join(directorio_por_defecto(), "estado.sqlite3")
+            _estado_por_defecto = EstadoCompartido(ruta)
+        return _estado_por_defecto
+
+
+_publicador: threading.Thread | None = None
+_candado_publicador = threading.Lock()
+
+
+def _publicar_metricas(estado: EstadoCompartido, intervalo: float | None = None) -> None:
+    import metricas
+
+    try:
+        estado.publicar_metricas(proceso_actual(), metricas.instantanea())
+        if intervalo is not None:
+            vencidas = max(_METRICAS_VENCIDAS, 10 * intervalo)
+            estado.plegar_metricas(time.time() - vencidas, metricas.sumar_instantaneas)
+    except sqlite3.Error:
+        pass
+
+
+def iniciar_publicacion_metricas(estado: EstadoCompartido, intervalo: float) -> None:
+    """
+    Publica las métricas de este proceso cada `intervalo` segundos (y al salir)
+    y pliega las de los procesos que ya terminaron. Se puede llamar en cada
+    petición: solo arranca un hilo por proceso.
+    """
+    global _publicador
+    if _publicador is not None and _publicador.is_alive():
+        return
+    with _candado_publicador:
+        # Tras un fork el hilo del padre no existe en el hijo: is_alive() es False
+        if _publicador is not None and _publicador.is_alive():
+            return
+
+        def _bucle():
+            while True:
+                time.sleep(intervalo)
+                _publicar_metricas(estado, intervalo)
+
+        import atexit
+
+        if _publicador is None:
+            atexit.register(_publicar_metricas, estado)
+        _publicador = threading.Thread(target=_bucle, name="metricas-compartidas", daemon=True)
+        _publicador.start()
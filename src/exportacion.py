@@ -0,0 +1,291 @@
+"""
+Exportación de una transcripción a varios formatos en una sola pasada.
+
+Los utterances (y sus palabras) se recorren una vez y cada segmento se entrega
+a la vez a todos los escritores pedidos: texto plano, subtítulos SRT y WebVTT,
+y JSON con marcas de tiempo y hablantes. Sin utterances, las palabras de la
+transcripción forman un único segmento sin hablante; sin palabras, las marcas
+de tiempo de los subtítulos se reparten de forma proporcional.
+"""
+import json
+
+from modelos import Palabra
+
+
+FORMATOS = ("txt", "srt", "vtt", "json")
+
+# Subtítulos: a lo sumo dos líneas de MAX_CARACTERES_LINEA y MAX_DURACION_CUE_MS por cue
+MAX_CARACTERES_LINEA = 42
+MAX_DURACION_CUE_MS = 6000
+# Duración supuesta de una palabra cuando no hay marcas de tiempo ni duración del audio
+_MS_POR_PALABRA_ESTIMADA = 400
+
+
+def leer_formatos(valor: str) -> list[str]:
+    """
+    Convierte "srt, vtt,json" en ["srt", "vtt", "json"] (sin repetidos).
+    Lanza ValueError si algún formato no está en FORMATOS.
+    """
+    formatos: list[str] = []
+    for formato in (f.strip().lower() for f in valor.split(",")):
+        if not formato or formato in formatos:
+            continue
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato de exportación desconocido: {formato} (válidos: {', '.join(FORMATOS)})")
+        formatos.append(formato)
+    return formatos
+
+
+def nombre_hablante(etiqueta: str, mapa_nombres: dict | None = None) -> str:
+    if mapa_nombres and etiqueta in mapa_nombres:
+        return mapa_nombres[etiqueta]
+    return f"Speaker {etiqueta}"
+
+
+def _marca_tiempo(ms, separador: str) -> str:
+    segundos, ms = divmod(max(0, int(ms)), 1000)
+    minutos, segundos = divmod(segundos, 60)
+    horas, minutos = divmod(minutos, 60)
+    return f"{horas:02d}:{minutos:02d}:{segundos:02d}{separador}{ms:03d}"
+
+
+def _palabras_estimadas(texto: str, inicio: int, fin: int) -> list[Palabra]:
+    """
+    Reparte [inicio, fin] en partes iguales entre las palabras de `texto`.
+    """
+    textos = texto.split()
+    if not textos:
+        return []
+    paso = max(fin - inicio, 0) / len(textos)
+    return [
+        Palabra(t, int(inicio + i * paso), int(inicio + (i + 1) * paso))
+        for i, t in enumerate(textos)
+    ]
+
+
+def _segmentos(transcripcion_obj, texto: str):
+    """
+    Genera (etiqueta | None, texto, inicio, fin, palabras, marcas_reales) por segmento.
+    """
+    utterances = getattr(transcripcion_obj, "utterances", None) or []
+    if utterances:
+        for u in utterances:
+            palabras = getattr(u, "words", None) or []
+            if palabras:
+                yield str(u.speaker), u.text, u.start, u.end, palabras, True
+            else:
+                yield str(u.speaker), u.text, u.start, u.end, _palabras_estimadas(u.text, u.start, u.end), False
+        return
+
+    palabras = getattr(transcripcion_obj, "words", None) or []
+    if palabras:
+        yield None, texto, palabras[0].start, palabras[-1].end, palabras, True
+        return
+
+    duracion = getattr(transcripcion_obj, "audio_duration", None)
+    fin = int(duracion * 1000) if duracion else len(texto.split()) * _MS_POR_PALABRA_ESTIMADA
+    yield None, texto, 0, fin, _palabras_estimadas(texto, 0, fin), False
+
+
+def _cues(palabras):
+    """
+    Agrupa palabras en cues de subtítulo: corta al llenar dos líneas, al pasar de
+    MAX_DURACION_CUE_MS o al terminar una oración si el cue ya ocupa media línea.
+    """
+    maximo = 2 * MAX_CARACTERES_LINEA
+    actual: list[str] = []
+    largo = inicio = fin = 0
+    for palabra in palabras:
+        texto = palabra.text
+        if actual and (largo + 1 + len(texto) > maximo or palabra.end - inicio > MAX_DURACION_CUE_MS):
+            yield inicio, fin, " ".join(actual)
+            actual = []
+        if not actual:
+            inicio = palabra.start
+            largo = -1
+        actual.append(texto)
+        largo += 1 + len(texto)
+        fin = palabra.end
+        if texto[-1:] in ".?!" and largo >= MAX_CARACTERES_LINEA // 2:
+            yield inicio, fin, " ".join(actual)
+            actual = []
+    if actual:
+        yield inicio, fin, " ".join(actual)
+
+
+def _partir_en_lineas(texto: str) -> str:
+    # Dos líneas cortadas en el espacio más cercano a la mitad
+    if len(texto) <= MAX_CARACTERES_LINEA:
+        return texto
+    medio = len(texto) // 2
+    izquierda = texto.rfind(" ", 0, medio + 1)
+    derecha = texto.find(" ", medio)
+    if izquierda < 0 and derecha < 0:
+        return texto
+    if izquierda < 0 or (derecha >= 0 and derecha - medio < medio - izquierda):
+        corte = derecha
+    else:
+        corte = izquierda
+    return texto[:corte] + "\n" + texto[corte + 1:]
+
+
+class EscritorLineas:
+    """
+    Escribe líneas a medida que llegan; el resultado es igual a "\\n".join(lineas).strip().
+    """
+
+    def __init__(self, archivo):
+        self.archivo = archivo
+        self._anterior: str | None = None
+
+    def linea(self, linea: str) -> None:
+        if self._anterior is None:
+            self._anterior = linea.lstrip()
+            return
+        self.archivo.write(self._anterior)
+        self.archivo.write("\n")
+        self._anterior = linea
+
+    def cerrar(self) -> None:
+        if self._anterior is not None:
+            self.archivo.write(self._anterior.rstrip())
+
+
+class _EscritorSrt:
+    def __init__(self, archivo):
+        self.archivo = archivo
+        self._numero = 0
+
+    def cue(self, inicio: int, fin: int, texto: str, hablante: str | None) -> None:
+        self._numero += 1
+        if hablante:
+            texto = f"{hablante}: {texto}"
+        self.archivo.write(
+            f"{self._numero}\n{_marca_tiempo(inicio, ',')} --> {_marca_tiempo(fin, ',')}\n"
+            f"{_partir_en_lineas(texto)}\n\n"
+        )
+
+
+def _escapar_vtt(texto: str) -> str:
+    return texto.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+class _EscritorVtt:
+    def __init__(self, archivo):
+        self.archivo = archivo
+        archivo.write("WEBVTT\n\n")
+
+    def cue(self, inicio: int, fin: int, texto: str, hablante: str | None) -> None:
+        # El hablante va como etiqueta de voz (<v Nombre>), que los reproductores muestran aparte
+        voz = f"<v {_escapar_vtt(hablante)}>" if hablante else ""
+        self.archivo.write(
+            f"{_marca_tiempo(inicio, '.')} --> {_marca_tiempo(fin, '.')}\n"
+            f"{voz}{_escapar_vtt(_partir_en_lineas(texto))}\n\n"
+        )
+
+
+class _EscritorJson:
+    """
+    Escribe el JSON por segmentos, sin construir el documento completo en memoria.
+    """
+
+    def __init__(self, archivo, transcripcion_obj, texto: str, tipo: str | None):
+        self.archivo = archivo
+        self._primero = True
+        idioma = getattr(transcripcion_obj, "language_code", None)
+        cabecera = {
+            "id": getattr(transcripcion_obj, "id", None),
+            "idioma": str(idioma) if idioma is not None else None,
+            "duracion_audio": getattr(transcripcion_obj, "audio_duration", None),
+            "tipo": tipo,
+            "texto": texto,
+        }
+        # Se abre el objeto y se deja pendiente la lista de segmentos
+        archivo.write(json.dumps(cabecera, ensure_ascii=False)[:-1] + ', "segmentos": [')
+
+    def segmento(self, etiqueta, hablante, texto, inicio, fin, palabras, marcas_reales: bool) -> None:
+        datos = {
+            "hablante": hablante,
+            "etiqueta": etiqueta,
+            "inicio": inicio,
+            "fin": fin,
+            "texto": texto,
+            "palabras": [
+                {"texto": p.text, "inicio": p.start, "fin": p.end, "confianza": getattr(p, "confidence", None)}
+                for p in palabras
+            ] if marcas_reales else [],
+        }
+        self.archivo.write(("\n" if self._primero else ",\n") + json.dumps(datos, ensure_ascii=False))
+        self._primero = False
+
+    def cerrar(self, hablantes: dict) -> None:
+        self.archivo.write('\n], "hablantes": ' + json.dumps(hablantes, ensure_ascii=False) + "}\n")
+
+
+def exportar(
+    transcripcion_obj,
+    archivos: dict,
+    texto: str = "",
+    tipo: str | None = None,
+    con_speakers: bool = False,
+    mapa_nombres: dict | None = None,
+) -> set[str]:
+    """
+    Escribe la transcripción en cada archivo de `archivos` ({formato: archivo de
+    texto abierto}) recorriendo los segmentos una sola vez.
+
+    El txt es `texto` (ya formateado) o, con `con_speakers` y utterances, una
+    línea "Nombre: texto" por turno. Los subtítulos llevan el nombre del hablante
+    solo con `con_speakers`. Retorna las etiquetas de hablantes encontradas.
+    """
+    tiene_utterances = bool(getattr(transcripcion_obj, "utterances", None))
+    lineas = None
+    if "txt" in archivos:
+        if con_speakers and tiene_utterances:
+            lineas = EscritorLineas(archivos["txt"])
+        else:
+            archivos["txt"].write(texto)
+    subtitulos = [e(archivos[f]) for f, e in (("srt", _EscritorSrt), ("vtt", _EscritorVtt)) if f in archivos]
+    # Subtítulos y JSON parten del texto del proveedor, no del ya formateado para leer
+    texto_crudo = getattr(transcripcion_obj, "text", None) or texto
+    escritor_json = _EscritorJson(archivos["json"], transcripcion_obj, texto_crudo, tipo) if "json" in archivos else None
+
+    hablantes: dict[str, str] = {}
+    if lineas is None and not subtitulos and escritor_json is None:
+        return set()
+
+    for etiqueta, texto_segmento, inicio, fin, palabras, marcas_reales in _segmentos(transcripcion_obj, texto_crudo):
+        nombre = None
+        if etiqueta is not None:
+            nombre = hablantes.get(etiqueta)
+            if nombre is None:
+                nombre = hablantes[etiqueta] = nombre_hablante(etiqueta, mapa_nombres)
+        if lineas is not None:
+            lineas.linea(f"{nombre}: {texto_segmento}")
+        if subtitulos:
+            voz = nombre if con_speakers else None
+            for inicio_cue, fin_cue, texto_cue in _cues(palabras):
+                for escritor in subtitulos:
+                    escritor.cue(inicio_cue, fin_cue, texto_cue, voz)
+        if escritor_json is not None:
+            escritor_json.segmento(etiqueta, nombre, texto_segmento, inicio, fin, palabras, marcas_reales)
+
+    if lineas is not None:
+        lineas.cerrar()
+    if escritor_json is not None:
+        escritor_json.cerrar(hablantes)
+    return set(hablantes)
+
+
+def exportar_a_rutas(transcripcion_obj, rutas: dict, **kwargs) -> set[str]:
+    """
+    Como exportar(), pero abre (y cierra) los archivos de `rutas` ({formato: ruta}).
+    """
+    archivos = {}
+    try:
+        for formato, ruta in rutas.items():
+            archivos[formato] = open(ruta, "w", encoding="utf-8")
+        return exportar(transcripcion_obj, archivos, **kwargs)
+    finally:
+        for archivo in archivos.values():
+            archivo.close()
@@ -0,0 +1,151 @@
+"""
+Transcripción por fragmentos: corta medios largos en segmentos solapados,
+los transcribe en paralelo y une el resultado en una sola transcripción.
+
+Limitación conocida: la diarización se hace por fragmento, así que la misma
+persona puede recibir etiquetas distintas (A, B...) en fragmentos distintos.
+"""
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import medios
+from modelos import Palabra, Segmento, TranscripcionLocal
+
+
+def planificar_cortes(
+    ruta: str,
+    duracion: float,
+    duracion_fragmento: float,
+    ventana_busqueda: float = 30.0,
+) -> list[float]:
+    """
+    Devuelve los puntos de corte (en segundos), incluyendo 0 y la duración total.
+
+    Cada corte se coloca en el silencio más cercano al punto nominal dentro de
+    ±ventana_busqueda; si no hay silencios, se corta en el punto nominal.
+    """
+    cortes = [0.0]
+    while duracion - cortes[-1] > duracion_fragmento * 1.25:
+        nominal = cortes[-1] + duracion_fragmento
+        inicio_ventana = max(cortes[-1] + duracion_fragmento / 2, nominal - ventana_busqueda)
+        silencios = medios.detectar_silencios(ruta, inicio_ventana, nominal + ventana_busqueda - inicio_ventana)
+        if silencios:
+            centro = min(((a + b) / 2 for a, b in silencios), key=lambda t: abs(t - nominal))
+            cortes.append(centro)
+        else:
+            cortes.append(nominal)
+    cortes.append(duracion)
+    return cortes
+
+
+def _desplazar_palabras(palabras, desplazamiento_ms: int, desde_ms: int, hasta_ms: int) -> list[Palabra]:
+    """
+    Pasa las palabras a tiempo absoluto y conserva solo las que caen en [desde_ms, hasta_ms).
+    """
+    conservadas = []
+    for w in palabras or []:
+        inicio = w.start + desplazamiento_ms
+        fin = w.end + desplazamiento_ms
+        if desde_ms <= (inicio + fin) // 2 < hasta_ms:
+            speaker = getattr(w, "speaker", None)
+            conservadas.append(Palabra(
+                w.text, inicio, fin, getattr(w, "confidence", None),
+                str(speaker) if speaker is not None else None,
+            ))
+    return conservadas
+
+
+def unir_transcripciones(partes: list[tuple[object, float, float, float]]) -> TranscripcionLocal:
+    """
+    Une transcripciones de fragmentos en una sola.
+
+    `partes` es una lista de (transcripcion, inicio_fragmento, desde, hasta), en segundos.
+    Los tiempos se corrigen sumando el inicio del fragmento y el solapamiento se
+    elimina conservando de cada fragmento solo lo que cae en [desde, hasta).
+    """
+    utterances: list[Segmento] = []
+    palabras: list[Palabra] = []
+    idioma = None
+
+    for transcripcion, inicio, desde, hasta in partes:
+        desplazamiento = int(round(inicio * 1000))
+        desde_ms = int(round(desde * 1000))
+        hasta_ms = int(round(hasta * 1000))
+        idioma = idioma or getattr(transcripcion, "language_code", None)
+
+        palabras.extend(_desplazar_palabras(getattr(transcripcion, "words", None), desplazamiento, desde_ms, hasta_ms))
+
+        for u in getattr(transcripcion, "utterances", None) or []:
+            palabras_u = getattr(u, "words", None) or []
+            if palabras_u:
+                conservadas = _desplazar_palabras(palabras_u, desplazamiento, desde_ms, hasta_ms)
+                if not conservadas:
+                    continue
+                texto = u.text if len(conservadas) == len(palabras_u) else " ".join(p.text for p in conservadas)
+                inicio_u, fin_u = conservadas[0].start, conservadas[-1].end
+            else:
+                # Sin tiempos por palabra, se decide por el punto medio del turno completo
+                inicio_u, fin_u = u.start + desplazamiento, u.end + desplazamiento
+                if not desde_ms <= (inicio_u + fin_u) // 2 < hasta_ms:
+                    continue
+                conservadas, texto = [], u.text
+            utterances.append(Segmento(
+                str(u.speaker), texto, inicio_u, fin_u, getattr(u, "confidence", None), conservadas,
+            ))
+
+    if utterances:
+        texto = " ".join(u.text for u in utterances)
+    elif palabras:
+        texto = " ".join(p.text for p in palabras)
+    else:
+        texto = " ".join((getattr(t, "text", None) or "").strip() for t, *_ in partes).strip()
+
+    duracion = partes[-1][3] if partes else None
+    return TranscripcionLocal(texto, utterances, palabras, str(idioma) if idioma else None, duracion)
+
+
+def transcribir_por_fragmentos(
+    ruta: str,
+    transcribir,
+    duracion_fragmento: float,
+    solapamiento: float = 5.0,
+    concurrencia: int = 4,
+    canales: int = 1,
+) -> TranscripcionLocal | None:
+    """
+    Corta `ruta` en fragmentos de ~duracion_fragmento segundos (con `solapamiento`
+    a cada lado del corte) y llama a `transcribir(ruta_fragmento)` en paralelo.
+
+    Retorna None si el medio es demasiado corto para dividirlo.
+    """
+    duracion = medios.duracion_segundos(ruta)
+    if duracion <= duracion_fragmento * 1.25:
+        return None
+
+    cortes = planificar_cortes(ruta, duracion, duracion_fragmento)
+    tmpdir = tempfile.mkdtemp(prefix="fragmentos-")
+    try:
+        tramos = []
+        for k in range(len(cortes) - 1):
+            desde, hasta = cortes[k], cortes[k + 1]
+            inicio = max(0.0, desde - solapamiento)
+            fin = min(duracion, hasta + solapamiento)
+            tramos.append((inicio, fin, desde, hasta))
+
+        def _procesar(indice: int):
+            inicio, fin, _, _ = tramos[indice]
+            destino = os.path.join(tmpdir, f"fragmento_{indice:04d}.flac")
+            medios.extraer_segmento(ruta, inicio, fin - inicio, destino, canales)
+            return transcribir(destino)
+
+        with ThreadPoolExecutor(max_workers=max(1, concurrencia)) as ejecutor:
+            resultados = list(ejecutor.map(_procesar, range(len(tramos))))
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    return unir_transcripciones([
+        (transcripcion, inicio, desde, hasta)
+        for transcripcion, (inicio, _, desde, hasta) in zip(resultados, tramos)
+    ])
@@ -0,0 +1,188 @@
+import glob
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Extensiones que se consideran medios al recorrer directorios
+EXTENSIONES_MEDIOS = {
+    ".mp3", ".wav", ".m4a", ".aac", ".flac", ".ogg", ".oga", ".opus", ".wma", ".amr",
+    ".mp4", ".m4v", ".mov", ".mkv", ".webm", ".avi", ".mpeg", ".mpg", ".3gp",
+}
+
+
+def _es_medio(ruta: str) -> bool:
+    return os.path.splitext(ruta)[1].lower() in EXTENSIONES_MEDIOS
+
+
+def leer_manifiesto(ruta_manifiesto: str) -> list[str]:
+    """
+    Lee un manifiesto con una ruta (o patrón) por línea; ignora líneas vacías y comentarios '#'.
+    Las rutas relativas se resuelven respecto al directorio del manifiesto.
+    """
+    base = os.path.dirname(os.path.abspath(ruta_manifiesto))
+    entradas = []
+    with open(ruta_manifiesto, "r", encoding="utf-8-sig") as f:
+        for linea in f:
+            linea = linea.strip()
+            if not linea or linea.startswith("#"):
+                continue
+            entradas.append(linea if os.path.isabs(linea) else os.path.join(base, linea))
+    return entradas
+
+
+def expandir_fuentes(entradas: list[str]) -> list[str]:
+    """
+    Convierte archivos, directorios (recorridos recursivamente) y patrones glob
+    en una lista de archivos sin duplicados, conservando el orden.
+    """
+    archivos: list[str] = []
+    vistos: set[str] = set()
+
+    def _agregar(ruta: str) -> None:
+        clave = os.path.abspath(ruta)
+        if clave not in vistos:
+            vistos.add(clave)
+            archivos.append(ruta)
+
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            for raiz, dirs, nombres in os.walk(entrada):
+                dirs.sort()
+                for nombre in sorted(nombres):
+                    if _es_medio(nombre):
+                        _agregar(os.path.join(raiz, nombre))
+        elif os.path.isfile(entrada):
+            _agregar(entrada)
+        elif glob.has_magic(entrada):
+            for ruta in sorted(glob.glob(entrada, recursive=True)):
+                if os.path.isfile(ruta) and _es_medio(ruta):
+                    _agregar(ruta)
+        else:
+            print(f"Aviso: se omite '{entrada}' (no existe).", file=sys.stderr)
+    return archivos
+
+
+# Valores de `tipo` en el nombre de las salidas (--forzar-cancion escribe "cancion")
+TIPOS_SALIDA = ("diálogo", "canción", "cancion")
+
+
+def fuentes_con_base_repetida(fuentes: list[str]) -> set[str]:
+    """
+    Fuentes del lote que comparten ruta sin extensión con otra (a.mp3 y a.wav).
+    Solo esas conservan la extensión en el nombre de sus salidas.
+    """
+    conteo = Counter(os.path.splitext(os.path.abspath(fuente))[0] for fuente in fuentes)
+    return {fuente for fuente in fuentes if conteo[os.path.splitext(os.path.abspath(fuente))[0]] > 1}
+
+
+def base_salida(fuente: str, con_extension: bool = False) -> str:
+    """
+    Prefijo de los archivos de salida de una fuente: su ruta sin extensión
+    ("a.mp3" -> "a"), o con ella si se pide con_extension ("a.mp3"), para que
+    dos fuentes de un mismo lote con el mismo nombre no se pisen.
+    """
+    return fuente if con_extension else os.path.splitext(fuente)[0]
+
+
+def rutas_salida(
+    fuente: str, tipo: str, formatos: list[str] | None = None, con_extension: bool = False,
+) -> dict[str, str]:
+    """
+    Rutas que escribe guardar_transcripcion: {formato: <base>.transcripcion.<tipo>.<formato>}.
+    """
+    base = base_salida(fuente, con_extension)
+    return {formato: f"{base}.transcripcion.{tipo}.{formato}" for formato in formatos or ["txt"]}
+
+
+def ruta_salida_existente(
+    fuente: str, formatos: list[str] | None = None, con_extension: bool = False,
+) -> str | None:
+    """
+    Retorna la transcripción ya guardada para la fuente si existen todos los
+    formatos pedidos (txt por defecto) con alguno de los tipos posibles.
+    """
+    for tipo in TIPOS_SALIDA:
+        rutas = list(rutas_salida(fuente, tipo, formatos, con_extension).values())
+        if all(os.path.exists(ruta) for ruta in rutas):
+            return rutas[0]
+    return None
+
+
+def ejecutar_lote(
+    fuentes: list[str], procesar, concurrencia: int = 4, planificador=None, formatos: list[str] | None = None,
+) -> dict:
+    """
+    Ejecuta `procesar(fuente)` para cada fuente con un pool acotado de hilos.
+
+    Omite las fuentes que ya tienen guardados todos los `formatos` (con el
+    nombre de fuentes_con_base_repetida si comparten nombre con otra) y al
+    final imprime un resumen agregado. Retorna el resumen como diccionario.
+
+    Con `planificador`, cada fuente ocupa una plaza de su cola de admisión antes
+    de encolarse: si la cola está llena, el lote espera en lugar de acumular trabajo.
+    """
+    pendientes = []
+    omitidas = 0
+    repetidas = fuentes_con_base_repetida(fuentes)
+    for fuente in fuentes:
+        if ruta_salida_existente(fuente, formatos, fuente in repetidas):
+            omitidas += 1
+        else:
+            pendientes.append(fuente)
+
+    print(f"Lote: {len(fuentes)} archivos, {omitidas} ya transcritos, {len(pendientes)} por procesar "
+          f"(concurrencia {concurrencia}).")
+
+    correctas = 0
+    fallidas: list[tuple[str, str]] = []
+    bytes_procesados = 0
+    candado = threading.Lock()
+    inicio = time.monotonic()
+
+    def _terminado(fuente: str, reserva, futuro) -> None:
+        nonlocal correctas, bytes_procesados
+        if planificador is not None:
+            planificador.liberar(reserva)
+        error = futuro.exception()
+        with candado:
+            if error is None:
+                correctas += 1
+                try:
+                    bytes_procesados += os.path.getsize(fuente)
+                except OSError:
+                    pass
+                print(f"[{correctas + len(fallidas)}/{len(pendientes)}] OK {fuente}")
+            else:
+                fallidas.append((fuente, str(error)))
+                print(f"[{correctas + len(fallidas)}/{len(pendientes)}] ERROR {fuente}: {error}", file=sys.stderr)
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrencia)) as ejecutor:
+        for fuente in pendientes:
+            reserva = planificador.reservar(bloquear=True) if planificador is not None else None
+            ejecutor.submit(procesar, fuente).add_done_callback(
+                lambda futuro, fuente=fuente, reserva=reserva: _terminado(fuente, reserva, futuro)
+            )
+
+    duracion = time.monotonic() - inicio
+    resumen = {
+        "total": len(fuentes),
+        "omitidas": omitidas,
+        "correctas": correctas,
+        "fallidas": len(fallidas),
+        "bytes": bytes_procesados,
+        "segundos": duracion,
+    }
+
+    print("\nResumen del lote:")
+    print(f"  Transcritos: {correctas}  Omitidos: {omitidas}  Fallidos: {len(fallidas)}")
+    print(f"  Tiempo total: {duracion:.1f} s")
+    if duracion > 0 and correctas:
+        print(f"  Rendimiento: {correctas / duracion * 60:.1f} archivos/min, "
+              f"{bytes_procesados / duracion / (1024 * 1024):.2f} MB/s")
+    for fuente, error in fallidas:
+        print(f"  - {fuente}: {error}", file=sys.stderr)
+    return resumen
@@ -0,0 +1,158 @@
+"""
+Utilidades sobre archivos de audio/video basadas en ffmpeg/ffprobe.
+
+ffmpeg es una dependencia externa opcional: solo se necesita para los modos
+que cortan o convierten el medio antes de subirlo.
+"""
+import functools
+import os
+import re
+import shutil
+import subprocess
+
+
+class FfmpegNoDisponibleError(RuntimeError):
+    """
+    ffmpeg/ffprobe no están instalados o no están en el PATH.
+    """
+
+
+def ffmpeg_disponible() -> bool:
+    return shutil.which("ffmpeg") is not None and shutil.which("ffprobe") is not None
+
+
+def _ejecutar(comando: list[str]) -> subprocess.CompletedProcess:
+    if shutil.which(comando[0]) is None:
+        raise FfmpegNoDisponibleError(f"No se encontró '{comando[0]}'. Instala ffmpeg para usar esta opción.")
+    resultado = subprocess.run(comando, capture_output=True, text=True)
+    if resultado.returncode != 0:
+        detalle = (resultado.stderr or "").strip().splitlines()[-1:] or ["sin detalle"]
+        raise RuntimeError(f"{comando[0]} falló: {detalle[0]}")
+    return resultado
+
+
+def duracion_segundos(ruta: str) -> float:
+    """
+    Duración del medio en segundos según ffprobe.
+    """
+    resultado = _ejecutar([
+        "ffprobe", "-v", "error", "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1", ruta,
+    ])
+    try:
+        return float(resultado.stdout.strip())
+    except ValueError:
+        raise RuntimeError(f"No se pudo determinar la duración de {ruta}")
+
+
+_PATRON_SILENCIO = re.compile(r"silence_(start|end): (-?[\d.]+)")
+
+
+def detectar_silencios(
+    ruta: str,
+    inicio: float,
+    duracion: float,
+    umbral_db: float = -35.0,
+    minimo_segundos: float = 0.4,
+) -> list[tuple[float, float]]:
+    """
+    Busca silencios dentro de la ventana [inicio, inicio + duracion).
+    Retorna pares (inicio, fin) en segundos absolutos del medio.
+    """
+    resultado = _ejecutar([
+        "ffmpeg", "-hide_banner", "-nostats", "-ss", f"{inicio:.3f}", "-t", f"{duracion:.3f}",
+        "-i", ruta, "-vn", "-af", f"silencedetect=noise={umbral_db}dB:d={minimo_segundos}",
+        "-f", "null", "-",
+    ])
+    silencios = []
+    comienzo = None
+    for tipo, valor in _PATRON_SILENCIO.findall(resultado.stderr):
+        # Los tiempos de silencedetect son relativos al punto de búsqueda (-ss)
+        t = inicio + max(float(valor), 0.0)
+        if tipo == "start":
+            comienzo = t
+        elif comienzo is not None:
+            silencios.append((comienzo, t))
+            comienzo = None
+    if comienzo is not None:
+        silencios.append((comienzo, inicio + duracion))
+    return silencios
+
+
+def extraer_segmento(ruta: str, inicio: float, duracion: float, destino: str, canales: int = 1) -> str:
+    """
+    Extrae [inicio, inicio + duracion) como FLAC de 16 kHz (solo audio).
+    Se recodifica para que el corte sea exacto y los tiempos coincidan con el original.
+    """
+    _ejecutar([
+        "ffmpeg", "-hide_banner", "-nostats", "-y", "-ss", f"{inicio:.3f}", "-t", f"{duracion:.3f}",
+        "-i", ruta, "-vn", "-ac", str(canales), "-ar", "16000", "-c:a", "flac", destino,
+    ])
+    return destino
+
+
+# Códecs compactos para voz, en orden de preferencia: (codificador, extensión, kbps por canal)
+_CODECS_VOZ = (
+    ("libopus", "ogg", 24),
+    ("libmp3lame", "mp3", 32),
+)
+
+
+@functools.lru_cache(maxsize=1)
+def _codec_voz() -> tuple[str, str, int]:
+    codificadores = _ejecutar(["ffmpeg", "-hide_banner", "-encoders"]).stdout
+    for codec, extension, kbps in _CODECS_VOZ:
+        if re.search(rf"\s{codec}\s", codificadores):
+            return codec, extension, kbps
+    raise RuntimeError("ffmpeg no incluye un códec de voz compatible (libopus o libmp3lame).")
+
+
+def preprocesar_audio(ruta: str, directorio: str, canales: int = 1, tasa_muestreo: int = 16000) -> str:
+    """
+    Deja solo la pista de audio, la mezcla a `canales`, la remuestrea a
+    `tasa_muestreo` y la codifica con un códec de voz (Opus si está disponible).
+    Retorna la ruta del archivo generado dentro de `directorio`.
+    """
+    codec, extension, kbps = _codec_voz()
+    base = os.path.splitext(os.path.basename(ruta))[0] or "audio"
+    destino = os.path.join(directorio, f"{base}.{extension}")
+    comando = [
+        "ffmpeg", "-hide_banner", "-nostats", "-y", "-i", ruta,
+        "-map", "0:a:0", "-vn", "-sn", "-dn",
+        "-ac", str(canales), "-ar", str(tasa_muestreo),
+        "-c:a", codec, "-b:a", f"{kbps * canales}k",
+    ]
+    if codec == "libopus":
+        comando += ["-application", "voip"]
+    _ejecutar(comando + [destino])
+    return destino
+
+
+def flujo_pcm(fuente: str, tasa_muestreo: int = 16000, bytes_por_trama: int = 3200, ritmo_real: bool = True):
+    """
+    Decodifica `fuente` (archivo, URL o dispositivo que entienda ffmpeg) a PCM
+    de 16 bits mono y genera tramas de `bytes_por_trama`. Con `ritmo_real`,
+    ffmpeg entrega el audio a la velocidad de reproducción (-re), como un micrófono.
+    """
+    if shutil.which("ffmpeg") is None:
+        raise FfmpegNoDisponibleError("No se encontró 'ffmpeg'. Instala ffmpeg para usar esta opción.")
+    comando = ["ffmpeg", "-hide_banner", "-nostats", "-loglevel", "error"]
+    if ritmo_real:
+        comando.append("-re")
+    comando += ["-i", fuente, "-vn", "-ac", "1", "-ar", str(tasa_muestreo), "-f", "s16le", "-"]
+    proceso = subprocess.Popen(comando, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        while True:
+            trama = proceso.stdout.read(bytes_por_trama)
+            if not trama:
+                break
+            yield trama
+        if proceso.wait() != 0:
+            detalle = proceso.stderr.read().decode("utf-8", "replace").strip().splitlines()[-1:] or ["sin detalle"]
+            raise RuntimeError(f"ffmpeg falló: {detalle[0]}")
+    finally:
+        if proceso.poll() is None:
+            proceso.kill()
+            proceso.wait()
+        proceso.stdout.close()
+        proceso.stderr.close()
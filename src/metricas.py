@@ -0,0 +1,244 @@
+"""
+Métricas del proceso en formato de exposición de Prometheus.
+
+Las etapas del pipeline se miden con `medir("etapa")`; los histogramas viven en
+memoria del proceso y se publican en /metrics o se resumen con --perfil. Con
+varios procesos, cada uno publica su instantanea() y /metrics exporta la suma.
+"""
+import bisect
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+def _formatear_etiquetas(nombres: tuple, valores: tuple, extra: str = "") -> str:
+    partes = [f'{n}="{str(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+class Contador:
+    def __init__(self, nombre: str, ayuda: str, etiquetas: tuple = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self._valores: dict[tuple, float] = {}
+        self._candado = threading.Lock()
+
+    def incrementar(self, valor: float = 1, **etiquetas) -> None:
+        clave = tuple(etiquetas.get(n, "") for n in self.etiquetas)
+        with self._candado:
+            self._valores[clave] = self._valores.get(clave, 0) + valor
+
+    def valor(self, **etiquetas) -> float:
+        clave = tuple(etiquetas.get(n, "") for n in self.etiquetas)
+        with self._candado:
+            return self._valores.get(clave, 0)
+
+    def instantanea(self) -> list:
+        with self._candado:
+            return [[list(clave), valor] for clave, valor in self._valores.items()]
+
+    def sumar(self, instantanea: list) -> None:
+        with self._candado:
+            for clave, valor in instantanea:
+                clave = tuple(clave)
+                self._valores[clave] = self._valores.get(clave, 0) + valor
+
+    def vacia(self) -> "Contador":
+        return Contador(self.nombre, self.ayuda, self.etiquetas)
+
+    def exportar(self) -> list[str]:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} counter"]
+        with self._candado:
+            for clave, valor in sorted(self._valores.items()):
+                lineas.append(f"{self.nombre}{_formatear_etiquetas(self.etiquetas, clave)} {valor}")
+        return lineas
+
+
+class Histograma:
+    def __init__(self, nombre: str, ayuda: str, limites: tuple, etiquetas: tuple = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.limites = tuple(sorted(limites))
+        self.etiquetas = etiquetas
+        # etiquetas -> [conteos por cubeta (no acumulados)..., +Inf] y (suma, cuenta)
+        self._cubetas: dict[tuple, list[int]] = {}
+        self._sumas: dict[tuple, list[float]] = {}
+        self._candado = threading.Lock()
+
+    def observar(self, valor: float, **etiquetas) -> None:
+        clave = tuple(etiquetas.get(n, "") for n in self.etiquetas)
+        indice = bisect.bisect_left(self.limites, valor)
+        with self._candado:
+            cubetas = self._cubetas.get(clave)
+            if cubetas is None:
+                cubetas = self._cubetas[clave] = [0] * (len(self.limites) + 1)
+                self._sumas[clave] = [0.0, 0]
+            cubetas[indice] += 1
+            suma = self._sumas[clave]
+            suma[0] += valor
+            suma[1] += 1
+
+    def resumen(self) -> dict[tuple, tuple[int, float]]:
+        """
+        Retorna {etiquetas: (cuenta, suma)}.
+        """
+        with self._candado:
+            return {clave: (int(c), s) for clave, (s, c) in self._sumas.items()}
+
+    def instantanea(self) -> list:
+        with self._candado:
+            return [[list(clave), list(cubetas), *self._sumas[clave]] for clave, cubetas in self._cubetas.items()]
+
+    def sumar(self, instantanea: list) -> None:
+        with self._candado:
+            for clave, cubetas_otro, suma, cuenta in instantanea:
+                clave = tuple(clave)
+                cubetas = self._cubetas.get(clave)
+                if cubetas is None:
+                    cubetas = self._cubetas[clave] = [0] * (len(self.limites) + 1)
+                    self._sumas[clave] = [0.0, 0]
+                for i, conteo in enumerate(cubetas_otro):
+                    cubetas[i] += conteo
+                self._sumas[clave][0] += suma
+                self._sumas[clave][1] += cuenta
+
+    def vacia(self) -> "Histograma":
+        return Histograma(self.nombre, self.ayuda, self.limites, self.etiquetas)
+
+    def exportar(self) -> list[str]:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        with self._candado:
+            for clave in sorted(self._cubetas):
+                acumulado = 0
+                for limite, conteo in zip(self.limites + (float("inf"),), self._cubetas[clave]):
+                    acumulado += conteo
+                    le = "+Inf" if limite == float("inf") else repr(float(limite))
+                    etiquetas = _formatear_etiquetas(self.etiquetas, clave, f'le="{le}"')
+                    lineas.append(f"{self.nombre}_bucket{etiquetas} {acumulado}")
+                suma, cuenta = self._sumas[clave]
+                lineas.append(f"{self.nombre}_sum{_formatear_etiquetas(self.etiquetas, clave)} {suma}")
+                lineas.append(f"{self.nombre}_count{_formatear_etiquetas(self.etiquetas, clave)} {cuenta}")
+        return lineas
+
+
+ETAPAS = Histograma(
+    "transcriptor_etapa_segundos",
+    "Duración de cada etapa del pipeline de transcripción.",
+    (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+    ("etapa",),
+)
+BYTES_PROCESADOS = Contador(
+    "transcriptor_bytes_procesados_total",
+    "Bytes de medios que llegaron al motor o al proveedor (los aciertos de caché no cuentan).",
+    ("origen",),
+)
+BYTES_AHORRADOS = Contador(
+    "transcriptor_bytes_ahorrados_total",
+    "Bytes que el preprocesado evitó subir al proveedor.",
+)
+REINTENTOS = Contador(
+    "transcriptor_reintentos_total",
+    "Llamadas al proveedor repetidas tras un error pasajero (429, 5xx o de red).",
+)
+RECHAZOS = Contador(
+    "transcriptor_rechazos_cola_total",
+    "Trabajos rechazados porque la cola de admisión estaba llena.",
+)
+DURACION_MEDIO = Histograma(
+    "transcriptor_duracion_medio_segundos",
+    "Duración del audio transcrito según el proveedor.",
+    (30, 60, 300, 600, 1800, 3600, 7200, 14400),
+)
+ERRORES = Contador(
+    "transcriptor_errores_total",
+    "Fallos registrados, por origen (proveedor o trabajo en segundo plano).",
+    ("origen",),
+)
+
+REGISTRO = [ETAPAS, BYTES_PROCESADOS, BYTES_AHORRADOS, REINTENTOS, RECHAZOS, DURACION_MEDIO, ERRORES]
+
+
+@contextmanager
+def medir(etapa: str):
+    """
+    Mide el tiempo del bloque y lo registra en el histograma de etapas.
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        ETAPAS.observar(time.perf_counter() - inicio, etapa=etapa)
+
+
+def medir_iterable(etapa: str, iterable):
+    """
+    Recorre `iterable` acumulando solo el tiempo que tarda en producir cada elemento
+    (útil para plantillas en streaming) y lo registra al terminar.
+    """
+    total = 0.0
+    iterador = iter(iterable)
+    try:
+        while True:
+            inicio = time.perf_counter()
+            try:
+                elemento = next(iterador)
+            except StopIteration:
+                break
+            finally:
+                total += time.perf_counter() - inicio
+            yield elemento
+    finally:
+        ETAPAS.observar(total, etapa=etapa)
+
+
+def instantanea() -> dict:
+    """
+    Valores de todas las métricas del proceso, serializables a JSON.
+    """
+    return {metrica.nombre: metrica.instantanea() for metrica in REGISTRO}
+
+
+def _sumar(instantaneas: list[dict]) -> list:
+    registro = [metrica.vacia() for metrica in REGISTRO]
+    for valores in instantaneas:
+        for metrica in registro:
+            metrica.sumar(valores.get(metrica.nombre, []))
+    return registro
+
+
+def sumar_instantaneas(instantaneas: list[dict]) -> dict:
+    """
+    Una sola instantánea con la suma de `instantaneas` (p. ej. las de procesos que ya terminaron).
+    """
+    return {metrica.nombre: metrica.instantanea() for metrica in _sumar(instantaneas)}
+
+
+def exportar(instantaneas: list[dict] | None = None) -> str:
+    """
+    Sin `instantaneas`, exporta las métricas de este proceso; con ellas, su suma.
+    """
+    registro = REGISTRO if instantaneas is None else _sumar(instantaneas)
+    lineas: list[str] = []
+    for metrica in registro:
+        lineas.extend(metrica.exportar())
+    return "\n".join(lineas) + "\n"
+
+
+def imprimir_perfil(archivo=None) -> None:
+    """
+    Resumen por etapa (llamadas, total y media) de lo medido en este proceso.
+    """
+    archivo = archivo or sys.stderr
+    resumen = ETAPAS.resumen()
+    if not resumen:
+        return
+    total = sum(s for _, s in resumen.values())
+    print("\nPerfil por etapa:", file=archivo)
+    print(f"  {'etapa':<24} {'llamadas':>8} {'total (s)':>10} {'media (s)':>10} {'%':>6}", file=archivo)
+    for (etapa,), (cuenta, suma) in sorted(resumen.items(), key=lambda kv: -kv[1][1]):
+        porcentaje = suma / total * 100 if total else 0.0
+        print(f"  {etapa:<24} {cuenta:>8} {suma:>10.3f} {suma / max(cuenta, 1):>10.3f} {porcentaje:>5.1f}%", file=archivo)
@@ -0,0 +1,143 @@
+"""
+Estructuras mínimas de una transcripción, independientes del SDK de AssemblyAI.
+
+Imitan los atributos que el resto del programa lee del objeto `aai.Transcript`
+(`text`, `utterances`, `words`, `language_code`, `status`) para que una
+transcripción recuperada de la caché se use igual que una recién obtenida.
+"""
+
+
+class Palabra:
+    def __init__(self, text: str, start: int, end: int, confidence: float | None = None, speaker: str | None = None):
+        self.text = text
+        self.start = start
+        self.end = end
+        self.confidence = confidence
+        self.speaker = speaker
+
+    def a_lista(self) -> list:
+        return [self.text, self.start, self.end, self.confidence, self.speaker]
+
+    @classmethod
+    def desde_lista(cls, datos: list) -> "Palabra":
+        return cls(*datos)
+
+
+class Segmento:
+    """
+    Equivalente a `aai.Utterance`: un turno de un hablante con sus palabras.
+    """
+
+    def __init__(
+        self,
+        speaker: str,
+        text: str,
+        start: int,
+        end: int,
+        confidence: float | None = None,
+        words: list[Palabra] | None = None,
+    ):
+        self.speaker = speaker
+        self.text = text
+        self.start = start
+        self.end = end
+        self.confidence = confidence
+        self.words = words or []
+
+    def a_dict(self) -> dict:
+        return {
+            "speaker": self.speaker,
+            "text": self.text,
+            "start": self.start,
+            "end": self.end,
+            "confidence": self.confidence,
+            "words": [p.a_lista() for p in self.words],
+        }
+
+    @classmethod
+    def desde_dict(cls, datos: dict) -> "Segmento":
+        return cls(
+            datos["speaker"],
+            datos["text"],
+            datos["start"],
+            datos["end"],
+            datos.get("confidence"),
+            [Palabra.desde_lista(p) for p in datos.get("words") or []],
+        )
+
+
+class TranscripcionLocal:
+    """
+    Transcripción completa guardada fuera del proveedor (caché, fragmentos unidos, etc.).
+    """
+
+    status = "completed"
+    error = None
+
+    def __init__(
+        self,
+        text: str,
+        utterances: list[Segmento] | None = None,
+        words: list[Palabra] | None = None,
+        language_code: str | None = None,
+        audio_duration: float | None = None,
+        id: str | None = None,
+    ):
+        self.text = text
+        self.utterances = utterances or []
+        self.words = words or []
+        self.language_code = language_code
+        self.audio_duration = audio_duration
+        self.id = id
+
+    def a_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "text": self.text,
+            "language_code": self.language_code,
+            "audio_duration": self.audio_duration,
+            "utterances": [u.a_dict() for u in self.utterances],
+            "words": [p.a_lista() for p in self.words],
+        }
+
+    @classmethod
+    def desde_dict(cls, datos: dict) -> "TranscripcionLocal":
+        return cls(
+            datos.get("text") or "",
+            [Segmento.desde_dict(u) for u in datos.get("utterances") or []],
+            [Palabra.desde_lista(p) for p in datos.get("words") or []],
+            datos.get("language_code"),
+            datos.get("audio_duration"),
+            datos.get("id"),
+        )
+
+    @classmethod
+    def desde_transcripcion(cls, transcripcion) -> "TranscripcionLocal":
+        """
+        Copia los campos relevantes de un `aai.Transcript` (o de cualquier objeto con la misma forma).
+        """
+        def _palabra(w) -> Palabra:
+            speaker = getattr(w, "speaker", None)
+            return Palabra(w.text, w.start, w.end, getattr(w, "confidence", None), str(speaker) if speaker is not None else None)
+
+        utterances = [
+            Segmento(
+                str(u.speaker),
+                u.text,
+                u.start,
+                u.end,
+                getattr(u, "confidence", None),
+                [_palabra(w) for w in getattr(u, "words", None) or []],
+            )
+            for u in getattr(transcripcion, "utterances", None) or []
+        ]
+        words = [_palabra(w) for w in getattr(transcripcion, "words", None) or []]
+        idioma = getattr(transcripcion, "language_code", None)
+        return cls(
+            getattr(transcripcion, "text", None) or "",
+            utterances,
+            words,
+            str(idioma) if idioma is not None else None,
+            getattr(transcripcion, "audio_duration", None),
+            getattr(transcripcion, "id", None),
+        )
@@ -0,0 +1,221 @@
+"""
+Motores de transcripción intercambiables.
+
+Un motor recibe una fuente (ruta local o URL) y la configuración de
+transcribe.construir_configuracion, y retorna un objeto con la forma de
+`aai.Transcript` (`text`, `utterances`, `words`, `language_code`,
+`audio_duration`). Así la caché, los fragmentos, el clasificador, los formatos
+y la exportación no distinguen de dónde vino la transcripción.
+
+- "assemblyai" (por defecto): la API remota, a través del planificador.
+- "local": un modelo Whisper cuantizado (faster-whisper, int8 en CPU) en un
+  pool de procesos, sin red ni clave de API. No separa hablantes: el resultado
+  trae palabras con marcas de tiempo pero no utterances.
+
+MOTOR_TRANSCRIPCION elige el motor por defecto; la CLI lo cambia con --motor.
+"""
+import importlib.util
+import os
+import threading
+
+import clientes
+import metricas
+import planificador as planificador_llamadas
+from modelos import Palabra, TranscripcionLocal
+
+
+MOTORES = ("assemblyai", "local")
+
+
+class MotorAssemblyAI:
+    nombre = "assemblyai"
+    # Puede avisar por webhook y recibir subidas en streaming sin pasar por disco
+    admite_webhooks = True
+    admite_flujos = True
+
+    def configuracion_cache(self, configuracion: dict) -> dict:
+        return configuracion
+
+    def transcribir(self, fuente: str, configuracion: dict, clave_api: str | None = None):
+        """
+        Llamada directa a AssemblyAI; espera a que la transcripción termine.
+
+        Subida, envío y espera pasan por el planificador por separado, así un
+        error pasajero en la espera no vuelve a subir ni a enviar el archivo.
+        """
+        aai = clientes.sdk()
+        transcriptor = clientes.transcriptor(clave_api)
+        config = aai.TranscriptionConfig(**configuracion) if configuracion else None
+        planificador = planificador_llamadas.planificador_por_defecto()
+
+        try:
+            with planificador.en_vuelo():
+                # La subida se hace aparte para medirla por separado de la espera al proveedor
+                if os.path.exists(fuente):
+                    with metricas.medir("subida"):
+                        fuente = planificador.llamar(transcriptor.upload_file, fuente, idempotente=False)
+                with metricas.medir("proveedor"):
+                    transcripcion = planificador.llamar(transcriptor.submit, fuente, config=config, idempotente=False)
+                    transcripcion = planificador.llamar(transcripcion.wait_for_completion)
+            if transcripcion.status == aai.TranscriptStatus.error:
+                raise ValueError(f"Error en la transcripción: {transcripcion.error}")
+            return transcripcion
+        except AttributeError as e:
+            metricas.ERRORES.incrementar(origen="proveedor")
+            raise RuntimeError(f"Error inesperado al manejar la respuesta de la API: {e}")
+        except Exception as e:
+            metricas.ERRORES.incrementar(origen="proveedor")
+            raise RuntimeError(f"Error al transcribir el archivo: {e}")
+
+
+# Modelo cargado en cada proceso del pool local: (parámetros, modelo)
+_modelo_local: tuple | None = None
+
+
+def _modelo_del_proceso(modelo: str, hilos: int, tipo_computo: str):
+    # Se carga en la primera tarea del proceso (no en un initializer: un fallo
+    # ahí rompería el pool entero en lugar de devolver el error a quien llamó)
+    global _modelo_local
+    parametros = (modelo, hilos, tipo_computo)
+    if _modelo_local is None or _modelo_local[0] != parametros:
+        from faster_whisper import WhisperModel
+
+        _modelo_local = (parametros, WhisperModel(modelo, device="cpu", compute_type=tipo_computo, cpu_threads=hilos))
+    return _modelo_local[1]
+
+
+def _transcribir_en_proceso(fuente: str, idioma: str | None, indicacion: str | None, parametros: tuple) -> dict:
+    """
+    Se ejecuta dentro de un proceso del pool; retorna TranscripcionLocal.a_dict()
+    (un dict se envía entre procesos mucho más barato que miles de objetos).
+    """
+    segmentos, info = _modelo_del_proceso(*parametros).transcribe(
+        fuente,
+        language=idioma,
+        initial_prompt=indicacion,
+        word_timestamps=True,
+        vad_filter=True,
+    )
+    palabras = []
+    textos = []
+    for segmento in segmentos:
+        textos.append(segmento.text.strip())
+        for w in segmento.words or []:
+            palabras.append(Palabra(w.word.strip(), int(w.start * 1000), int(w.end * 1000), w.probability))
+    return TranscripcionLocal(
+        " ".join(t for t in textos if t),
+        words=palabras,
+        language_code=info.language,
+        audio_duration=info.duration,
+    ).a_dict()
+
+
+class MotorLocal:
+    """
+    Whisper cuantizado en CPU. Cada proceso del pool carga el modelo en su primera
+    tarea y lo conserva, y usa `hilos` hilos; con `procesos` x `hilos` ≈ núcleos
+    se ocupa toda la CPU.
+    """
+
+    nombre = "local"
+    admite_webhooks = False
+    admite_flujos = False
+
+    def __init__(self, modelo: str = "small", procesos: int = 1, hilos: int = 4, tipo_computo: str = "int8"):
+        if importlib.util.find_spec("faster_whisper") is None:
+            raise RuntimeError("El motor local requiere faster-whisper (pip install faster-whisper).")
+        self.modelo = modelo
+        self.procesos = max(1, procesos)
+        self.hilos = max(1, hilos)
+        self.tipo_computo = tipo_computo
+        self._ejecutor = None
+        self._candado = threading.Lock()
+
+    def _pool(self):
+        if self._ejecutor is None:
+            with self._candado:
+                if self._ejecutor is None:
+                    import multiprocessing
+                    from concurrent.futures import ProcessPoolExecutor
+
+                    # spawn: los procesos no heredan hilos ni candados del servidor web
+                    self._ejecutor = ProcessPoolExecutor(
+                        max_workers=self.procesos,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+        return self._ejecutor
+
+    def configuracion_cache(self, configuracion: dict) -> dict:
+        # Otro motor u otro modelo dan otra transcripción: no comparten entradas de caché
+        return dict(configuracion, motor=self.nombre, modelo=self.modelo)
+
+    def transcribir(self, fuente: str, configuracion: dict, clave_api: str | None = None):
+        if not os.path.exists(fuente):
+            raise RuntimeError(f"El motor local solo transcribe archivos locales: {fuente}")
+        idioma = configuracion.get("language_code")
+        # Whisper usa códigos ISO 639-1 ("en_us" -> "en"); sin idioma, lo detecta
+        idioma = idioma.split("_")[0].lower() if idioma else None
+        palabras_clave = configuracion.get("word_boost")
+        indicacion = ", ".join(palabras_clave) if palabras_clave else None
+
+        from concurrent.futures.process import BrokenProcessPool
+
+        parametros = (self.modelo, self.hilos, self.tipo_computo)
+        try:
+            with metricas.medir("motor_local"):
+                ejecutor = self._pool()
+                datos = ejecutor.submit(_transcribir_en_proceso, fuente, idioma, indicacion, parametros).result()
+        except BrokenProcessPool as e:
+            # Un proceso murió (p. ej. sin memoria): el pool se recrea en la siguiente llamada
+            with self._candado:
+                if self._ejecutor is ejecutor:
+                    self._ejecutor = None
+            metricas.ERRORES.incrementar(origen="motor_local")
+            raise RuntimeError(f"Error al transcribir con el motor local: {e}")
+        except Exception as e:
+            metricas.ERRORES.incrementar(origen="motor_local")
+            raise RuntimeError(f"Error al transcribir con el motor local: {e}")
+        return TranscripcionLocal.desde_dict(datos)
+
+    def cerrar(self) -> None:
+        with self._candado:
+            if self._ejecutor is not None:
+                self._ejecutor.shutdown()
+                self._ejecutor = None
+
+
+def crear_motor_local_desde_entorno() -> MotorLocal:
+    hilos = int(os.getenv("HILOS_MOTOR_LOCAL", "2"))
+    return MotorLocal(
+        modelo=os.getenv("MODELO_MOTOR_LOCAL", "small"),
+        procesos=int(os.getenv("PROCESOS_MOTOR_LOCAL", str(max(1, (os.cpu_count() or 1) // hilos)))),
+        hilos=hilos,
+        tipo_computo=os.getenv("COMPUTO_MOTOR_LOCAL", "int8"),
+    )
+
+
+_motores: dict[str, object] = {}
+_candado_motores = threading.Lock()
+
+
+def obtener_motor(nombre: str | None = None):
+    """
+    Motor compartido por el proceso. Sin `nombre`, usa MOTOR_TRANSCRIPCION
+    (por defecto "assemblyai"). Lanza ValueError si el motor no existe y
+    RuntimeError si no se puede usar en este entorno.
+    """
+    nombre = (nombre or os.getenv("MOTOR_TRANSCRIPCION") or "assemblyai").strip().lower()
+    if nombre not in MOTORES:
+        raise ValueError(f"Motor de transcripción desconocido: {nombre} (válidos: {', '.join(MOTORES)})")
+    motor = _motores.get(nombre)
+    if motor is None:
+        with _candado_motores:
+            motor = _motores.get(nombre)
+            if motor is None:
+                motor = MotorAssemblyAI() if nombre == "assemblyai" else crear_motor_local_desde_entorno()
+                _motores[nombre] = motor
+    return motor
+
+
+def motor_por_defecto():
+    return obtener_motor(None)
@@ -0,0 +1,208 @@
+"""
+Planificador de llamadas al proveedor: límite de ritmo (cubo de tokens), límite
+de transcripciones en vuelo, reintentos con espera exponencial y una cola de
+admisión acotada que aplica contrapresión a la web (429) y a los lotes de la CLI.
+"""
+import math
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import metricas
+
+
+class ColaLlenaError(RuntimeError):
+    """
+    No hay plazas libres en la cola de admisión.
+    `reintentar_en` es una estimación (en segundos) de cuándo habrá una libre.
+    """
+
+    def __init__(self, mensaje: str, reintentar_en: int):
+        super().__init__(mensaje)
+        self.reintentar_en = reintentar_en
+
+
+# Códigos HTTP que indican un fallo pasajero del proveedor
+CODIGOS_REINTENTABLES = {408, 425, 429, 500, 502, 503, 504}
+
+
+def es_reintentable(error: BaseException, idempotente: bool = True) -> bool:
+    """
+    Errores de red y respuestas 429/5xx se reintentan; el resto (clave inválida,
+    audio corrupto, transcripción con estado error) se propaga sin más.
+
+    Con idempotente=False (subidas y envíos, que son POST) solo se reintenta lo
+    que asegura que el proveedor no recibió la petición: un fallo al conectar o
+    un 429. Tras un timeout de lectura o un 5xx el trabajo pudo quedar creado, y
+    reintentarlo duplicaría una transcripción de pago.
+    """
+    # Solo se llega aquí tras un error, con el SDK (y httpx) ya cargado
+    import httpx
+
+    codigo = getattr(error, "status_code", None)
+    if not idempotente:
+        return isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout)) or codigo == 429
+    if isinstance(error, httpx.TransportError):
+        return True
+    return codigo in CODIGOS_REINTENTABLES
+
+
+class CuboTokens:
+    """
+    Cubo de tokens: `tasa` tokens por segundo con ráfagas de hasta `capacidad`.
+    """
+
+    def __init__(self, tasa: float, capacidad: float):
+        self.tasa = tasa
+        self.capacidad = max(capacidad, 1.0)
+        self._tokens = self.capacidad
+        self._ultimo = time.monotonic()
+        self._candado = threading.Lock()
+
+    def _reponer(self) -> None:
+        ahora = time.monotonic()
+        self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa)
+        self._ultimo = ahora
+
+    def tomar(self) -> float:
+        """
+        Bloquea hasta obtener un token; retorna los segundos esperados.
+        """
+        if self.tasa <= 0:
+            return 0.0
+        esperado = 0.0
+        while True:
+            with self._candado:
+                self._reponer()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return esperado
+                falta = (1 - self._tokens) / self.tasa
+            time.sleep(falta)
+            esperado += falta
+
+
+class Planificador:
+    """
+    Punto único por el que pasan las llamadas al proveedor de un proceso.
+
+    - llamar(): toma un token y reintenta errores pasajeros con espera
+      exponencial con jitter completo (aleatoria entre 0 y base * 2^intento).
+    - en_vuelo(): limita las transcripciones simultáneas en el proveedor
+      (lotes, fragmentos y trabajos web comparten el mismo límite).
+    - reservar()/liberar(): cola de admisión acotada para trabajos completos.
+    """
+
+    def __init__(
+        self,
+        tasa_por_segundo: float = 5.0,
+        rafaga: int = 10,
+        max_en_vuelo: int = 32,
+        max_en_cola: int = 200,
+        max_reintentos: int = 5,
+        espera_base: float = 1.0,
+        espera_max: float = 60.0,
+    ):
+        self.cubo = CuboTokens(tasa_por_segundo, rafaga)
+        self.max_en_cola = max_en_cola
+        self.max_reintentos = max_reintentos
+        self.espera_base = espera_base
+        self.espera_max = espera_max
+        self._en_vuelo = threading.BoundedSemaphore(max(1, max_en_vuelo))
+        self._max_en_vuelo = max(1, max_en_vuelo)
+        self._cola = threading.Condition()
+        self._ocupadas = 0
+        # Media móvil de cuánto se ocupa una plaza (de reservar a liberar), para estimar Retry-After
+        self._duracion_media = 30.0
+
+    def llamar(self, funcion, *args, reintentar: bool = True, idempotente: bool = True, **kwargs):
+        """
+        Ejecuta funcion(*args, **kwargs) respetando el ritmo y reintentando los
+        errores pasajeros. Con reintentar=False (p. ej. un flujo que no se puede
+        releer) solo se aplica el límite de ritmo; con idempotente=False (POST
+        que crean algo en el proveedor) solo se reintenta lo que es seguro
+        repetir (ver es_reintentable).
+        """
+        intento = 0
+        while True:
+            self.cubo.tomar()
+            try:
+                return funcion(*args, **kwargs)
+            except Exception as e:
+                if not reintentar or intento >= self.max_reintentos or not es_reintentable(e, idempotente):
+                    raise
+                espera = random.uniform(0, min(self.espera_max, self.espera_base * (2 ** intento)))
+                intento += 1
+                metricas.REINTENTOS.incrementar()
+                time.sleep(espera)
+
+    @contextmanager
+    def en_vuelo(self):
+        with metricas.medir("espera_en_vuelo"):
+            self._en_vuelo.acquire()
+        try:
+            yield
+        finally:
+            self._en_vuelo.release()
+
+    def reservar(self, bloquear: bool = False, timeout: float | None = None) -> float:
+        """
+        Ocupa una plaza de la cola de admisión y retorna el instante de la reserva
+        (se pasa luego a liberar). Sin bloquear, lanza ColaLlenaError si no hay plazas.
+        """
+        with self._cola:
+            if self._ocupadas >= self.max_en_cola:
+                if not bloquear:
+                    metricas.RECHAZOS.incrementar()
+                    raise ColaLlenaError(
+                        "Hay demasiadas transcripciones en curso; intenta de nuevo más tarde.",
+                        self.estimar_espera(),
+                    )
+                if not self._cola.wait_for(lambda: self._ocupadas < self.max_en_cola, timeout):
+                    raise ColaLlenaError("Tiempo agotado esperando una plaza en la cola.", self.estimar_espera())
+            self._ocupadas += 1
+        return time.monotonic()
+
+    def liberar(self, reservado_en: float | None = None) -> None:
+        with self._cola:
+            self._ocupadas = max(0, self._ocupadas - 1)
+            if reservado_en is not None:
+                self._duracion_media = 0.8 * self._duracion_media + 0.2 * (time.monotonic() - reservado_en)
+            self._cola.notify()
+
+    def estimar_espera(self) -> int:
+        # Con la cola llena, una plaza se libera en promedio cada duracion_media / en_vuelo segundos
+        return max(1, min(300, math.ceil(self._duracion_media / self._max_en_vuelo)))
+
+    @property
+    def ocupadas(self) -> int:
+        return self._ocupadas
+
+
+def crear_planificador_desde_entorno() -> Planificador:
+    return Planificador(
+        tasa_por_segundo=float(os.getenv("LIMITE_PETICIONES_POR_SEGUNDO", "5")),
+        rafaga=int(os.getenv("RAFAGA_PETICIONES", "10")),
+        max_en_vuelo=int(os.getenv("MAX_TRANSCRIPCIONES_EN_VUELO", "32")),
+        max_en_cola=int(os.getenv("MAX_TRABAJOS_EN_COLA", "200")),
+        max_reintentos=int(os.getenv("MAX_REINTENTOS_PROVEEDOR", "5")),
+        espera_base=float(os.getenv("ESPERA_BASE_REINTENTO_SEGUNDOS", "1")),
+    )
+
+
+_planificador_por_defecto: Planificador | None = None
+_candado_por_defecto = threading.Lock()
+
+
+def planificador_por_defecto() -> Planificador:
+    """
+    Planificador compartido por la CLI, la app web y los pools de lotes y fragmentos.
+    """
+    global _planificador_por_defecto
+    if _planificador_por_defecto is None:
+        with _candado_por_defecto:
+            if _planificador_por_defecto is None:
+                _planificador_por_defecto = crear_planificador_desde_entorno()
+    return _planificador_por_defecto
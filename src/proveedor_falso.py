@@ -0,0 +1,370 @@
+"""
+Servidor local que imita la API de transcripción de AssemblyAI (v2) para pruebas
+de carga sin red ni costo.
+
+Uso:
+  python proveedor_falso.py [--puerto=8089] [--retardo=2] [--tasa-error=0]
+                            [--tasa-429=0] [--tasa-500=0] [--max-concurrentes=0]
+                            [--puerto-tiempo-real=8090]
+
+Después, en la app o la CLI:
+  URL_API_ASSEMBLYAI=http://127.0.0.1:8089 ASSEMBLYAI_API_KEY=falsa ...
+
+Implementa /v2/upload, POST /v2/transcript y GET /v2/transcript/<id>. Cada
+transcripción termina `retardo` segundos después de enviarse y, si se pidió,
+se avisa al webhook con la cabecera de autenticación indicada.
+
+Para probar reintentos y contrapresión, --tasa-429 rechaza esa fracción de las
+peticiones de subida y envío, --tasa-500 hace fallar esa fracción de las
+consultas de estado (lo único que el cliente reintenta tras un 5xx: repetir un
+envío podría duplicar la transcripción) y --max-concurrentes responde 429
+cuando ya hay tantas transcripciones sin terminar.
+
+Con --puerto-tiempo-real también atiende la API de streaming (v3) por
+WebSocket: cada 300 ms de audio recibido dicta una palabra como resultado
+parcial y cierra un turno al completar cada frase, alternando dos hablantes.
+Se usa con URL_TIEMPO_REAL_ASSEMBLYAI=ws://127.0.0.1:8090.
+"""
+import heapq
+import json
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from flask import Flask, jsonify, request
+
+
+_FRASES = [
+    "Buenos días a todos, gracias por venir.",
+    "Empecemos con el informe de la semana.",
+    "El cliente pidió adelantar la entrega del proyecto.",
+    "¿Tenemos los datos de la última llamada?",
+    "Sí, los envío hoy por la tarde.",
+    "Perfecto, entonces lo revisamos el lunes.",
+]
+
+
+def _publico(registro: dict) -> dict:
+    # Los campos con "_" son internos del servidor falso
+    return {k: v for k, v in registro.items() if not k.startswith("_")}
+
+
+def _transcripcion_completa(registro: dict) -> dict:
+    """
+    Contenido sintético y determinista: una utterance por frase, alternando dos hablantes.
+    """
+    utterances = []
+    palabras_totales = []
+    tiempo = 0
+    for i, frase in enumerate(_FRASES):
+        speaker = "AB"[i % 2]
+        palabras = []
+        for texto in frase.split():
+            palabras.append({"text": texto, "start": tiempo, "end": tiempo + 300, "confidence": 0.95, "speaker": speaker})
+            tiempo += 350
+        utterances.append({
+            "speaker": speaker, "text": frase, "start": palabras[0]["start"], "end": palabras[-1]["end"],
+            "confidence": 0.95, "words": palabras,
+        })
+        palabras_totales.extend(palabras)
+        tiempo += 600
+    return dict(
+        registro,
+        status="completed",
+        text=" ".join(_FRASES),
+        words=palabras_totales,
+        utterances=utterances,
+        confidence=0.95,
+        audio_duration=max(1, tiempo // 1000),
+        language_code=registro.get("language_code") or "es",
+    )
+
+
+class ProveedorFalso:
+    """
+    Estado del servidor falso: transcripciones en memoria, una agenda de
+    finalizaciones y un pool pequeño para entregar webhooks.
+    """
+
+    def __init__(
+        self,
+        retardo: float = 2.0,
+        tasa_error: float = 0.0,
+        tasa_429: float = 0.0,
+        tasa_500: float = 0.0,
+        max_concurrentes: int = 0,
+    ):
+        self.retardo = retardo
+        self.tasa_error = tasa_error
+        self.tasa_429 = tasa_429
+        self.tasa_500 = tasa_500
+        self.max_concurrentes = max_concurrentes
+        self.transcripciones: dict[str, dict] = {}
+        # Contadores para verificar en las pruebas (p. ej. que nadie sondea)
+        self.subidas = 0
+        self.envios = 0
+        self.consultas = 0
+        self.webhooks_entregados = 0
+        self.webhooks_fallidos = 0
+        self.peticiones = 0
+        self.rechazos_429 = 0
+        self.errores_500 = 0
+        self.consultas_totales = 0
+        self._agenda: list[tuple[float, str]] = []
+        self._candado = threading.Condition()
+        self._entregas = ThreadPoolExecutor(max_workers=16, thread_name_prefix="webhook-falso")
+        threading.Thread(target=self._bucle_agenda, name="agenda-falsa", daemon=True).start()
+
+    def fallo_inyectado(self) -> int | None:
+        """
+        Código de error a devolver para esta petición de subida o envío (o None).
+        Determinista, como tasa_error: cada 1/tasa peticiones.
+        """
+        with self._candado:
+            self.peticiones += 1
+            if self.max_concurrentes and len(self._agenda) >= self.max_concurrentes:
+                self.rechazos_429 += 1
+                return 429
+            if self.tasa_429 and self.peticiones % max(1, round(1 / self.tasa_429)) == 0:
+                self.rechazos_429 += 1
+                return 429
+        return None
+
+    def fallo_consulta(self) -> int | None:
+        """
+        Como fallo_inyectado, para una consulta de estado: 500 cada 1/tasa_500 consultas.
+        """
+        with self._candado:
+            self.consultas_totales += 1
+            if self.tasa_500 and self.consultas_totales % max(1, round(1 / self.tasa_500)) == 0:
+                self.errores_500 += 1
+                return 500
+        return None
+
+    def subir(self, url_base: str, bytes_leidos: int) -> str:
+        with self._candado:
+            self.subidas += 1
+        return f"{url_base.rstrip('/')}/archivos/{uuid.uuid4().hex}?bytes={bytes_leidos}"
+
+    def enviar(self, cuerpo: dict) -> dict:
+        id_transcripcion = uuid.uuid4().hex
+        registro = dict(cuerpo, id=id_transcripcion, status="queued")
+        with self._candado:
+            self.envios += 1
+            # Determinista: falla una de cada 1/tasa_error transcripciones
+            if self.tasa_error and self.envios % max(1, round(1 / self.tasa_error)) == 0:
+                registro["_fallar"] = True
+            self.transcripciones[id_transcripcion] = registro
+            heapq.heappush(self._agenda, (time.monotonic() + self.retardo, id_transcripcion))
+            self._candado.notify()
+        return registro
+
+    def consultar(self, id_transcripcion: str) -> dict | None:
+        with self._candado:
+            self.consultas += 1
+            registro = self.transcripciones.get(id_transcripcion)
+        return _publico(registro) if registro is not None else None
+
+    def _bucle_agenda(self) -> None:
+        while True:
+            with self._candado:
+                while not self._agenda or self._agenda[0][0] > time.monotonic():
+                    espera = self._agenda[0][0] - time.monotonic() if self._agenda else None
+                    self._candado.wait(espera)
+                _, id_transcripcion = heapq.heappop(self._agenda)
+                registro = self.transcripciones[id_transcripcion]
+                if registro.get("_fallar"):
+                    registro.update(status="error", error="Fallo simulado por el proveedor falso.")
+                else:
+                    self.transcripciones[id_transcripcion] = registro = _transcripcion_completa(registro)
+            if registro.get("webhook_url"):
+                self._entregas.submit(self._entregar_webhook, registro)
+
+    def _entregar_webhook(self, registro: dict) -> None:
+        cuerpo = json.dumps({"transcript_id": registro["id"], "status": registro["status"]}).encode("utf-8")
+        cabeceras = {"Content-Type": "application/json"}
+        if registro.get("webhook_auth_header_name"):
+            cabeceras[registro["webhook_auth_header_name"]] = registro.get("webhook_auth_header_value") or ""
+        try:
+            with urllib.request.urlopen(urllib.request.Request(registro["webhook_url"], cuerpo, cabeceras), timeout=10):
+                pass
+            exito = True
+        except Exception:
+            exito = False
+        with self._candado:
+            if exito:
+                self.webhooks_entregados += 1
+            else:
+                self.webhooks_fallidos += 1
+
+
+def crear_app(proveedor: ProveedorFalso) -> Flask:
+    app = Flask(__name__)
+
+    def _respuesta_fallo(codigo: int):
+        if codigo == 429:
+            return jsonify({"error": "Too many requests"}), 429, {"Retry-After": "1"}
+        return jsonify({"error": "Internal server error"}), codigo
+
+    @app.route("/v2/upload", methods=["POST"])
+    def subir():
+        leidos = 0
+        while True:
+            bloque = request.stream.read(64 * 1024)
+            if not bloque:
+                break
+            leidos += len(bloque)
+        codigo = proveedor.fallo_inyectado()
+        if codigo:
+            return _respuesta_fallo(codigo)
+        return jsonify({"upload_url": proveedor.subir(request.host_url, leidos)})
+
+    @app.route("/v2/transcript", methods=["POST"])
+    def enviar():
+        codigo = proveedor.fallo_inyectado()
+        if codigo:
+            return _respuesta_fallo(codigo)
+        cuerpo = request.get_json(silent=True) or {}
+        if not cuerpo.get("audio_url"):
+            return jsonify({"error": "audio_url es obligatorio"}), 400
+        return jsonify(_publico(proveedor.enviar(cuerpo)))
+
+    @app.route("/v2/transcript/<id_transcripcion>", methods=["GET"])
+    def consultar(id_transcripcion: str):
+        codigo = proveedor.fallo_consulta()
+        if codigo:
+            return _respuesta_fallo(codigo)
+        registro = proveedor.consultar(id_transcripcion)
+        if registro is None:
+            return jsonify({"error": "Transcript not found"}), 404
+        return jsonify(registro)
+
+    return app
+
+
+# Audio (PCM de 16 bits a 16 kHz) que "dura" cada palabra dictada en tiempo real
+_BYTES_POR_PALABRA = 16000 * 2 * 3 // 10
+
+
+class SesionTiempoRealFalsa:
+    """
+    Estado de una conexión de streaming: audio recibido y turno en curso.
+    """
+
+    def __init__(self, conexion, formatear: bool):
+        self.conexion = conexion
+        self.formatear = formatear
+        self.bytes_recibidos = 0
+        self.orden = 0
+        self.palabras: list[dict] = []
+
+    def _enviar(self, mensaje: dict) -> None:
+        self.conexion.send(json.dumps(mensaje))
+
+    def _turno(self, fin: bool, formateado: bool) -> None:
+        frase = _FRASES[self.orden % len(_FRASES)]
+        crudo = " ".join(p["text"] for p in self.palabras).lower()
+        texto = frase if formateado else "".join(c for c in crudo if c.isalnum() or c.isspace())
+        self._enviar({
+            "type": "Turn", "turn_order": self.orden, "turn_is_formatted": formateado, "end_of_turn": fin,
+            "transcript": texto, "end_of_turn_confidence": 0.9 if fin else 0.1, "words": self.palabras,
+            "speaker_label": "AB"[self.orden % 2],
+        })
+
+    def _cerrar_turno(self) -> None:
+        if not self.palabras:
+            return
+        self._turno(fin=True, formateado=False)
+        if self.formatear:
+            self._turno(fin=True, formateado=True)
+        self.orden += 1
+        self.palabras = []
+
+    def recibir_audio(self, audio: bytes) -> None:
+        anterior = self.bytes_recibidos // _BYTES_POR_PALABRA
+        self.bytes_recibidos += len(audio)
+        for indice in range(anterior, self.bytes_recibidos // _BYTES_POR_PALABRA):
+            frase = _FRASES[self.orden % len(_FRASES)].split()
+            inicio = indice * 300
+            self.palabras.append({
+                "text": frase[len(self.palabras)], "start": inicio, "end": inicio + 280,
+                "confidence": 0.95, "word_is_final": True,
+            })
+            if len(self.palabras) == len(frase):
+                self._cerrar_turno()
+            else:
+                self._turno(fin=False, formateado=False)
+
+    def terminar(self, inicio: float) -> None:
+        self._cerrar_turno()
+        self._enviar({
+            "type": "Termination",
+            "audio_duration_seconds": self.bytes_recibidos // (16000 * 2),
+            "session_duration_seconds": int(time.monotonic() - inicio),
+        })
+
+
+def servir_tiempo_real(puerto: int):
+    """
+    Levanta el servidor WebSocket de streaming en un hilo y lo retorna.
+    """
+    from urllib.parse import parse_qs, urlparse
+
+    from websockets.sync.server import serve
+
+    def _atender(conexion) -> None:
+        inicio = time.monotonic()
+        parametros = parse_qs(urlparse(conexion.request.path).query)
+        sesion = SesionTiempoRealFalsa(conexion, parametros.get("format_turns", ["False"])[0].lower() == "true")
+        sesion._enviar({
+            "type": "Begin", "id": uuid.uuid4().hex,
+            "expires_at": (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat(),
+        })
+        for mensaje in conexion:
+            if isinstance(mensaje, bytes):
+                sesion.recibir_audio(mensaje)
+            elif json.loads(mensaje).get("type") == "Terminate":
+                sesion.terminar(inicio)
+                return
+
+    servidor = serve(_atender, "127.0.0.1", puerto)
+    threading.Thread(target=servidor.serve_forever, name="tiempo-real-falso", daemon=True).start()
+    return servidor
+
+
+def main() -> int:
+    parametros = {"puerto": 8089, "retardo": 2.0, "tasa_error": 0.0, "tasa_429": 0.0, "tasa_500": 0.0,
+                  "max_concurrentes": 0}
+    puerto_tiempo_real = None
+    for arg in sys.argv[1:]:
+        if arg.startswith("--puerto="):
+            parametros["puerto"] = int(arg.split("=", 1)[1])
+        elif arg.startswith("--retardo="):
+            parametros["retardo"] = float(arg.split("=", 1)[1])
+        elif arg.startswith("--tasa-error="):
+            parametros["tasa_error"] = float(arg.split("=", 1)[1])
+        elif arg.startswith("--tasa-429="):
+            parametros["tasa_429"] = float(arg.split("=", 1)[1])
+        elif arg.startswith("--tasa-500="):
+            parametros["tasa_500"] = float(arg.split("=", 1)[1])
+        elif arg.startswith("--max-concurrentes="):
+            parametros["max_concurrentes"] = int(arg.split("=", 1)[1])
+        elif arg.startswith("--puerto-tiempo-real="):
+            puerto_tiempo_real = int(arg.split("=", 1)[1])
+        else:
+            print(__doc__)
+            return 1
+
+    proveedor = ProveedorFalso(**{k: v for k, v in parametros.items() if k != "puerto"})
+    if puerto_tiempo_real:
+        servir_tiempo_real(puerto_tiempo_real)
+    crear_app(proveedor).run(host="127.0.0.1", port=parametros["puerto"], threaded=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
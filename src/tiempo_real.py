@@ -0,0 +1,462 @@
+"""
+Transcripción en tiempo real (subtítulos de reuniones en vivo).
+
+El audio llega como tramas PCM de 16 bits, mono, a TASA_MUESTREO Hz y se
+reenvía por WebSocket a la API de streaming de AssemblyAI (v3). Los
+resultados se entregan como eventos (dicts listos para JSON):
+
+- {"tipo": "parcial", "texto", "hablante"}: el turno en curso; cada parcial
+  reemplaza al anterior.
+- {"tipo": "final", "texto", "hablante", "etiqueta", "lineas", "inicio", "fin"}:
+  turno cerrado, con el nombre de mapa_nombres_hablantes y el formato de
+  diálogo aplicado en "lineas".
+- {"tipo": "error", "mensaje"} y {"tipo": "fin"} al cerrar la sesión.
+
+URL_TIEMPO_REAL_ASSEMBLYAI cambia el servidor de streaming (p. ej.
+ws://127.0.0.1:8090 para proveedor_falso.py --puerto-tiempo-real=8090).
+
+El WebSocket de una sesión vive en el proceso que la creó. Con estado
+compartido, el audio y el cierre que llegan a otro worker se dejan en la base
+para ese proceso, y los eventos se copian ahí para los lectores de otros workers.
+"""
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+
+import clientes
+import estado_compartido
+import metricas
+from planificador import ColaLlenaError
+
+
+TASA_MUESTREO = 16000
+BYTES_POR_SEGUNDO = TASA_MUESTREO * 2
+# AssemblyAI acepta tramas de 50 a 1000 ms; 100 ms equilibra latencia y número de mensajes
+BYTES_POR_TRAMA = BYTES_POR_SEGUNDO // 10
+
+URL_TIEMPO_REAL = os.getenv("URL_TIEMPO_REAL_ASSEMBLYAI", "")
+
+# Eventos pendientes por sesión; con la cola llena se descartan los parciales
+_MAX_EVENTOS_PENDIENTES = 1000
+
+# Entre procesos: cada cuánto se revisan los mensajes de la base y cada cuánto
+# el dueño de una sesión marca que sigue vivo (sin latido, la sesión se da por perdida)
+_INTERVALO_RELEVO = 0.05
+_SEGUNDOS_LATIDO = 2
+_SEGUNDOS_SIN_LATIDO = 10
+# Una sesión terminada se conserva este tiempo para los lectores que aún no leyeron el "fin"
+_SEGUNDOS_TRAS_FIN = 5
+
+
+# Primera versión del SDK probada con streaming v3 con hablantes (speaker_labels,
+# format_turns y los modelos universal_streaming_*)
+VERSION_MINIMA_SDK = "1.6.1"
+
+
+def _streaming():
+    # El cliente de streaming del SDK se carga al abrir la primera sesión
+    clientes.sdk()
+    try:
+        from assemblyai.streaming import v3
+    except ImportError:
+        v3 = None
+    campos = getattr(getattr(v3, "RealTimeParameters", None), "model_fields", None) or {}
+    if "speaker_labels" not in campos or not hasattr(getattr(v3, "SpeechModel", None), "universal_streaming_multilingual"):
+        raise RuntimeError(
+            f"La transcripción en tiempo real requiere assemblyai>={VERSION_MINIMA_SDK} "
+            f"(pip install -U assemblyai)."
+        )
+    return v3
+
+
+def _nombre_hablante(etiqueta: str | None, mapa_nombres: dict) -> str | None:
+    if not etiqueta:
+        return None
+    return mapa_nombres.get(etiqueta, f"Speaker {etiqueta}")
+
+
+class SesionTiempoReal:
+    """
+    Una sesión de streaming con el proveedor: enviar(audio) por tramas,
+    eventos() para leer los resultados y terminar() al acabar el audio.
+    """
+
+    def __init__(
+        self,
+        mapa_nombres: dict | None = None,
+        idioma: str | None = None,
+        clave_api: str | None = None,
+    ):
+        self.id = uuid.uuid4().hex
+        self.creada = time.time()
+        self.actualizada = self.creada
+        self.terminada = False
+        self.terminada_en: float | None = None
+        self._mapa_nombres = mapa_nombres or {}
+        self._idioma = idioma
+        self._eventos: queue.Queue = queue.Queue(maxsize=_MAX_EVENTOS_PENDIENTES)
+        self._ultimo_audio: float | None = None
+        self._error: str | None = None
+        self._candado = threading.Lock()
+        # Recibe (id, evento) por cada evento publicado (p. ej. para copiarlo al estado compartido)
+        self.al_publicar = None
+
+        aai_streaming = _streaming()
+        opciones = aai_streaming.RealTimeTranscriberOptions(api_key=clave_api or clientes.sdk().settings.api_key)
+        if URL_TIEMPO_REAL:
+            opciones.api_host = URL_TIEMPO_REAL
+        self._cliente = aai_streaming.RealTimeTranscriber(opciones)
+        self._cliente.on(aai_streaming.RealTimeEvents.Turn, self._turno)
+        self._cliente.on(aai_streaming.RealTimeEvents.Error, self._fallo)
+        self._cliente.on(aai_streaming.RealTimeEvents.Termination, lambda _cliente, _evento: self._cerrar())
+
+    def conectar(self) -> None:
+        """
+        Abre el WebSocket con el proveedor; lanza RuntimeError si no se pudo.
+        """
+        aai_streaming = _streaming()
+        ingles = bool(self._idioma) and self._idioma.lower().startswith("en")
+        parametros = aai_streaming.RealTimeParameters(
+            sample_rate=TASA_MUESTREO,
+            encoding=aai_streaming.Encoding.pcm_s16le,
+            format_turns=True,
+            speaker_labels=True,
+            speech_model=(
+                aai_streaming.SpeechModel.universal_streaming_english if ingles
+                else aai_streaming.SpeechModel.universal_streaming_multilingual
+            ),
+        )
+        with metricas.medir("conexion_tiempo_real"):
+            self._cliente.connect(parametros)
+        if self._error:
+            raise RuntimeError(f"No se pudo iniciar la transcripción en tiempo real: {self._error}")
+
+    def enviar(self, audio: bytes) -> None:
+        if self.terminada or not audio:
+            return
+        self._ultimo_audio = time.monotonic()
+        self.actualizada = time.time()
+        self._cliente.stream(audio)
+
+    def terminar(self) -> None:
+        """
+        Avisa al proveedor de que no hay más audio y espera los últimos turnos.
+        """
+        # Tras un error o el cierre del proveedor solo queda cerrar el WebSocket
+        self._cliente.disconnect(terminate=not self.terminada)
+        self._cerrar()
+
+    def eventos(self, espera: float | None = None):
+        """
+        Genera los eventos de la sesión hasta "fin". Con `espera`, genera None
+        cada `espera` segundos sin eventos (para mantener viva una conexión SSE).
+        """
+        while True:
+            try:
+                evento = self._eventos.get(timeout=espera)
+            except queue.Empty:
+                yield None
+                continue
+            yield evento
+            if evento["tipo"] == "fin":
+                return
+
+    def _publicar(self, evento: dict) -> None:
+        if self.al_publicar is not None:
+            try:
+                self.al_publicar(self.id, evento)
+            except Exception:
+                metricas.ERRORES.incrementar(origen="estado_compartido")
+        try:
+            self._eventos.put_nowait(evento)
+        except queue.Full:
+            if evento["tipo"] == "parcial":
+                return
+            # Un final o el fin no se pierden: se descarta el evento más antiguo
+            try:
+                self._eventos.get_nowait()
+            except queue.Empty:
+                pass
+            self._eventos.put_nowait(evento)
+
+    def _turno(self, _cliente, turno) -> None:
+        if self._ultimo_audio is not None:
+            # Tiempo desde la última trama enviada: cota de la latencia percibida
+            metricas.ETAPAS.observar(time.monotonic() - self._ultimo_audio, etapa="latencia_tiempo_real")
+        hablante = _nombre_hablante(turno.speaker_label, self._mapa_nombres)
+        # Con format_turns, el fin de turno llega dos veces: sin formato y luego formateado
+        if not (turno.end_of_turn and turno.turn_is_formatted):
+            self._publicar({"tipo": "parcial", "texto": turno.transcript, "hablante": hablante})
+            return
+
+        import transcribe
+
+        palabras = turno.words or []
+        self._publicar({
+            "tipo": "final",
+            "texto": turno.transcript,
+            "hablante": hablante,
+            "etiqueta": turno.speaker_label,
+            "lineas": list(transcribe.formatear_dialogo_incremental([turno.transcript])),
+            "inicio": palabras[0].start if palabras else None,
+            "fin": palabras[-1].end if palabras else None,
+        })
+
+    def _fallo(self, _cliente, error) -> None:
+        self._error = str(error)
+        metricas.ERRORES.incrementar(origen="tiempo_real")
+        self._publicar({"tipo": "error", "mensaje": self._error})
+        self._cerrar()
+
+    def _cerrar(self) -> None:
+        with self._candado:
+            if self.terminada:
+                return
+            self.terminada = True
+            self.terminada_en = time.time()
+        self._publicar({"tipo": "fin"})
+
+
+class GestorSesionesTiempoReal:
+    """
+    Sesiones en vivo de la app web, por id. Una sesión sin audio durante
+    `inactividad_segundos` se termina sola (p. ej. si el navegador se cerró).
+    Las terminadas no cuentan para `max_sesiones` y se descartan poco después.
+
+    Con `estado` (un EstadoCompartido), enviar_audio, eventos y terminar también
+    atienden sesiones de otros procesos a través de la base.
+    """
+
+    def __init__(
+        self,
+        max_sesiones: int = 20,
+        inactividad_segundos: float = 60,
+        estado: "estado_compartido.EstadoCompartido | None" = None,
+    ):
+        self.max_sesiones = max_sesiones
+        self._inactividad = inactividad_segundos
+        self._sesiones: dict[str, SesionTiempoReal] = {}
+        self._candado = threading.Lock()
+        self._estado = estado
+        self._relevo: threading.Thread | None = None
+        self._vigilante: threading.Thread | None = None
+
+    def crear(self, **kwargs) -> SesionTiempoReal:
+        """
+        Crea y conecta una sesión. Lanza ColaLlenaError si se alcanzó el máximo
+        y RuntimeError si el proveedor rechazó la conexión.
+        """
+        for sesion in self._purgar():
+            sesion.terminar()
+        with self._candado:
+            if sum(not s.terminada for s in self._sesiones.values()) >= self.max_sesiones:
+                raise ColaLlenaError(
+                    "Se alcanzó el máximo de sesiones en tiempo real; intenta más tarde.",
+                    max(1, int(self._inactividad)),
+                )
+            sesion = SesionTiempoReal(**kwargs)
+            self._sesiones[sesion.id] = sesion
+            # Tras un fork el hilo del padre no existe en el hijo: is_alive() es False
+            if self._vigilante is None or not self._vigilante.is_alive():
+                self._vigilante = threading.Thread(target=self._vigilar, name="vigilante-tiempo-real", daemon=True)
+                self._vigilante.start()
+        try:
+            if self._estado is not None:
+                sesion.al_publicar = self._reflejar
+                self._estado.registrar_sesion(sesion.id, estado_compartido.proceso_actual())
+                self._iniciar_relevo()
+            sesion.conectar()
+        except Exception:
+            self.cerrar(sesion.id)
+            raise
+        return sesion
+
+    def obtener(self, id_sesion: str) -> SesionTiempoReal | None:
+        with self._candado:
+            return self._sesiones.get(id_sesion)
+
+    def cerrar(self, id_sesion: str) -> SesionTiempoReal | None:
+        with self._candado:
+            sesion = self._sesiones.pop(id_sesion, None)
+        if sesion is not None:
+            sesion.terminar()
+        return sesion
+
+    def enviar_audio(self, id_sesion: str, audio: bytes) -> bool:
+        """
+        Envía audio a la sesión, sea de este proceso o de otro. Retorna False si
+        la sesión no existe o ya terminó.
+        """
+        sesion = self.obtener(id_sesion)
+        if sesion is not None:
+            if sesion.terminada:
+                return False
+            sesion.enviar(audio)
+            return True
+        if not self._remota_activa(id_sesion):
+            return False
+        self._estado.enviar_mensaje(id_sesion, "propietario", "audio", audio)
+        return True
+
+    def eventos(self, id_sesion: str, espera: float | None = None):
+        """
+        Generador de eventos de la sesión (ver SesionTiempoReal.eventos), o None si no existe.
+        """
+        sesion = self.obtener(id_sesion)
+        if sesion is not None:
+            return sesion.eventos(espera)
+        if self._estado is None or self._estado.obtener_sesion(id_sesion) is None:
+            return None
+        return self._eventos_remotos(id_sesion, espera)
+
+    def terminar(self, id_sesion: str) -> bool:
+        """
+        Cierra la sesión, sea de este proceso o de otro. Retorna False si no existe.
+        """
+        if self.cerrar(id_sesion) is not None:
+            return True
+        if self._estado is None or self._estado.obtener_sesion(id_sesion) is None:
+            return False
+        self._estado.enviar_mensaje(id_sesion, "propietario", "terminar")
+        return True
+
+    def _remota_activa(self, id_sesion: str) -> bool:
+        if self._estado is None:
+            return False
+        datos = self._estado.obtener_sesion(id_sesion)
+        return (
+            datos is not None
+            and not datos["terminada"]
+            and datos["latido"] >= time.time() - _SEGUNDOS_SIN_LATIDO
+        )
+
+    def _eventos_remotos(self, id_sesion: str, espera: float | None):
+        # Lee de la base los eventos que copia el proceso dueño de la sesión
+        desde = 0
+        sin_eventos = 0.0
+        while True:
+            mensajes = self._estado.leer_mensajes(id_sesion, "lectores", desde)
+            for id_mensaje, _tipo, datos in mensajes:
+                desde = id_mensaje
+                evento = json.loads(datos)
+                yield evento
+                if evento["tipo"] == "fin":
+                    return
+            if mensajes:
+                sin_eventos = 0.0
+                continue
+            time.sleep(_INTERVALO_RELEVO)
+            sin_eventos += _INTERVALO_RELEVO
+            if espera is not None and sin_eventos >= espera:
+                sin_eventos = 0.0
+                datos = self._estado.obtener_sesion(id_sesion)
+                if datos is None or (not datos["terminada"] and datos["latido"] < time.time() - _SEGUNDOS_SIN_LATIDO):
+                    yield {"tipo": "error", "mensaje": "Se perdió la conexión con la sesión en vivo."}
+                    yield {"tipo": "fin"}
+                    return
+                yield None
+
+    def _reflejar(self, id_sesion: str, evento: dict) -> None:
+        self._estado.enviar_mensaje(
+            id_sesion, "lectores", evento["tipo"], json.dumps(evento, ensure_ascii=False).encode("utf-8"),
+        )
+        if evento["tipo"] == "fin":
+            self._estado.terminar_sesion(id_sesion)
+
+    def _iniciar_relevo(self) -> None:
+        # Tras un fork el hilo del padre no existe en el hijo: is_alive() es False
+        with self._candado:
+            if self._relevo is None or not self._relevo.is_alive():
+                self._relevo = threading.Thread(target=self._relevar, name="relevo-tiempo-real", daemon=True)
+                self._relevo.start()
+
+    def _relevar(self) -> None:
+        """
+        Entrega a las sesiones de este proceso el audio y los cierres que llegaron
+        a otros procesos, y mantiene su latido en el estado compartido.
+        """
+        ultimo_latido = 0.0
+        while True:
+            with self._candado:
+                ids = list(self._sesiones)
+            if not ids:
+                time.sleep(0.5)
+                continue
+            try:
+                if time.monotonic() - ultimo_latido >= _SEGUNDOS_LATIDO:
+                    self._estado.latido_sesiones(ids)
+                    ultimo_latido = time.monotonic()
+                mensajes = self._estado.tomar_mensajes(ids, "propietario")
+            except Exception:
+                metricas.ERRORES.incrementar(origen="estado_compartido")
+                mensajes = []
+            for id_sesion, tipo, datos in mensajes:
+                if tipo == "audio":
+                    sesion = self.obtener(id_sesion)
+                    if sesion is not None:
+                        sesion.enviar(datos)
+                elif tipo == "terminar":
+                    # terminar() espera los últimos turnos: no se frena el audio de las demás sesiones
+                    threading.Thread(target=self.cerrar, args=(id_sesion,), daemon=True).start()
+            time.sleep(_INTERVALO_RELEVO)
+
+    def _vigilar(self) -> None:
+        """
+        Termina las sesiones inactivas aunque nadie abra otra (cada una mantiene
+        abierto un WebSocket de pago con el proveedor) y descarta las terminadas.
+        Sale cuando no quedan sesiones.
+        """
+        intervalo = max(0.5, min(self._inactividad / 4, _SEGUNDOS_TRAS_FIN))
+        while True:
+            time.sleep(intervalo)
+            for sesion in self._purgar():
+                # terminar() espera los últimos turnos: no se frena la revisión de las demás
+                threading.Thread(target=sesion.terminar, daemon=True).start()
+            with self._candado:
+                if not self._sesiones:
+                    self._vigilante = None
+                    return
+
+    def _purgar(self) -> list[SesionTiempoReal]:
+        ahora = time.time()
+        limite = ahora - self._inactividad
+        with self._candado:
+            vencidas = [
+                s for s in self._sesiones.values()
+                if s.actualizada < limite or (s.terminada and s.terminada_en < ahora - _SEGUNDOS_TRAS_FIN)
+            ]
+            for sesion in vencidas:
+                del self._sesiones[sesion.id]
+        if self._estado is not None:
+            try:
+                # Sesiones terminadas (o de procesos que ya no existen) hace más de `inactividad`
+                self._estado.purgar_sesiones(limite)
+            except Exception:
+                metricas.ERRORES.incrementar(origen="estado_compartido")
+        return vencidas
+
+
+def crear_gestor_desde_entorno() -> GestorSesionesTiempoReal:
+    return GestorSesionesTiempoReal(
+        max_sesiones=int(os.getenv("MAX_SESIONES_TIEMPO_REAL", "20")),
+        inactividad_segundos=float(os.getenv("INACTIVIDAD_TIEMPO_REAL_SEGUNDOS", "60")),
+        estado=estado_compartido.estado_por_defecto(),
+    )
+
+
+_gestor_por_defecto: GestorSesionesTiempoReal | None = None
+_candado_por_defecto = threading.Lock()
+
+
+def gestor_por_defecto() -> GestorSesionesTiempoReal:
+    """
+    Sesiones en vivo de la app web (un gestor por proceso), creado en el primer uso.
+    """
+    global _gestor_por_defecto
+    with _candado_por_defecto:
+        if _gestor_por_defecto is None:
+            _gestor_por_defecto = crear_gestor_desde_entorno()
+        return _gestor_por_defecto
@@ -0,0 +1,390 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import estado_compartido
+import metricas
+
+
+ESTADO_PENDIENTE = "pendiente"
+ESTADO_PROCESANDO = "procesando"
+ESTADO_ESPERANDO = "esperando_proveedor"
+ESTADO_COMPLETADO = "completado"
+ESTADO_ERROR = "error"
+
+_ESTADOS_ACTIVOS = (ESTADO_PENDIENTE, ESTADO_PROCESANDO, ESTADO_ESPERANDO)
+_ESTADOS_TERMINADOS = (ESTADO_COMPLETADO, ESTADO_ERROR)
+
+# Trabajos terminados de otros procesos que se conservan ya leídos de la base
+_MAX_TRABAJOS_AJENOS = 32
+# Cada cuánto un proceso purga del estado compartido los trabajos vencidos
+_INTERVALO_PURGA_COMPARTIDA = 60
+# Mientras tiene trabajos activos, un proceso anuncia que sigue vivo cada
+# _INTERVALO_LATIDO segundos; sin latido en _LATIDO_VENCIDO, otro los da por perdidos
+_INTERVALO_LATIDO = 10
+_LATIDO_VENCIDO = 60
+
+
+class EnEspera:
+    """
+    Valor que devuelve un trabajo cuando queda a la espera de un aviso externo
+    (el webhook del proveedor) en lugar de ocupar un hilo del pool.
+
+    `referencia` identifica lo que se espera (el id de la transcripción remota) y
+    `continuar()` se ejecuta en el pool al llegar el aviso; su retorno es el resultado.
+    """
+
+    def __init__(self, referencia: str, continuar):
+        self.referencia = referencia
+        self.continuar = continuar
+
+
+class Trabajo:
+    """
+    Representa una transcripción enviada a la cola en segundo plano.
+    """
+
+    def __init__(self, nombre: str | None = None, id_trabajo: str | None = None):
+        self.id = id_trabajo or uuid.uuid4().hex
+        self.nombre = nombre
+        self.estado = ESTADO_PENDIENTE
+        self.resultado: dict | None = None
+        self.error: str | None = None
+        self.creado = time.time()
+        self.actualizado = self.creado
+        self.espera: EnEspera | None = None
+        # Aviso llegado antes de que el envío terminara de registrar la espera
+        self.aviso_adelantado: str | None = None
+        # Se llama una sola vez cuando el trabajo termina (con éxito, error o vencido)
+        self.al_terminar = None
+        # Archivos generados por el trabajo (p. ej. exportaciones); se borra al descartarlo
+        self.directorio_resultados: str | None = None
+
+    def _notificar_fin(self) -> None:
+        al_terminar, self.al_terminar = self.al_terminar, None
+        if al_terminar is not None:
+            try:
+                al_terminar(self)
+            except Exception:
+                pass
+
+    @property
+    def terminado(self) -> bool:
+        return self.estado in {ESTADO_COMPLETADO, ESTADO_ERROR}
+
+    def a_fila(self) -> dict:
+        """
+        Campos que se guardan en el estado compartido (el resultado, como JSON).
+        """
+        return {
+            "id": self.id,
+            "proceso": estado_compartido.proceso_actual(),
+            "nombre": self.nombre,
+            "estado": self.estado,
+            "error": self.error,
+            "resultado": json.dumps(self.resultado, ensure_ascii=False, default=str) if self.resultado is not None else None,
+            "directorio_resultados": self.directorio_resultados,
+            "creado": self.creado,
+            "actualizado": self.actualizado,
+        }
+
+    @classmethod
+    def desde_fila(cls, fila: dict) -> "Trabajo":
+        """
+        Copia de solo lectura de un trabajo de otro proceso.
+        """
+        trabajo = cls(fila["nombre"], fila["id"])
+        trabajo.estado = fila["estado"]
+        trabajo.error = fila["error"]
+        trabajo.resultado = json.loads(fila["resultado"]) if fila["resultado"] is not None else None
+        trabajo.directorio_resultados = fila["directorio_resultados"]
+        trabajo.creado = fila["creado"]
+        trabajo.actualizado = fila["actualizado"]
+        return trabajo
+
+    def a_dict(self, incluir_resultado: bool = True) -> dict:
+        datos = {
+            "id": self.id,
+            "nombre": self.nombre,
+            "estado": self.estado,
+            "creado": self.creado,
+            "actualizado": self.actualizado,
+        }
+        if self.error:
+            datos["error"] = self.error
+        if incluir_resultado and self.resultado is not None:
+            datos["resultado"] = self.resultado
+        return datos
+
+
+class GestorTrabajos:
+    """
+    Ejecuta transcripciones en un pool de hilos propio del proceso.
+
+    La petición HTTP solo encola el trabajo y devuelve su id; el pool es quien
+    espera a que el proveedor termine, o bien el trabajo devuelve `EnEspera` y
+    se retoma con `reanudar` cuando llega el webhook. Los trabajos terminados se
+    conservan durante `ttl_segundos` para poder consultarlos y luego se descartan;
+    los que esperan un aviso más de ese tiempo se marcan como error.
+
+    Con `estado` (un EstadoCompartido), cada cambio se copia a la base: los
+    demás procesos leen de ahí los trabajos que no son suyos, y un webhook que
+    llega a otro proceso deja un aviso que este recoge cada `intervalo_avisos`.
+    """
+
+    def __init__(
+        self,
+        max_trabajadores: int = 4,
+        ttl_segundos: float = 3600,
+        estado: "estado_compartido.EstadoCompartido | None" = None,
+        intervalo_avisos: float = 0.5,
+    ):
+        self._ejecutor = ThreadPoolExecutor(max_workers=max_trabajadores, thread_name_prefix="transcripcion")
+        self._trabajos: dict[str, Trabajo] = {}
+        self._candado = threading.Lock()
+        self._ttl = ttl_segundos
+        self._estado = estado
+        self._intervalo_avisos = intervalo_avisos
+        self._ajenos: OrderedDict[str, Trabajo] = OrderedDict()
+        self._vigilante: threading.Thread | None = None
+        self._ultima_purga_compartida = 0.0
+        self._ultimo_latido = 0.0
+
+    def enviar(
+        self,
+        funcion,
+        *args,
+        nombre: str | None = None,
+        directorio_temporal: str | None = None,
+        id_trabajo: str | None = None,
+        al_terminar=None,
+        directorio_resultados: str | None = None,
+    ) -> Trabajo:
+        """
+        Encola `funcion(*args)`; su valor de retorno (un dict) queda como resultado del trabajo.
+        Si se indica `directorio_temporal`, se elimina al terminar (con éxito o error);
+        `directorio_resultados` se conserva mientras se conserve el trabajo.
+        `id_trabajo` permite fijar el id de antemano (p. ej. para construir la URL del webhook).
+        `al_terminar(trabajo)` se llama una vez cuando el trabajo llega a completado o error.
+        """
+        trabajo = Trabajo(nombre, id_trabajo)
+        trabajo.al_terminar = al_terminar
+        trabajo.directorio_resultados = directorio_resultados
+        with self._candado:
+            self._purgar()
+            self._trabajos[trabajo.id] = trabajo
+        self._purgar_compartidos()
+        self._latir(forzar=True)
+        self._guardar(trabajo)
+        self._iniciar_vigilante()
+        self._ejecutor.submit(self._ejecutar, trabajo, funcion, args, directorio_temporal)
+        return trabajo
+
+    def obtener(self, id_trabajo: str) -> Trabajo | None:
+        """
+        El trabajo, sea de este proceso o (con estado compartido) de otro.
+        """
+        with self._candado:
+            trabajo = self._trabajos.get(id_trabajo)
+            if trabajo is not None or self._estado is None:
+                return trabajo
+            trabajo = self._ajenos.get(id_trabajo)
+            if trabajo is not None:
+                if trabajo.actualizado >= time.time() - self._ttl:
+                    self._ajenos.move_to_end(id_trabajo)
+                    return trabajo
+                del self._ajenos[id_trabajo]
+
+        fila = self._estado.obtener_trabajo(id_trabajo)
+        if fila is None:
+            return None
+        trabajo = Trabajo.desde_fila(fila)
+        if trabajo.terminado and trabajo.actualizado < time.time() - self._ttl:
+            # Vencido, aunque ningún proceso lo haya purgado aún de la base
+            return None
+        if trabajo.terminado:
+            # Un trabajo terminado ya no cambia: no hace falta volver a leerlo
+            with self._candado:
+                self._ajenos[id_trabajo] = trabajo
+                while len(self._ajenos) > _MAX_TRABAJOS_AJENOS:
+                    self._ajenos.popitem(last=False)
+        return trabajo
+
+    def reanudar(self, id_trabajo: str, referencia: str) -> Trabajo | None:
+        """
+        Retoma un trabajo en espera cuando llega el aviso de `referencia`.
+        Los avisos repetidos o de otra referencia se ignoran. Si el trabajo es
+        de otro proceso, el aviso se le deja en el estado compartido.
+        """
+        with self._candado:
+            local = id_trabajo in self._trabajos
+        if not local:
+            if self._estado is None or not self._estado.avisar_trabajo(id_trabajo, referencia):
+                return None
+            return self.obtener(id_trabajo)
+
+        with self._candado:
+            trabajo = self._trabajos.get(id_trabajo)
+            if trabajo is None:
+                return None
+            espera = trabajo.espera
+            if espera is None:
+                if not trabajo.terminado:
+                    trabajo.aviso_adelantado = referencia
+                return trabajo
+            if espera.referencia != referencia:
+                return trabajo
+            trabajo.espera = None
+            metricas.ETAPAS.observar(time.time() - trabajo.actualizado, etapa="espera_webhook")
+        self._ejecutor.submit(self._ejecutar, trabajo, espera.continuar, (), None)
+        return trabajo
+
+    def _ejecutar(self, trabajo: Trabajo, funcion, args: tuple, directorio_temporal: str | None) -> None:
+        trabajo.estado = ESTADO_PROCESANDO
+        trabajo.actualizado = time.time()
+        self._guardar(trabajo)
+        try:
+            with metricas.medir("trabajo"):
+                resultado = funcion(*args)
+            if isinstance(resultado, EnEspera):
+                self._esperar(trabajo, resultado)
+            else:
+                trabajo.resultado = resultado
+                trabajo.estado = ESTADO_COMPLETADO
+        except Exception as e:
+            metricas.ERRORES.incrementar(origen="trabajo")
+            trabajo.error = str(e)
+            trabajo.estado = ESTADO_ERROR
+        finally:
+            trabajo.actualizado = time.time()
+            self._guardar(trabajo)
+            if directorio_temporal:
+                shutil.rmtree(directorio_temporal, ignore_errors=True)
+            if trabajo.terminado:
+                trabajo._notificar_fin()
+
+    def _guardar(self, trabajo: Trabajo) -> None:
+        if self._estado is None:
+            return
+        try:
+            self._estado.guardar_trabajo(trabajo.a_fila())
+        except Exception:
+            # Este proceso sigue sirviendo el trabajo desde memoria
+            metricas.ERRORES.incrementar(origen="estado_compartido")
+
+    def _latir(self, forzar: bool = False) -> None:
+        # Latido de este proceso en el estado compartido: mantiene vivos sus trabajos activos
+        ahora = time.time()
+        if self._estado is None or (not forzar and ahora - self._ultimo_latido < _INTERVALO_LATIDO):
+            return
+        try:
+            self._estado.latido_proceso(estado_compartido.proceso_actual())
+            self._ultimo_latido = ahora
+        except Exception:
+            metricas.ERRORES.incrementar(origen="estado_compartido")
+
+    def _iniciar_vigilante(self) -> None:
+        # Tras un fork el hilo del padre no existe en el hijo: is_alive() es False
+        if self._estado is None or (self._vigilante is not None and self._vigilante.is_alive()):
+            return
+        with self._candado:
+            if self._vigilante is None or not self._vigilante.is_alive():
+                self._vigilante = threading.Thread(target=self._vigilar_avisos, name="avisos-trabajos", daemon=True)
+                self._vigilante.start()
+
+    def _vigilar_avisos(self) -> None:
+        """
+        Recoge los avisos que otros procesos dejaron para los trabajos de este y,
+        mientras tenga alguno activo, publica el latido del proceso.
+        """
+        while True:
+            time.sleep(self._intervalo_avisos)
+            with self._candado:
+                activos = any(not t.terminado for t in self._trabajos.values())
+            if not activos:
+                continue
+            self._latir()
+            try:
+                avisos = self._estado.tomar_avisos(estado_compartido.proceso_actual())
+            except Exception:
+                metricas.ERRORES.incrementar(origen="estado_compartido")
+                continue
+            for id_trabajo, referencia in avisos:
+                self.reanudar(id_trabajo, referencia)
+
+    def _esperar(self, trabajo: Trabajo, espera: EnEspera) -> None:
+        with self._candado:
+            if trabajo.aviso_adelantado != espera.referencia:
+                trabajo.espera = espera
+                trabajo.estado = ESTADO_ESPERANDO
+                return
+        # El webhook llegó mientras se enviaba: se continúa sin esperar
+        self._ejecutor.submit(self._ejecutar, trabajo, espera.continuar, (), None)
+
+    def _purgar(self) -> None:
+        # Se llama con el candado tomado: descarta trabajos terminados y vencidos
+        limite = time.time() - self._ttl
+        for trabajo in self._trabajos.values():
+            if trabajo.espera is not None and trabajo.actualizado < limite:
+                trabajo.espera = None
+                trabajo.error = "El proveedor no avisó del final de la transcripción a tiempo."
+                trabajo.estado = ESTADO_ERROR
+                trabajo.actualizado = time.time()
+                self._guardar(trabajo)
+                trabajo._notificar_fin()
+        vencidos = [tid for tid, t in self._trabajos.items() if t.terminado and t.actualizado < limite]
+        for tid in vencidos:
+            trabajo = self._trabajos.pop(tid)
+            if trabajo.directorio_resultados:
+                shutil.rmtree(trabajo.directorio_resultados, ignore_errors=True)
+
+    def _purgar_compartidos(self) -> None:
+        # Trabajos de otros procesos: vencidos si su proceso dejó de latir, y terminados fuera del TTL
+        ahora = time.time()
+        if self._estado is None or ahora - self._ultima_purga_compartida < _INTERVALO_PURGA_COMPARTIDA:
+            return
+        self._ultima_purga_compartida = ahora
+        try:
+            self._estado.vencer_trabajos(
+                ahora - _LATIDO_VENCIDO, _ESTADOS_ACTIVOS, estado_compartido.proceso_actual(),
+                "El trabajo quedó sin terminar: el proceso que lo atendía se detuvo.",
+            )
+            directorios = self._estado.purgar_trabajos(ahora - self._ttl, _ESTADOS_TERMINADOS)
+        except Exception:
+            metricas.ERRORES.incrementar(origen="estado_compartido")
+            return
+        for directorio in directorios:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+
+def crear_gestor_desde_entorno() -> GestorTrabajos:
+    """
+    Crea el gestor leyendo el tamaño del pool y el TTL de variables de entorno;
+    usa el estado compartido salvo que ESTADO_COMPARTIDO=0.
+    """
+    max_trabajadores = int(os.getenv("TRABAJADORES_TRANSCRIPCION", "4"))
+    ttl = float(os.getenv("TTL_TRABAJOS_SEGUNDOS", "3600"))
+    return GestorTrabajos(
+        max_trabajadores=max_trabajadores, ttl_segundos=ttl, estado=estado_compartido.estado_por_defecto(),
+    )
+
+
+_gestor_por_defecto: GestorTrabajos | None = None
+_candado_por_defecto = threading.Lock()
+
+
+def gestor_por_defecto() -> GestorTrabajos:
+    """
+    Gestor de la app web (uno por proceso). Se crea en el primer uso, no al
+    importar: así no abre el estado compartido antes del fork de gunicorn.
+    """
+    global _gestor_por_defecto
+    with _candado_por_defecto:
+        if _gestor_por_defecto is None:
+            _gestor_por_defecto = crear_gestor_desde_entorno()
+        return _gestor_por_defecto
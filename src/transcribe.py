@@ -1,7 +1,23 @@
 import os
+import re
 import sys
-import csv
-import assemblyai as aai
+import glob
+import shutil
+import tempfile
+import textwrap
+from collections import Counter
+from contextlib import contextmanager
+
+import cache as cache_transcripciones
+import catalogo_idiomas
+import clientes
+import fragmentos
+import lote
+import medios
+import metricas
+import motores
+import planificador as planificador_llamadas
+from modelos import TranscripcionLocal
 
 
 def obtener_clave_api() -> str:
@@ -17,89 +33,42 @@ def listar_idiomas_disponibles(ruta_csv: str | None = None) -> list[str]:
 
     Primero intenta cargar los idiomas desde el archivo CSV "Grid view.csv".
     Si no es posible (por ejemplo, el archivo no existe), usa una lista fija.
+    El catálogo se carga una vez por proceso y se recarga solo si cambia el CSV.
     """
-    # Fallback mínimo por si el CSV no existe o falla la lectura
-    fallback = [
-        "en (Inglés)",
-        "es (Español)",
-        "fr (Francés)",
-        "de (Alemán)",
-        "it (Italiano)",
-        "pt (Portugués)",
-        "nl (Holandés)",
-        "ru (Ruso)",
-        "zh (Chino Mandarín)",
-        "ja (Japonés)",
-        "ko (Coreano)",
-    ]
-     
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    # Ruta al CSV con el catálogo completo de idiomas (permite sobreescritura por parámetro)
-    ruta_csv = ruta_csv or os.path.join(BASE_DIR, "Grid view.csv")
-
-    try:
-        if not os.path.exists(ruta_csv):
-            return fallback
-
-        idiomas: list[str] = []
-        codigos_vistos: set[str] = set()
-
-        # utf-8-sig maneja BOM al inicio del archivo (p. ej., exportado desde hojas de cálculo)
-        with open(ruta_csv, "r", encoding="utf-8-sig") as f:
-            lector = csv.reader(f)
-            encabezados = next(lector, None)
-            if not encabezados:
-                return fallback
-
-            # Determina índices de columnas relevantes
-            try:
-                idx_nombre = encabezados.index("Language")
-                idx_codigo = encabezados.index("Language Code")
-            except ValueError:
-                return fallback
-
-            for fila in lector:
-                if not fila or len(fila) <= max(idx_nombre, idx_codigo):
-                    continue
-                nombre = (fila[idx_nombre] or "").strip()
-                codigo = (fila[idx_codigo] or "").strip()
-                if not nombre or not codigo:
-                    continue
-                # Normaliza código a minúsculas como en el CSV
-                codigo_norm = codigo.strip()
-                if codigo_norm in codigos_vistos:
-                    continue
-                codigos_vistos.add(codigo_norm)
-                idiomas.append(f"{codigo_norm} ({nombre})")
-
-        # Ordena por nombre visible (parte entre paréntesis) para facilitar la lectura
-        idiomas.sort(key=lambda s: s.split("(")[-1].lower())
-        # Si por alguna razón quedó vacío, usa fallback
-        return idiomas or fallback
-    except Exception:
-        # Ante cualquier error inesperado, no interrumpir el flujo principal
-        return fallback
+    return catalogo_idiomas.obtener_catalogo(ruta_csv).etiquetas()
 
 
 def seleccionar_idioma(ruta_csv: str | None = None) -> str:
     """
-    Permite al usuario seleccionar un idioma de la lista disponible.
+    Permite al usuario seleccionar un idioma de la lista disponible,
+    por número o escribiendo directamente su código.
     """
-    idiomas = listar_idiomas_disponibles(ruta_csv)
+    catalogo = catalogo_idiomas.obtener_catalogo(ruta_csv)
+    entradas = catalogo.entradas()
     print("Por favor, selecciona el idioma del audio:")
-    for i, idioma in enumerate(idiomas, start=1):
-        print(f"{i}. {idioma}")
+    for i, entrada in enumerate(entradas, start=1):
+        print(f"{i}. {entrada.etiqueta}")
 
     while True:
+        respuesta = input("Introduce el número o el código del idioma: ").strip()
+        if catalogo.contiene(respuesta):
+            return respuesta
         try:
-            opcion = int(input("Introduce el número del idioma: "))
-            if 1 <= opcion <= len(idiomas):
-                codigo_idioma = idiomas[opcion - 1].split(" ")[0]  # Extrae el código del idioma
-                return codigo_idioma
+            opcion = int(respuesta)
+            if 1 <= opcion <= len(entradas):
+                return entradas[opcion - 1].codigo
             else:
                 print("Por favor, selecciona un número válido.")
         except ValueError:
-            print("Entrada no válida. Introduce un número.")
+            print("Entrada no válida. Introduce un número o un código de la lista.")
+
+
+def _entero_positivo(valor: str, por_defecto: int) -> int:
+    try:
+        numero = int(valor.strip())
+    except ValueError:
+        return por_defecto
+    return numero if numero > 0 else por_defecto
 
 
 def procesar_argumentos(args: list[str]) -> dict:
@@ -121,6 +90,21 @@ def procesar_argumentos(args: list[str]) -> dict:
         "detectar_idioma": False,  # Nueva opción para detección automática de idioma
         "ruta_idiomas_csv": None,
         "mapa_nombres_hablantes": {},
+        "usar_cache": True,
+        "fuentes": [],  # Todas las rutas posicionales (modo lote)
+        "manifiesto": None,
+        "concurrencia": 4,
+        "duracion_fragmento": None,  # Segundos por fragmento; None = sin fragmentar
+        "solapamiento_fragmento": 5.0,
+        "buscar": None,  # Frase a buscar en el índice de transcripciones
+        "buscar_hablante": None,
+        "limite_busqueda": 20,
+        "perfil": False,  # Imprimir el tiempo por etapa al terminar
+        "preprocesar": False,  # Reducir el medio (solo audio, mono, 16 kHz, Opus) antes de subirlo
+        "tiempo_real": False,  # Subtítulos en vivo desde stdin (PCM) o desde un medio a ritmo real
+        "formatos": ["txt"],  # Archivos a generar: txt, srt, vtt y/o json
+        "motor": None,  # "assemblyai" o "local"; None = MOTOR_TRANSCRIPCION
+        "analitica_csv": None,  # CSV con la analítica de hablantes de cada fuente
     }
 
     i = 0
@@ -179,8 +163,61 @@ def procesar_argumentos(args: list[str]) -> dict:
             i += 1
         elif arg == "--detectar-idioma":
             opciones["detectar_idioma"] = True
-        elif opciones["fuente"] is None:
-            opciones["fuente"] = arg
+        elif arg == "--sin-cache":
+            opciones["usar_cache"] = False
+        elif arg == "--perfil":
+            opciones["perfil"] = True
+        elif arg == "--preprocesar":
+            opciones["preprocesar"] = True
+        elif arg == "--tiempo-real":
+            opciones["tiempo_real"] = True
+        elif arg.startswith("--motor="):
+            opciones["motor"] = arg.split("=", 1)[1].strip().lower()
+        elif arg == "--motor" and i + 1 < len(args):
+            opciones["motor"] = args[i + 1].strip().lower()
+            i += 1
+        elif arg.startswith("--formatos="):
+            opciones["formatos"] = [f.strip().lower() for f in arg.split("=", 1)[1].split(",") if f.strip()]
+        elif arg == "--formatos" and i + 1 < len(args):
+            opciones["formatos"] = [f.strip().lower() for f in args[i + 1].split(",") if f.strip()]
+            i += 1
+        elif arg.startswith("--analitica-csv="):
+            opciones["analitica_csv"] = arg.split("=", 1)[1].strip()
+        elif arg == "--analitica-csv" and i + 1 < len(args):
+            opciones["analitica_csv"] = args[i + 1].strip()
+            i += 1
+        elif arg.startswith("--manifiesto="):
+            opciones["manifiesto"] = arg.split("=", 1)[1].strip()
+        elif arg == "--manifiesto" and i + 1 < len(args):
+            opciones["manifiesto"] = args[i + 1].strip()
+            i += 1
+        elif arg.startswith("--concurrencia="):
+            opciones["concurrencia"] = _entero_positivo(arg.split("=", 1)[1], opciones["concurrencia"])
+        elif arg == "--concurrencia" and i + 1 < len(args):
+            opciones["concurrencia"] = _entero_positivo(args[i + 1], opciones["concurrencia"])
+            i += 1
+        elif arg == "--fragmentos":
+            opciones["duracion_fragmento"] = 600.0
+        elif arg.startswith("--fragmentos="):
+            opciones["duracion_fragmento"] = _entero_positivo(arg.split("=", 1)[1], 10) * 60.0
+        elif arg.startswith("--solapamiento="):
+            opciones["solapamiento_fragmento"] = float(_entero_positivo(arg.split("=", 1)[1], 5))
+        elif arg.startswith("--buscar="):
+            opciones["buscar"] = arg.split("=", 1)[1].strip()
+        elif arg == "--buscar" and i + 1 < len(args):
+            opciones["buscar"] = args[i + 1].strip()
+            i += 1
+        elif arg.startswith("--hablante="):
+            opciones["buscar_hablante"] = arg.split("=", 1)[1].strip()
+        elif arg == "--hablante" and i + 1 < len(args):
+            opciones["buscar_hablante"] = args[i + 1].strip()
+            i += 1
+        elif arg.startswith("--limite="):
+            opciones["limite_busqueda"] = _entero_positivo(arg.split("=", 1)[1], opciones["limite_busqueda"])
+        else:
+            opciones["fuentes"].append(arg)
+            if opciones["fuente"] is None:
+                opciones["fuente"] = arg
         i += 1
 
     return opciones
@@ -193,12 +230,136 @@ def validar_fuente(fuente: str) -> bool:
     return os.path.exists(fuente)
 
 
-def transcribir_audio(fuente: str, opciones: dict) -> tuple[str, object]:
+# Tamaño de cada bloque leído al reenviar un flujo al proveedor
+TAMANO_BLOQUE_SUBIDA = 1024 * 1024
+
+
+class TamanoExcedidoError(ValueError):
     """
-    Realiza la transcripción del audio utilizando la API de AssemblyAI.
-    Retorna una tupla con (texto, objeto_transcripcion) para manejar speakers.
+    El flujo de entrada superó el tamaño máximo permitido.
+    """
+
+
+class FlujoAcotado:
+    """
+    Envuelve un flujo binario para leerlo por bloques sin cargarlo entero en memoria.
+
+    Lanza TamanoExcedidoError si se leen más de `limite_bytes` bytes.
+    Es iterable para que el cliente HTTP del SDK lo envíe por partes.
+    Calcula al vuelo el hash del contenido (el mismo que usa la caché).
+    """
+
+    def __init__(self, flujo, limite_bytes: int | None = None):
+        self._flujo = flujo
+        self._limite = limite_bytes
+        self._hash = cache_transcripciones.nuevo_hash()
+        self.bytes_leidos = 0
+
+    @property
+    def hash_hex(self) -> str:
+        return self._hash.hexdigest()
+
+    def read(self, n: int = -1) -> bytes:
+        if n is None or n < 0:
+            n = TAMANO_BLOQUE_SUBIDA
+        bloque = self._flujo.read(n)
+        self.bytes_leidos += len(bloque)
+        if self._limite is not None and self.bytes_leidos > self._limite:
+            raise TamanoExcedidoError(f"El archivo supera el tamaño máximo permitido ({self._limite} bytes).")
+        self._hash.update(bloque)
+        return bloque
+
+    def __iter__(self):
+        while True:
+            bloque = self.read(TAMANO_BLOQUE_SUBIDA)
+            if not bloque:
+                break
+            yield bloque
+
+
+def guardar_flujo(flujo, ruta: str, limite_bytes: int | None = None) -> tuple[str, int]:
+    """
+    Copia un flujo binario a `ruta` por bloques (para motores que necesitan el
+    archivo en disco). Retorna (hash_medio, bytes_escritos).
+    """
+    flujo_acotado = FlujoAcotado(flujo, limite_bytes)
+    with open(ruta, "wb") as archivo:
+        for bloque in flujo_acotado:
+            archivo.write(bloque)
+    return flujo_acotado.hash_hex, flujo_acotado.bytes_leidos
+
+
+def subir_flujo(flujo, limite_bytes: int | None = None, clave_api: str | None = None) -> tuple[str, str, int]:
+    """
+    Sube un flujo binario a AssemblyAI por bloques, sin escribirlo en disco.
+    Retorna (url_subida, hash_medio, bytes_subidos): la URL se puede pasar como
+    fuente a transcribir_audio y el hash como opciones["hash_medio"] para la caché.
+    """
+    transcriptor = clientes.transcriptor(clave_api)
+    flujo_acotado = FlujoAcotado(flujo, limite_bytes)
+    try:
+        # Un flujo ya consumido no se puede releer: solo se respeta el ritmo, sin reintentos
+        url_subida = planificador_llamadas.planificador_por_defecto().llamar(
+            transcriptor.upload_file, flujo_acotado, reintentar=False,
+        )
+    except TamanoExcedidoError:
+        raise
+    except Exception as e:
+        raise RuntimeError(f"Error al subir el archivo: {e}")
+    return url_subida, flujo_acotado.hash_hex, flujo_acotado.bytes_leidos
+
+
+def _formatear_bytes(n_bytes: int) -> str:
+    return f"{n_bytes / (1024 * 1024):.1f} MB"
+
+
+@contextmanager
+def _fuente_para_subir(fuente: str, opciones: dict, informe: dict | None = None):
+    """
+    Entrega la ruta que se debe subir: la original, o una versión reducida con
+    medios.preprocesar_audio si opciones["preprocesar"] está activo.
+
+    El preprocesado es una optimización: si ffmpeg falta o falla, se avisa y se
+    sube el original. `informe` (si se pasa) recibe bytes_originales y bytes_subidos.
+    """
+    if not (opciones.get("preprocesar") and validar_fuente(fuente)):
+        yield fuente
+        return
+
+    directorio = tempfile.mkdtemp(prefix="preprocesado-")
+    try:
+        bytes_originales = os.path.getsize(fuente)
+        ruta_subida = fuente
+        try:
+            with metricas.medir("preprocesado"):
+                reducido = medios.preprocesar_audio(fuente, directorio, canales=2 if opciones.get("canal_dual") else 1)
+            # Un audio que ya era compacto puede no reducirse: se sube el original
+            if os.path.getsize(reducido) < bytes_originales:
+                ruta_subida = reducido
+        except Exception as e:
+            print(f"Aviso: no se pudo preprocesar {fuente}, se sube el original: {e}", file=sys.stderr)
+
+        bytes_subidos = os.path.getsize(ruta_subida)
+        metricas.BYTES_AHORRADOS.incrementar(bytes_originales - bytes_subidos)
+        if informe is not None:
+            informe.update(bytes_originales=bytes_originales, bytes_subidos=bytes_subidos)
+        if ruta_subida != fuente:
+            ahorro = (1 - bytes_subidos / max(bytes_originales, 1)) * 100
+            print(
+                f"Preprocesado: {_formatear_bytes(bytes_originales)} -> {_formatear_bytes(bytes_subidos)} "
+                f"({ahorro:.0f}% menos para subir)",
+                file=sys.stderr,
+            )
+        yield ruta_subida
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+def construir_configuracion(opciones: dict) -> dict:
+    """
+    Traduce las opciones del programa a los parámetros de aai.TranscriptionConfig.
+    El mismo diccionario normalizado forma parte de la clave de la caché.
     """
-    transcriptor = aai.Transcriber()
     configuracion = {}
 
     if opciones["codigo_idioma"]:
@@ -217,18 +378,193 @@ def transcribir_audio(fuente: str, opciones: dict) -> tuple[str, object]:
     # Activar diarización siempre para poder detectar si hay múltiples hablantes
     configuracion["speaker_labels"] = True
 
-    config = aai.TranscriptionConfig(**configuracion) if configuracion else None
+    return configuracion
+
+
+def enviar_transcripcion(
+    fuente: str,
+    opciones: dict,
+    url_webhook: str,
+    cabecera_webhook: str | None = None,
+    firma_webhook: str | None = None,
+    informe: dict | None = None,
+) -> str:
+    """
+    Sube la fuente (si es un archivo local) y envía la transcripción sin esperar a
+    que termine. AssemblyAI avisará en `url_webhook`, enviando la cabecera
+    `cabecera_webhook` con el valor `firma_webhook`. Retorna el id de la
+    transcripción remota, que se recupera luego con obtener_transcripcion.
+    """
+    aai = clientes.sdk()
+    config = aai.TranscriptionConfig(**construir_configuracion(opciones))
+    config.set_webhook(url_webhook, cabecera_webhook, firma_webhook)
+    transcriptor = clientes.transcriptor(opciones.get("clave_api"))
+    planificador = planificador_llamadas.planificador_por_defecto()
 
     try:
-        transcripcion = transcriptor.transcribe(fuente, config=config)
+        if validar_fuente(fuente):
+            metricas.BYTES_PROCESADOS.incrementar(os.path.getsize(fuente), origen="archivo")
+            with _fuente_para_subir(fuente, opciones, informe) as ruta_subida, metricas.medir("subida"):
+                fuente = planificador.llamar(transcriptor.upload_file, ruta_subida, idempotente=False)
+        with metricas.medir("envio"):
+            transcripcion = planificador.llamar(transcriptor.submit, fuente, config=config, idempotente=False)
         if transcripcion.status == aai.TranscriptStatus.error:
             raise ValueError(f"Error en la transcripción: {transcripcion.error}")
+        return transcripcion.id
+    except Exception as e:
+        metricas.ERRORES.incrementar(origen="proveedor")
+        raise RuntimeError(f"Error al enviar el archivo a transcribir: {e}")
+
 
-        return transcripcion.text or "", transcripcion
-    except AttributeError as e:
-        raise RuntimeError(f"Error inesperado al manejar la respuesta de la API: {e}")
+def obtener_transcripcion(id_transcripcion: str, clave_api: str | None = None):
+    """
+    Recupera una transcripción ya terminada (p. ej. tras recibir su webhook).
+    """
+    try:
+        with metricas.medir("descarga_resultado"):
+            transcripcion = planificador_llamadas.planificador_por_defecto().llamar(
+                clientes.transcripcion(id_transcripcion, clave_api).wait_for_completion,
+            )
+    except Exception as e:
+        metricas.ERRORES.incrementar(origen="proveedor")
+        raise RuntimeError(f"Error al recuperar la transcripción {id_transcripcion}: {e}")
+    if transcripcion.status == clientes.sdk().TranscriptStatus.error:
+        metricas.ERRORES.incrementar(origen="proveedor")
+        raise RuntimeError(f"Error en la transcripción: {transcripcion.error}")
+
+    duracion_medio = getattr(transcripcion, "audio_duration", None)
+    if duracion_medio:
+        metricas.DURACION_MEDIO.observar(float(duracion_medio))
+    return transcripcion
+
+
+def consultar_cache(fuente: str, opciones: dict) -> tuple[str | None, TranscripcionLocal | None]:
+    """
+    Busca una transcripción previa del mismo contenido con la misma configuración.
+
+    Retorna (clave_cache, transcripcion_cacheada). La clave es None si la caché
+    está desactivada o no hay hash: el de un archivo local se calcula aquí y el de
+    una URL de subida debe venir en opciones["hash_medio"].
+    """
+    if not opciones.get("usar_cache", True):
+        return None, None
+    cache = cache_transcripciones.cache_por_defecto()
+    if cache is None:
+        return None, None
+
+    hash_medio = opciones.get("hash_medio")
+    if not hash_medio and validar_fuente(fuente):
+        with metricas.medir("hash"):
+            hash_medio = cache_transcripciones.hash_archivo(fuente)
+    if not hash_medio:
+        return None, None
+
+    configuracion = motores.obtener_motor(opciones.get("motor")).configuracion_cache(construir_configuracion(opciones))
+    if opciones.get("duracion_fragmento") and validar_fuente(fuente):
+        # Por fragmentos, las etiquetas de hablante no coinciden entre fragmentos:
+        # no es el mismo resultado que una transcripción entera del medio
+        configuracion = dict(
+            configuracion,
+            fragmentos=[opciones["duracion_fragmento"], opciones.get("solapamiento_fragmento", 5.0)],
+        )
+    clave_cache = cache_transcripciones.calcular_clave(hash_medio, configuracion)
+    with metricas.medir("cache_lectura"):
+        return clave_cache, cache.obtener(clave_cache)
+
+
+def guardar_en_cache(clave_cache: str | None, transcripcion) -> None:
+    """
+    Guarda la transcripción bajo la clave de consultar_cache (sin efecto si es None).
+    """
+    cache = cache_transcripciones.cache_por_defecto()
+    if clave_cache is None or cache is None:
+        return
+    try:
+        with metricas.medir("cache_escritura"):
+            cache.guardar(clave_cache, TranscripcionLocal.desde_transcripcion(transcripcion))
     except Exception as e:
-        raise RuntimeError(f"Error al transcribir el archivo: {e}")
+        # Un fallo de la caché no debe perder una transcripción ya pagada
+        print(f"Aviso: no se pudo guardar en caché: {e}", file=sys.stderr)
+
+
+def transcribir_audio(fuente: str, opciones: dict, informe: dict | None = None) -> tuple[str, object]:
+    """
+    Realiza la transcripción del audio con el motor de opciones["motor"]
+    (AssemblyAI por defecto; ver motores.py).
+    Retorna una tupla con (texto, objeto_transcripcion) para manejar speakers.
+
+    Con opciones["preprocesar"], el archivo se reduce antes de subirlo; el
+    hash de la caché es siempre el del original. Si se pasa `informe`, recibe
+    los bytes originales y subidos.
+
+    Si la caché está activa, primero busca una transcripción previa del mismo
+    contenido con la misma configuración (el hash puede venir ya calculado en
+    opciones["hash_medio"], p. ej. cuando la fuente es una URL de subida).
+
+    Con opciones["duracion_fragmento"] (segundos), los archivos largos se cortan
+    en fragmentos que se transcriben en paralelo y se unen en un solo resultado.
+    """
+    configuracion = construir_configuracion(opciones)
+    motor = motores.obtener_motor(opciones.get("motor"))
+    es_archivo_local = validar_fuente(fuente)
+
+    clave_cache, cacheada = consultar_cache(fuente, opciones)
+    if cacheada is not None:
+        return cacheada.text or "", cacheada
+
+    # Solo cuenta lo que llega al motor: un acierto de caché no procesa nada
+    if es_archivo_local:
+        metricas.BYTES_PROCESADOS.incrementar(os.path.getsize(fuente), origen="archivo")
+    transcripcion = None
+    if opciones.get("duracion_fragmento") and es_archivo_local:
+        with metricas.medir("fragmentos"):
+            transcripcion = fragmentos.transcribir_por_fragmentos(
+                fuente,
+                lambda ruta_fragmento: motor.transcribir(ruta_fragmento, configuracion, opciones.get("clave_api")),
+                opciones["duracion_fragmento"],
+                opciones.get("solapamiento_fragmento", 5.0),
+                opciones.get("concurrencia", 4),
+                canales=2 if opciones["canal_dual"] else 1,
+            )
+    if transcripcion is None:
+        with _fuente_para_subir(fuente, opciones, informe) as fuente_subida:
+            transcripcion = motor.transcribir(fuente_subida, configuracion, opciones.get("clave_api"))
+
+    duracion_medio = getattr(transcripcion, "audio_duration", None)
+    if duracion_medio:
+        metricas.DURACION_MEDIO.observar(float(duracion_medio))
+
+    guardar_en_cache(clave_cache, transcripcion)
+    return transcripcion.text or "", transcripcion
+
+
+def iterar_lineas_hablantes(utterances, mapa_nombres: dict | None = None, speakers_detectados: set | None = None):
+    """
+    Genera una línea "Nombre: texto" por utterance, sin construir el texto completo.
+    Si se pasa `speakers_detectados`, añade ahí las etiquetas encontradas.
+    """
+    for utterance in utterances:
+        etiqueta = str(utterance.speaker)
+        if speakers_detectados is not None:
+            speakers_detectados.add(etiqueta)
+
+        if mapa_nombres and etiqueta in mapa_nombres:
+            prefijo = mapa_nombres[etiqueta]
+        else:
+            prefijo = f"Speaker {etiqueta}"
+        yield f"{prefijo}: {utterance.text}"
+
+
+def escribir_lineas(archivo, lineas) -> None:
+    """
+    Escribe las líneas a medida que llegan; el resultado es igual a "\n".join(lineas).strip().
+    """
+    import exportacion
+
+    escritor = exportacion.EscritorLineas(archivo)
+    for linea in lineas:
+        escritor.linea(linea)
+    escritor.cerrar()
 
 
 def guardar_transcripcion(
@@ -238,40 +574,112 @@ def guardar_transcripcion(
     transcripcion_obj=None,
     con_speakers: bool=False,
     mapa_nombres: dict | None = None,
+    formatos: list[str] | None = None,
+    analisis: dict | None = None,
+    salida_con_extension: bool = False,
+) -> str:
+    """
+    Guarda la transcripción junto al archivo fuente, un archivo por formato
+    (txt por defecto; también srt, vtt y json), en una sola pasada por los utterances.
+    Si con_speakers=True y transcripcion_obj tiene utterances, el txt usa formato de speakers
+    y se muestra la tabla de `analisis` (analitica.analizar).
+    Con salida_con_extension, el nombre conserva la extensión de la fuente (ver lote.base_salida).
+    Retorna la ruta del primer formato.
+    """
+    import analitica
+    import exportacion
+
+    rutas = lote.rutas_salida(fuente, tipo, formatos, salida_con_extension)
+
+    with metricas.medir("guardado"):
+        speakers_detectados = exportacion.exportar_a_rutas(
+            transcripcion_obj,
+            rutas,
+            texto=texto,
+            tipo=tipo,
+            con_speakers=con_speakers,
+            mapa_nombres=mapa_nombres,
+        )
+
+    # Mostrar resumen de speakers detectados (un solo print: en modo lote hay varios hilos)
+    if con_speakers and speakers_detectados:
+        lineas = [f"\nSpeakers detectados: {len(speakers_detectados)}"]
+        if analisis:
+            lineas.extend(f"  {linea}" for linea in analitica.lineas_tabla(analisis))
+        else:
+            lineas.extend(f"  - Speaker {speaker}" for speaker in sorted(speakers_detectados))
+        print("\n".join(lineas))
+
+    for ruta_salida in rutas.values():
+        print(f"\nTranscripción guardada en: {ruta_salida}")
+
+    indexar_transcripcion(os.path.abspath(fuente), fuente, transcripcion_obj, tipo, mapa_nombres, texto)
+    return next(iter(rutas.values()))
+
+
+def indexar_transcripcion(
+    clave: str,
+    fuente: str,
+    transcripcion_obj,
+    tipo: str | None = None,
+    mapa_nombres: dict | None = None,
+    texto: str | None = None,
 ) -> None:
     """
-    Guarda la transcripción en un archivo de texto junto al archivo fuente.
-    Si con_speakers=True y transcripcion_obj tiene utterances, guarda con formato de speakers.
-    """
-    base, _ = os.path.splitext(fuente)
-    ruta_salida = f"{base}.transcripcion.{tipo}.txt"
-    
-    contenido = texto
-    speakers_detectados = set()
-    
-    # Si hay speakers habilitados y el objeto tiene utterances, formatear con speakers
-    if con_speakers and transcripcion_obj and hasattr(transcripcion_obj, 'utterances') and transcripcion_obj.utterances:
-        contenido = ""
-        for utterance in transcripcion_obj.utterances:
-            etiqueta = str(utterance.speaker)
-            speakers_detectados.add(etiqueta)
-            
-            if mapa_nombres and etiqueta in mapa_nombres:
-                prefijo = mapa_nombres[etiqueta]
-            else:
-                prefijo = f"Speaker {etiqueta}"
-            contenido += f"{prefijo}: {utterance.text}\n"
-        contenido = contenido.strip()
-        
-        # Mostrar resumen de speakers detectados
-        if speakers_detectados:
-            print(f"\nSpeakers detectados: {len(speakers_detectados)}")
-            for speaker in sorted(speakers_detectados):
-                print(f"  - Speaker {speaker}")
-    
-    with open(ruta_salida, "w", encoding="utf-8") as archivo:
-        archivo.write(contenido)
-    print(f"\nTranscripción guardada en: {ruta_salida}")
+    Añade la transcripción al índice de búsqueda (si está activo).
+    Un fallo del índice solo se avisa: la transcripción ya está guardada.
+    """
+    import almacen as almacen_transcripciones
+
+    if transcripcion_obj is None:
+        return
+    try:
+        # Abrir el índice también puede fallar (ruta sin permisos, SQLite sin FTS5)
+        almacen = almacen_transcripciones.almacen_por_defecto()
+        if almacen is None:
+            return
+        with metricas.medir("indexado"):
+            almacen.guardar(clave, fuente, transcripcion_obj, tipo, mapa_nombres, texto)
+    except Exception as e:
+        metricas.ERRORES.incrementar(origen="indice")
+        print(f"Aviso: no se pudo indexar la transcripción: {e}", file=sys.stderr)
+
+
+def buscar_transcripciones(opciones: dict) -> int:
+    """
+    Subcomando --buscar: muestra los segmentos que contienen la frase buscada.
+    """
+    import sqlite3
+    import almacen as almacen_transcripciones
+
+    try:
+        almacen = almacen_transcripciones.almacen_por_defecto()
+        if almacen is None:
+            print("El índice de transcripciones está desactivado (INDICE_TRANSCRIPCIONES=0).", file=sys.stderr)
+            return 1
+        resultados = almacen.buscar(
+            opciones["buscar"],
+            hablante=opciones["buscar_hablante"],
+            idioma=opciones["codigo_idioma"],
+            limite=opciones["limite_busqueda"],
+        )
+    except (sqlite3.Error, OSError) as e:
+        print(f"No se pudo consultar el índice de transcripciones: {e}", file=sys.stderr)
+        return 1
+    if not resultados:
+        print("Sin resultados.")
+        return 0
+    for r in resultados:
+        marca = f" @ {_formatear_ms(r['inicio'])}" if r["inicio"] is not None else ""
+        hablante = f" [{r['hablante']}]" if r["hablante"] else ""
+        print(f"{r['fuente']}{marca}{hablante} ({r['idioma'] or '?'})")
+        print(f"    {r['fragmento']}")
+    return 0
+
+
+def _formatear_ms(ms: int) -> str:
+    segundos = int(ms // 1000)
+    return f"{segundos // 3600:02d}:{segundos % 3600 // 60:02d}:{segundos % 60:02d}"
 
 
 def mostrar_ayuda():
@@ -280,6 +688,7 @@ def mostrar_ayuda():
     """
     ayuda = """
     Uso: transcriptor.py [opciones] <archivo>
+         transcriptor.py [opciones] <archivo|directorio|patrón> [...]   (modo lote)
 
     Opciones:
       -h, --ayuda            Muestra esta ayuda.
@@ -295,51 +704,320 @@ def mostrar_ayuda():
       --nivel-impulso=<nivel>    Nivel de impulso para palabras clave.
       --idioma=<código>      Código del idioma (por defecto, se detecta automáticamente).
       --detectar-idioma      Detecta el idioma automáticamente.
+      --sin-cache            No consulta ni guarda la caché de transcripciones.
+      --preprocesar          Antes de subir, deja solo el audio (mono, o estéreo con --canal-dual),
+                             a 16 kHz y en Opus. Requiere ffmpeg; reduce mucho la subida de videos.
+      --perfil               Muestra al final el tiempo consumido por cada etapa.
+      --motor=<nombre>       Motor de transcripción: assemblyai (por defecto) o local
+                             (Whisper en CPU, sin red; requiere faster-whisper, sin hablantes).
+      --formatos=<lista>     Archivos a generar, separados por comas: txt, srt, vtt, json
+                             (por defecto txt). Se escriben todos en una sola pasada.
+      --tiempo-real [<fuente>]  Subtítulos en vivo: lee PCM de 16 bits, mono, 16 kHz de stdin
+                             (o de <fuente> con ffmpeg, a ritmo de reproducción). Los parciales
+                             se muestran en stderr y los turnos finales en stdout.
+      --analitica-csv <ruta> Escribe en <ruta> la analítica de hablantes de cada fuente transcrita
+                             (tiempo de habla, palabras, turnos, interrupciones, silencios).
+      --manifiesto <ruta>    Archivo con una ruta o patrón por línea (modo lote).
+      --concurrencia <n>     Transcripciones simultáneas en modo lote o por fragmentos (por defecto 4).
+      --fragmentos[=<min>]   Divide medios largos en fragmentos de <min> minutos (por defecto 10)
+                             y los transcribe en paralelo. Requiere ffmpeg.
+      --solapamiento=<seg>   Segundos de solapamiento entre fragmentos (por defecto 5).
+      --buscar "<frase>"     Busca la frase en las transcripciones indexadas y termina.
+                             Admite --hablante <nombre|etiqueta>, --idioma <código> y --limite=<n>.
 
     Ejemplo:
       transcriptor.py --idioma=es --forzar-cancion mi_archivo.mp3
+      transcriptor.py --detectar-idioma --concurrencia 8 grabaciones/ "otras/**/*.wav"
+      transcriptor.py --formatos=txt,srt,vtt,json --nombres-hablantes "A=Ana,B=Carlos" reunion.mp4
+      ffmpeg -f pulse -i default -ac 1 -ar 16000 -f s16le - | transcriptor.py --tiempo-real
     """
     print(ayuda)
 
 
-def _classify_transcript_simple(text: str) -> str:
+# Palabras = tramos de caracteres alfanuméricos (equivale a str.isalnum por carácter)
+_PATRON_PALABRA = re.compile(r"[^\W_]+")
+
+# Tamaño de los trozos en que se recorre un texto completo ya disponible
+TAMANO_TROZO_CLASIFICACION = 256 * 1024
+
+# Límites de oración del formato de diálogo (sobre texto con espacios ya normalizados)
+_PATRON_FIN_ORACION = re.compile(r"(?<=[\.\?!])\s+")
+_ANCHO_DIALOGO = 80
+# Una oración sin puntuación más larga que esto se envuelve por partes
+_UMBRAL_ORACION_DIALOGO = 16 * 1024
+
+
+class ClasificadorIncremental:
     """
-    Clasifica el texto transcrito como "canción" o "diálogo" utilizando una heurística simple.
+    Calcula las métricas de _classify_transcript_simple en una sola pasada,
+    consumiendo el texto por trozos y con memoria acotada por el vocabulario.
 
-    - Indicadores de canción: alta repetición de palabras, líneas cortas, pocas marcas de puntuación.
-    - Indicadores de diálogo: oraciones largas, puntuación como '.', '?', '!', indicaciones de hablantes.
+    Cada trozo se procesa hasta su último espacio en blanco y el resto se guarda
+    para el siguiente, de modo que ni palabras ni la conversión a minúsculas
+    dependen de dónde se cortó el texto.
     """
-    if not text:
-        return "diálogo"
 
-    texto_minusculas = text.lower()
+    def __init__(self):
+        self._longitud = 0
+        self._puntuacion = 0
+        self._frecuencia: Counter = Counter()
+        self._suma_lineas = 0
+        self._num_lineas = 0
+        # Línea en curso (puede abarcar varios trozos): posición y tramo visible
+        self._pos_linea = 0
+        self._primer_visible: int | None = None
+        self._fin_visible = 0
+        self._pendiente = ""
+
+    def alimentar(self, trozo: str) -> None:
+        if not trozo:
+            return
+        self._longitud += len(trozo)
+        self._puntuacion += trozo.count(".") + trozo.count("?") + trozo.count("!")
+
+        texto = self._pendiente + trozo
+        corte = len(texto)
+        while corte > 0 and not texto[corte - 1].isspace():
+            corte -= 1
+        self._pendiente = texto[corte:]
+        if corte:
+            self._procesar(texto[:corte])
+
+    def _procesar(self, segmento: str) -> None:
+        self._frecuencia.update(_PATRON_PALABRA.findall(segmento.lower()))
+
+        piezas = segmento.splitlines(True)
+        ultima = piezas.pop()
+        if piezas:
+            # La primera pieza continúa la línea en curso; las intermedias son líneas completas
+            self._acumular_linea(piezas[0])
+            self._cerrar_linea()
+            longitudes = [len(ln) for ln in map(str.strip, piezas[1:]) if ln]
+            self._suma_lineas += sum(longitudes)
+            self._num_lineas += len(longitudes)
+        self._acumular_linea(ultima)
+        if ultima.splitlines()[0] != ultima:
+            self._cerrar_linea()
+
+    def _acumular_linea(self, pieza: str) -> None:
+        contenido = pieza.splitlines()[0] if pieza else ""
+        visible = contenido.strip()
+        if visible:
+            izquierda = len(contenido) - len(contenido.lstrip())
+            if self._primer_visible is None:
+                self._primer_visible = self._pos_linea + izquierda
+            self._fin_visible = self._pos_linea + len(contenido.rstrip())
+        self._pos_linea += len(contenido)
+
+    def _cerrar_linea(self) -> None:
+        if self._primer_visible is not None:
+            self._suma_lineas += self._fin_visible - self._primer_visible
+            self._num_lineas += 1
+        self._pos_linea = 0
+        self._primer_visible = None
+        self._fin_visible = 0
+
+    def finalizar(self) -> str:
+        """
+        Procesa lo pendiente y devuelve "canción" o "diálogo".
+        """
+        if self._pendiente:
+            self._procesar(self._pendiente)
+            self._pendiente = ""
+        self._cerrar_linea()
+
+        if not self._longitud:
+            return "diálogo"
+
+        densidad_puntuacion = self._puntuacion / max(self._longitud, 1)
+        repeticiones = sum(1 for conteo in self._frecuencia.values() if conteo >= 4)
+        proporcion_repeticion = repeticiones / max(len(self._frecuencia), 1)
+        longitud_promedio_linea = self._suma_lineas / max(self._num_lineas, 1)
+
+        # Decisión heurística
+        puntuacion_cancion = 0.0
+        if proporcion_repeticion > 0.03:
+            puntuacion_cancion += 1.0
+        if densidad_puntuacion < 0.005:
+            puntuacion_cancion += 1.0
+        if longitud_promedio_linea < 45:
+            puntuacion_cancion += 1.0
+
+        return "canción" if puntuacion_cancion >= 2.0 else "diálogo"
+
+
+def trozos_de_texto(texto: str, tamano: int = TAMANO_TROZO_CLASIFICACION):
+    """
+    Recorre un texto ya disponible por trozos, para los consumidores incrementales.
+    """
+    for inicio in range(0, len(texto), tamano):
+        yield texto[inicio:inicio + tamano]
 
-    # Densidad básica de puntuación
-    conteo_puntuacion = sum(texto_minusculas.count(ch) for ch in ".?!")
-    densidad_puntuacion = conteo_puntuacion / max(len(text), 1)
 
-    # Puntuación de repetición: cuenta palabras que aparecen >= 4 veces
-    palabras = [w for w in ''.join(ch if ch.isalnum() or ch.isspace() else ' ' for ch in texto_minusculas).split() if w]
-    frecuencia = {}
-    for palabra in palabras:
-        frecuencia[palabra] = frecuencia.get(palabra, 0) + 1
-    repeticiones = sum(1 for _, conteo in frecuencia.items() if conteo >= 4)
-    proporcion_repeticion = repeticiones / max(len(frecuencia), 1)
+def trozos_de_utterances(utterances):
+    """
+    Texto de cada utterance como un trozo, separadas por un espacio.
+    """
+    for i, utterance in enumerate(utterances):
+        yield utterance.text if i == 0 else " " + utterance.text
 
-    # Métricas de longitud de línea
-    lineas = [ln.strip() for ln in text.splitlines() if ln.strip()]
-    longitud_promedio_linea = sum(len(ln) for ln in lineas) / max(len(lineas), 1)
 
-    # Decisión heurística
-    puntuacion_cancion = 0.0
-    if proporcion_repeticion > 0.03:
-        puntuacion_cancion += 1.0
-    if densidad_puntuacion < 0.005:
-        puntuacion_cancion += 1.0
-    if longitud_promedio_linea < 45:
-        puntuacion_cancion += 1.0
+def clasificar_trozos(trozos) -> str:
+    """
+    Decisión de _classify_transcript_simple sobre un iterable de trozos de texto.
+    """
+    clasificador = ClasificadorIncremental()
+    for trozo in trozos:
+        clasificador.alimentar(trozo)
+    return clasificador.finalizar()
 
-    return "canción" if puntuacion_cancion >= 2.0 else "diálogo"
+
+def formatear_letras_incremental(trozos):
+    """
+    Versión por trozos de _format_as_lyrics: genera las líneas formateadas a medida
+    que se completan; "\n".join(...) da exactamente el mismo texto.
+
+    Solo se retiene la línea en curso (y, si el trozo terminó en un salto de
+    línea, ese salto, que podría ser la mitad de un separador de estrofas).
+    """
+    partes: list[str] = []
+    hay_salida = False
+    separador_pendiente = False
+    estrofa_con_versos = False
+
+    def _verso(crudo: str):
+        nonlocal hay_salida, separador_pendiente, estrofa_con_versos
+        verso = crudo.strip()
+        if not verso:
+            return
+        if separador_pendiente:
+            # Línea en blanco entre estrofas; la del final la quitaba el strip()
+            yield ""
+            separador_pendiente = False
+        # El strip() final del original también quita la sangría del primer verso
+        yield f"  {verso}" if hay_salida else verso
+        hay_salida = True
+        estrofa_con_versos = True
+
+    def _fin_estrofa() -> None:
+        nonlocal separador_pendiente, estrofa_con_versos
+        if estrofa_con_versos:
+            separador_pendiente = True
+        estrofa_con_versos = False
+
+    for trozo in trozos:
+        if not trozo:
+            continue
+        if "\n" not in trozo and not (partes and partes[-1].endswith("\n")):
+            partes.append(trozo)
+            continue
+        texto = "".join(partes) + trozo
+        posicion = 0
+        while True:
+            salto = texto.find("\n", posicion)
+            # Un salto al final todavía no se sabe si separa versos o estrofas
+            if salto == -1 or salto == len(texto) - 1:
+                break
+            yield from _verso(texto[posicion:salto])
+            if texto[salto + 1] == "\n":
+                _fin_estrofa()
+                posicion = salto + 2
+            else:
+                posicion = salto + 1
+        partes = [texto[posicion:]] if posicion < len(texto) else []
+
+    for crudo in "".join(partes).split("\n"):
+        yield from _verso(crudo)
+
+
+def _envolver_dialogo(oracion: str) -> list[str]:
+    return textwrap.wrap(oracion, width=_ANCHO_DIALOGO)
+
+
+def _envolver_lineas_cerradas(oracion: str) -> tuple[list[str], str]:
+    """
+    Envuelve una oración aún incompleta. Retorna las líneas que ya no pueden
+    cambiar y el resto de la oración (desde el inicio de una palabra).
+
+    El ajuste es voraz: una línea solo depende del texto desde su inicio, así que
+    las líneas anteriores a la última son definitivas. Se corta en la última que
+    empieza después de un espacio, para reanudar el ajuste igual que el original.
+    """
+    lineas = _envolver_dialogo(oracion)
+    inicios = []
+    posicion = 0
+    for linea in lineas:
+        posicion = oracion.index(linea, posicion)
+        inicios.append(posicion)
+        posicion += len(linea)
+    for i in range(len(lineas) - 1, 0, -1):
+        if oracion[inicios[i] - 1] == " ":
+            return lineas[:i], oracion[inicios[i]:]
+    return [], oracion
+
+
+def formatear_dialogo_incremental(trozos):
+    """
+    Versión por trozos de _format_as_dialogue: genera las líneas envueltas a medida
+    que se cierran las oraciones; "\n".join(...) da exactamente el mismo texto.
+
+    Se retiene la palabra cortada entre trozos y la oración en curso; una oración
+    sin puntuación que supera _UMBRAL_ORACION_DIALOGO se envuelve por partes.
+    """
+    cola = ""
+    # Oración en curso, por piezas ya normalizadas (se unen con un espacio)
+    oracion: list[str] = []
+    longitud = 0
+
+    def _palabras(texto: str):
+        nonlocal oracion, longitud
+        palabras = texto.split()
+        if not palabras:
+            return
+        partes = _PATRON_FIN_ORACION.split(" ".join(palabras))
+        ultima = partes.pop()
+        for parte in partes:
+            # Solo la primera parte continúa la oración en curso
+            yield from _envolver_dialogo(" ".join(oracion + [parte]))
+            oracion, longitud = [], 0
+        oracion.append(ultima)
+        longitud += len(ultima) + 1
+        if ultima[-1] in ".?!":
+            # La siguiente palabra llegará tras un espacio: la oración ya está cerrada
+            yield from _envolver_dialogo(" ".join(oracion))
+            oracion, longitud = [], 0
+        elif longitud > _UMBRAL_ORACION_DIALOGO:
+            cerradas, resto = _envolver_lineas_cerradas(" ".join(oracion))
+            oracion, longitud = [resto], len(resto)
+            yield from cerradas
+
+    for trozo in trozos:
+        corte = len(trozo)
+        while corte > 0 and not trozo[corte - 1].isspace():
+            corte -= 1
+        if not corte:
+            cola += trozo
+            continue
+        yield from _palabras(cola + trozo[:corte])
+        cola = trozo[corte:]
+
+    yield from _palabras(cola)
+    if oracion:
+        yield from _envolver_dialogo(" ".join(oracion))
+
+
+def _classify_transcript_simple(text: str) -> str:
+    """
+    Clasifica el texto transcrito como "canción" o "diálogo" utilizando una heurística simple.
+
+    - Indicadores de canción: alta repetición de palabras, líneas cortas, pocas marcas de puntuación.
+    - Indicadores de diálogo: oraciones largas, puntuación como '.', '?', '!', indicaciones de hablantes.
+
+    Las métricas se calculan en una sola pasada con ClasificadorIncremental.
+    """
+    if not text:
+        return "diálogo"
+    return clasificar_trozos(trozos_de_texto(text))
 
 
 def _format_as_lyrics(text: str) -> str:
@@ -352,19 +1030,7 @@ def _format_as_lyrics(text: str) -> str:
     """
     if not text:
         return text
-
-    # Divide en estrofas asumiendo que están separadas por dos saltos de línea
-    estrofas = [estrofa.strip() for estrofa in text.split("\n\n") if estrofa.strip()]
-
-    letras_formateadas = []
-    for estrofa in estrofas:
-        # Divide en versos asumiendo que están separados por un salto de línea
-        versos = [verso.strip() for verso in estrofa.split("\n") if verso.strip()]
-        for verso in versos:
-            letras_formateadas.append(f"  {verso}")  # Sangría para el verso
-        letras_formateadas.append("")  # Salto de línea entre versos
-
-    return "\n".join(letras_formateadas).strip()
+    return "\n".join(formatear_letras_incremental(trozos_de_texto(text)))
 
 
 def _format_as_dialogue(text: str) -> str:
@@ -377,35 +1043,120 @@ def _format_as_dialogue(text: str) -> str:
     """
     if not text:
         return text
+    return "\n".join(formatear_dialogo_incremental(trozos_de_texto(text)))
 
-    import re
-    import textwrap
 
-    # Normaliza los espacios en blanco
-    texto_normalizado = " ".join(text.split())
+def procesar_fuente(fuente: str, opciones: dict) -> str:
+    """
+    Transcribe, formatea y guarda una fuente. Retorna la ruta del archivo generado.
+    """
+    import analitica
 
-    # Divide en límites de oración, manteniendo los delimitadores
-    partes = re.split(r"(?<=[\.\?!])\s+", texto_normalizado)
+    texto, transcripcion_obj = transcribir_audio(fuente, opciones)
+    with metricas.medir("clasificacion"):
+        tipo = "cancion" if opciones["forzar_cancion"] else _classify_transcript_simple(texto)
+    with metricas.medir("formato"):
+        texto_formateado = (
+            texto if opciones["salida_cruda"] else
+            _format_as_lyrics(texto) if tipo == "cancion" else
+            _format_as_dialogue(texto)
+        )
+    # Usar formato con speakers si el usuario lo pidió o si se detectan >1 hablantes
+    utterances = getattr(transcripcion_obj, 'utterances', []) or []
+    num_speakers_detectados = len({str(u.speaker) for u in utterances}) if utterances else 0
+    usar_speakers = bool(opciones["etiquetas_hablantes"]) or num_speakers_detectados > 1
+    with metricas.medir("analitica"):
+        analisis = analitica.analizar(utterances, opciones.get("mapa_nombres_hablantes") or None)
+    if opciones.get("resumen_analitica") is not None:
+        opciones["resumen_analitica"].agregar(fuente, analisis)
+
+    return guardar_transcripcion(
+        fuente,
+        texto_formateado,
+        tipo,
+        transcripcion_obj,
+        usar_speakers,
+        opciones.get("mapa_nombres_hablantes") or None,
+        opciones.get("formatos"),
+        analisis,
+        opciones.get("salida_con_extension", False),
+    )
+
+
+def transcribir_en_tiempo_real(opciones: dict) -> int:
+    """
+    Modo --tiempo-real: envía el audio por tramas mientras llega e imprime los
+    parciales (reemplazándose en la misma línea de stderr) y los turnos finales.
+    """
+    import threading
+
+    import tiempo_real
+
+    fuente = opciones["fuente"]
+    if fuente and fuente != "-":
+        tramas = medios.flujo_pcm(fuente, tiempo_real.TASA_MUESTREO, tiempo_real.BYTES_POR_TRAMA)
+    else:
+        tramas = iter(lambda: sys.stdin.buffer.read(tiempo_real.BYTES_POR_TRAMA), b"")
+
+    interactivo = sys.stderr.isatty()
+    errores: list[str] = []
+
+    def _mostrar() -> None:
+        for evento in sesion.eventos():
+            if evento["tipo"] == "parcial" and interactivo:
+                print(f"\r\033[K… {evento['texto'][-100:]}", end="", file=sys.stderr, flush=True)
+            elif evento["tipo"] == "final":
+                if interactivo:
+                    print("\r\033[K", end="", file=sys.stderr, flush=True)
+                prefijo = f"{evento['hablante']}: " if evento["hablante"] else ""
+                for i, linea in enumerate(evento["lineas"]):
+                    print(f"{prefijo if i == 0 else ' ' * len(prefijo)}{linea}", flush=True)
+            elif evento["tipo"] == "error":
+                errores.append(evento["mensaje"])
 
-    lineas_envueltas: list[str] = []
-    for parte in partes:
-        if not parte:
-            continue
-        lineas_envueltas.extend(textwrap.wrap(parte, width=80))
+    try:
+        sesion = tiempo_real.SesionTiempoReal(
+            mapa_nombres=opciones.get("mapa_nombres_hablantes") or None,
+            idioma=opciones.get("codigo_idioma"),
+        )
+        sesion.conectar()
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    lector = threading.Thread(target=_mostrar, name="tiempo-real", daemon=True)
+    lector.start()
+    try:
+        for trama in tramas:
+            if sesion.terminada:
+                break
+            sesion.enviar(trama)
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        errores.append(str(e))
+    finally:
+        sesion.terminar()
+        lector.join()
 
-    return "\n".join(lineas_envueltas)
+    for error in errores:
+        print(f"Error: {error}", file=sys.stderr)
+    return 1 if errores else 0
 
 
 def main() -> int:
     """
     Función principal que coordina el flujo del programa.
     """
+    import analitica
+    import exportacion
+
     clave_api = obtener_clave_api()
     if not clave_api:
         print("Falta la clave de API de AssemblyAI. Configura CLAVE_API_ASSEMBLYAI.", file=sys.stderr)
         return 1
 
-    aai.settings.api_key = clave_api
+    # Solo guarda la clave: el SDK se importa cuando algo se transcribe de verdad
+    clientes.configurar_clave(clave_api)
 
     opciones = procesar_argumentos(sys.argv[1:])
 
@@ -418,40 +1169,85 @@ def main() -> int:
             print(f"- {idioma}")
         return 0
 
-    if not opciones["fuente"] or not validar_fuente(opciones["fuente"]):
+    if opciones["buscar"]:
+        return buscar_transcripciones(opciones)
+
+    if opciones["tiempo_real"]:
+        return transcribir_en_tiempo_real(opciones)
+
+    try:
+        opciones["formatos"] = exportacion.leer_formatos(",".join(opciones["formatos"]))
+        motores.obtener_motor(opciones["motor"])
+    except (ValueError, RuntimeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    # Modo lote: varias fuentes, directorios, patrones glob o un manifiesto
+    entradas = list(opciones["fuentes"])
+    if opciones["manifiesto"]:
+        try:
+            entradas.extend(lote.leer_manifiesto(opciones["manifiesto"]))
+        except OSError as e:
+            print(f"No se pudo leer el manifiesto: {e}", file=sys.stderr)
+            return 1
+    es_lote = (
+        bool(opciones["manifiesto"])
+        or len(entradas) > 1
+        or any(os.path.isdir(e) or (not os.path.exists(e) and glob.has_magic(e)) for e in entradas)
+    )
+
+    if es_lote:
+        fuentes = lote.expandir_fuentes(entradas)
+        if not fuentes:
+            print("No se encontraron archivos para transcribir.", file=sys.stderr)
+            return 1
+    elif not opciones["fuente"] or not validar_fuente(opciones["fuente"]):
         print("Fuente no válida o no encontrada.", file=sys.stderr)
         return 1
 
+    if opciones["codigo_idioma"] and not catalogo_idiomas.obtener_catalogo(opciones["ruta_idiomas_csv"]).contiene(opciones["codigo_idioma"]):
+        print(f"Aviso: el idioma '{opciones['codigo_idioma']}' no está en el catálogo; se envía tal cual.", file=sys.stderr)
+
     if not opciones["codigo_idioma"] and not opciones["detectar_idioma"]:
         opciones["codigo_idioma"] = seleccionar_idioma(opciones["ruta_idiomas_csv"])
 
+    if opciones["analitica_csv"]:
+        try:
+            opciones["resumen_analitica"] = analitica.ResumenCsv(opciones["analitica_csv"])
+        except OSError as e:
+            print(f"No se pudo crear el CSV de analítica: {e}", file=sys.stderr)
+            return 1
+
     try:
-        texto, transcripcion_obj = transcribir_audio(opciones["fuente"], opciones)
-        tipo = "cancion" if opciones["forzar_cancion"] else _classify_transcript_simple(texto)
-        texto_formateado = (
-            texto if opciones["salida_cruda"] else
-            _format_as_lyrics(texto) if tipo == "cancion" else
-            _format_as_dialogue(texto)
-        )
-        # Usar formato con speakers si el usuario lo pidió o si se detectan >1 hablantes
-        utterances = getattr(transcripcion_obj, 'utterances', []) or []
-        num_speakers_detectados = len({str(u.speaker) for u in utterances}) if utterances else 0
-        usar_speakers = bool(opciones["etiquetas_hablantes"]) or num_speakers_detectados > 1
-
-        guardar_transcripcion(
-            opciones["fuente"],
-            texto_formateado,
-            tipo,
-            transcripcion_obj,
-            usar_speakers,
-            opciones.get("mapa_nombres_hablantes") or None,
-        )
-        return 0
-    except Exception as e:
-        print(f"Error: {e}", file=sys.stderr)
-        return 1
+        if es_lote:
+            # a.mp3 y a.wav en el mismo lote: sus salidas conservan la extensión para no pisarse
+            repetidas = lote.fuentes_con_base_repetida(fuentes)
+            resumen = lote.ejecutar_lote(
+                fuentes,
+                lambda fuente: procesar_fuente(
+                    fuente, dict(opciones, fuente=fuente, salida_con_extension=fuente in repetidas),
+                ),
+                opciones["concurrencia"],
+                planificador_llamadas.planificador_por_defecto(),
+                opciones["formatos"],
+            )
+            codigo = 1 if resumen["fallidas"] else 0
+        else:
+            try:
+                procesar_fuente(opciones["fuente"], opciones)
+                codigo = 0
+            except Exception as e:
+                print(f"Error: {e}", file=sys.stderr)
+                codigo = 1
+    finally:
+        if opciones.get("resumen_analitica") is not None:
+            opciones["resumen_analitica"].cerrar()
+            print(f"Analítica de hablantes guardada en: {opciones['analitica_csv']}")
+
+    if opciones["perfil"]:
+        metricas.imprimir_perfil()
+    return codigo
 
 
 if __name__ == "__main__":
     raise SystemExit(main())
-
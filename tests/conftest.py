@@ -0,0 +1,72 @@
+"""
+Pruebas contra proveedor_falso.py: sin red, sin clave real y sin costo.
+
+La app lee su configuración del entorno al importarse, así que las variables
+se fijan aquí, antes de que cualquier prueba importe `app`.
+"""
+import logging
+import os
+import socket
+import sys
+import tempfile
+import threading
+
+import pytest
+
+
+DIRECTORIO_SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, DIRECTORIO_SRC)
+
+_DIRECTORIO_PRUEBAS = tempfile.mkdtemp(prefix="pruebas-transcriptor-")
+os.environ.update({
+    "ASSEMBLYAI_API_KEY": "falsa",
+    "CLAVE_API_ASSEMBLYAI": "falsa",
+    "CACHE_TRANSCRIPCIONES": "0",
+    "RUTA_INDICE_TRANSCRIPCIONES": os.path.join(_DIRECTORIO_PRUEBAS, "indice.sqlite3"),
+    "RUTA_ESTADO_COMPARTIDO": os.path.join(_DIRECTORIO_PRUEBAS, "estado.sqlite3"),
+    "LIMITE_PETICIONES_POR_SEGUNDO": "0",
+    "ESPERA_BASE_REINTENTO_SEGUNDOS": "0.01",
+})
+
+
+def servir_en_hilo(app_wsgi):
+    """
+    Sirve `app_wsgi` en 127.0.0.1 (puerto libre) en un hilo; retorna (servidor, url_base).
+    """
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    servidor = make_server("127.0.0.1", 0, app_wsgi, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_port}"
+
+
+def puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def proveedor(monkeypatch):
+    """
+    Levanta proveedor_falso con los parámetros indicados y apunta el SDK a él:
+    proveedor(retardo=0.2, tasa_429=0.5) -> ProveedorFalso.
+    """
+    import clientes
+    import proveedor_falso
+
+    servidores = []
+
+    def _iniciar(**parametros) -> "proveedor_falso.ProveedorFalso":
+        falso = proveedor_falso.ProveedorFalso(**parametros)
+        servidor, url = servir_en_hilo(proveedor_falso.crear_app(falso))
+        servidores.append(servidor)
+        ajustes = clientes.sdk().settings
+        monkeypatch.setattr(ajustes, "base_url", url)
+        monkeypatch.setattr(ajustes, "polling_interval", 0.05)
+        return falso
+
+    yield _iniciar
+    for servidor in servidores:
+        servidor.shutdown()
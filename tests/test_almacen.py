@@ -0,0 +1,93 @@
+"""
+Índice de transcripciones (SQLite FTS5).
+"""
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import almacen
+
+
+@pytest.fixture
+def indice(tmp_path):
+    return almacen.AlmacenTranscripciones(str(tmp_path / "indice.sqlite3"))
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requiere fork")
+def test_conexion_no_se_hereda_tras_fork(indice):
+    heredada = indice._conexion()
+    pid = os.fork()
+    if pid == 0:
+        # En el hijo (como un worker de gunicorn --preload) se abre una conexión propia
+        os._exit(0 if indice._conexion() is not heredada else 1)
+    _, estado = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(estado) == 0
+    assert indice._conexion() is heredada
+
+
+def _transcripcion(*utterances, idioma="es"):
+    return SimpleNamespace(
+        language_code=idioma,
+        text=None,
+        utterances=[
+            SimpleNamespace(speaker=hablante, text=frase, start=i * 1000, end=i * 1000 + 900)
+            for i, (hablante, frase) in enumerate(utterances)
+        ],
+    )
+
+
+def test_busca_frase_con_hablante_y_tiempos(indice):
+    indice.guardar(
+        "reunion", "reunion.mp3",
+        _transcripcion(("A", "Buenos días a todos"), ("B", "Revisemos el informe trimestral")),
+        tipo="dialogo", mapa_nombres={"B": "Beatriz"},
+    )
+
+    (resultado,) = indice.buscar("informe trimestral")
+
+    assert resultado["fuente"] == "reunion.mp3"
+    assert (resultado["hablante"], resultado["etiqueta"]) == ("Beatriz", "B")
+    assert (resultado["inicio"], resultado["fin"]) == (1000, 1900)
+    assert resultado["tipo"] == "dialogo" and resultado["idioma"] == "es"
+    assert resultado["fragmento"] == "Revisemos el [informe trimestral]"
+
+
+def test_frase_exacta_sin_acentos_ni_operadores(indice):
+    indice.guardar("a", "a.mp3", _transcripcion(("A", "La canción terminó muy tarde")))
+
+    assert indice.buscar("cancion termino")
+    # Frase exacta: mismas palabras en otro orden no coinciden
+    assert not indice.buscar("termino cancion")
+    # Comillas y operadores de FTS5 se buscan como texto, sin error de sintaxis
+    assert indice.buscar('canción" OR "nada') == []
+
+
+def test_filtros_por_hablante_e_idioma(indice):
+    indice.guardar("es", "es.mp3", _transcripcion(("A", "hola equipo"), ("B", "hola a todos")), mapa_nombres={"A": "Ana"})
+    indice.guardar("en", "en.mp3", _transcripcion(("A", "hola amigos"), idioma="en"))
+
+    assert len(indice.buscar("hola")) == 3
+    assert [r["fuente"] for r in indice.buscar("hola", hablante="Ana")] == ["es.mp3"]
+    # La etiqueta del proveedor también sirve como filtro
+    assert {r["fuente"] for r in indice.buscar("hola", hablante="A")} == {"es.mp3", "en.mp3"}
+    assert [r["fuente"] for r in indice.buscar("hola", idioma="en")] == ["en.mp3"]
+
+
+def test_reindexar_reemplaza_y_ordena_por_reciente(indice):
+    indice.guardar("x", "viejo.mp3", _transcripcion(("A", "presupuesto anual")))
+    indice.guardar("y", "otro.mp3", _transcripcion(("A", "presupuesto del mes")))
+    indice.guardar("x", "nuevo.mp3", _transcripcion(("A", "presupuesto revisado")))
+
+    resultados = indice.buscar("presupuesto")
+    assert [r["fuente"] for r in resultados] == ["nuevo.mp3", "otro.mp3"]
+    assert [r["fuente"] for r in indice.buscar("presupuesto", limite=1)] == ["nuevo.mp3"]
+    assert not indice.buscar("anual")
+    assert {r["fuente"] for r in indice.buscar("presupuesto", por_relevancia=True)} == {"nuevo.mp3", "otro.mp3"}
+
+
+def test_sin_utterances_indexa_el_texto_completo(indice):
+    indice.guardar("letra", "cancion.mp3", SimpleNamespace(language_code=None, utterances=None, text="bajo la lluvia"))
+
+    (resultado,) = indice.buscar("bajo la lluvia")
+    assert resultado["hablante"] is None and resultado["inicio"] is None
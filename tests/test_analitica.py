@@ -0,0 +1,114 @@
+"""
+Analítica de hablantes sobre utterances.
+"""
+from types import SimpleNamespace
+
+import analitica
+
+
+def _utterances(*tramos):
+    # (hablante, inicio, fin, texto)
+    return [SimpleNamespace(speaker=h, start=i, end=f, text=t, words=None) for h, i, f, t in tramos]
+
+
+def _por_etiqueta(analisis: dict) -> dict:
+    return {h["etiqueta"]: h for h in analisis["hablantes"]}
+
+
+def test_quien_retoma_su_turno_tras_un_aja_no_se_interrumpe_a_si_mismo():
+    analisis = analitica.analizar(_utterances(
+        ("A", 0, 10000, "uno dos tres"),
+        ("B", 2000, 2500, "ajá"),
+        ("A", 3000, 12000, "cuatro cinco"),
+    ))
+    hablantes = _por_etiqueta(analisis)
+
+    assert analisis["interrupciones"] == 0
+    assert hablantes["A"]["interrupciones"] == 0 and hablantes["B"]["interrumpido"] == 0
+    # Solo el "ajá" se solapa con A
+    assert analisis["solapamientos"] == 1
+    assert (hablantes["A"]["solapamiento_ms"], hablantes["B"]["solapamiento_ms"]) == (0, 500)
+
+
+def test_la_interrupcion_se_atribuye_a_quien_tenia_la_palabra():
+    analisis = analitica.analizar(_utterances(
+        ("A", 0, 10000, "uno dos tres"),
+        ("B", 2000, 2500, "ajá"),
+        ("C", 9000, 11000, "perdón, una pregunta"),
+    ))
+    hablantes = _por_etiqueta(analisis)
+
+    assert analisis["interrupciones"] == 1
+    assert hablantes["C"]["interrupciones"] == 1
+    assert (hablantes["A"]["interrumpido"], hablantes["B"]["interrumpido"]) == (1, 0)
+    assert hablantes["C"]["solapamiento_ms"] == 1000
+
+
+def test_sin_utterances_no_hay_analisis():
+    assert analitica.analizar([]) is None
+
+
+def test_tiempo_palabras_turnos_y_silencios():
+    analisis = analitica.analizar(
+        _utterances(
+            ("B", 0, 3000, "hola qué tal"),
+            ("B", 3500, 6000, "bien gracias"),
+            ("A", 9000, 15000, "uno dos tres cuatro cinco seis"),
+            ("B", 15500, 16500, "vale"),
+        ),
+        mapa_nombres={"A": "Ana"},
+        umbral_silencio_ms=2000,
+    )
+    hablantes = _por_etiqueta(analisis)
+
+    # Etiquetas en orden alfabético, con el nombre del mapa o "Speaker X"
+    assert [h["etiqueta"] for h in analisis["hablantes"]] == ["A", "B"]
+    assert (hablantes["A"]["nombre"], hablantes["B"]["nombre"]) == ("Ana", "Speaker B")
+    assert (hablantes["A"]["tiempo_habla_ms"], hablantes["B"]["tiempo_habla_ms"]) == (6000, 6500)
+    assert hablantes["A"]["porcentaje_habla"] == 48.0
+    assert hablantes["A"]["palabras"] == 6 and hablantes["A"]["palabras_por_minuto"] == 60.0
+    # Dos utterances seguidos de B forman un turno de 0 a 6000
+    assert analisis["turnos"] == 3
+    assert (hablantes["B"]["turnos"], hablantes["B"]["turno_max_ms"], hablantes["B"]["turno_medio_ms"]) == (2, 6000, 3500)
+    assert (analisis["silencio_total_ms"], analisis["silencio_max_ms"], analisis["silencios_largos"]) == (4000, 3000, 1)
+    assert analisis["silencio_medio_ms"] == 1333
+    assert analisis["solapamientos"] == 0 and analisis["interrupciones"] == 0
+
+
+def test_utterances_desordenados_y_palabras_con_tiempos():
+    # Se ordenan por inicio; con palabras, se cuentan esas y no las del texto
+    con_palabras = SimpleNamespace(speaker="A", start=0, end=1000, text="texto largo de cinco", words=[object()] * 2)
+    analisis = analitica.analizar(_utterances(("B", 2000, 3000, "hola")) + [con_palabras])
+
+    assert _por_etiqueta(analisis)["A"]["palabras"] == 2
+    assert analisis["silencio_total_ms"] == 1000
+
+
+def test_igual_que_el_recorrido_uno_a_uno():
+    import benchmark
+
+    for semilla in range(30):
+        utterances = benchmark._conversacion_sintetica(200, semilla)
+        assert analitica.analizar(utterances, umbral_silencio_ms=2000) == benchmark._analizar_referencia(utterances, 2000)
+
+
+def test_resumen_csv_una_fila_por_hablante(tmp_path):
+    analisis = analitica.analizar(_utterances(("A", 0, 1000, "hola"), ("B", 1500, 2500, "adiós")))
+    ruta = tmp_path / "analitica.csv"
+    resumen = analitica.ResumenCsv(str(ruta))
+    resumen.agregar("a.mp3", analisis)
+    resumen.agregar("vacio.mp3", None)
+    resumen.cerrar()
+
+    filas = ruta.read_text(encoding="utf-8").splitlines()
+    assert filas[0].split(",") == list(analitica.COLUMNAS_CSV)
+    assert [f.split(",")[:3] for f in filas[1:]] == [["a.mp3", "A", "Speaker A"], ["a.mp3", "B", "Speaker B"]]
+
+
+def test_tabla_de_texto():
+    analisis = analitica.analizar(_utterances(("A", 0, 65000, "hola"), ("B", 68000, 70000, "sí")))
+    lineas = analitica.lineas_tabla(analisis)
+
+    assert lineas[1].startswith("Speaker A") and "1:05" in lineas[1]
+    assert lineas[-1].startswith("Silencios: 0:03 en total")
+    assert analitica.formatear_ms(3_725_000) == "1:02:05"
@@ -0,0 +1,104 @@
+"""
+Caché de transcripciones en disco: claves, vencimiento, desalojo LRU y escritura atómica.
+"""
+import hashlib
+import os
+import time
+
+import pytest
+
+import cache
+from modelos import Palabra, Segmento, TranscripcionLocal
+
+
+def _transcripcion(texto: str = "hola a todos") -> TranscripcionLocal:
+    palabras = [Palabra("hola", 0, 400, 0.9, "A"), Palabra("a", 400, 500, 0.8, "A"), Palabra("todos", 500, 900, 0.95, "A")]
+    return TranscripcionLocal(texto, [Segmento("A", texto, 0, 900, 0.9, palabras)], palabras, "es", 0.9, "abc")
+
+
+@pytest.fixture
+def cache_vacia(tmp_path):
+    return cache.CacheTranscripciones(str(tmp_path / "cache"), max_bytes=10 * 1024 * 1024, ttl_segundos=3600)
+
+
+def _entradas(directorio) -> set[str]:
+    return {nombre for _, _, archivos in os.walk(directorio) for nombre in archivos}
+
+
+def test_hash_por_bloques_y_clave_segun_configuracion(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "TAMANO_BLOQUE_HASH", 7)
+    medio = tmp_path / "audio.mp3"
+    medio.write_bytes(bytes(range(256)) * 3)
+
+    assert cache.hash_archivo(str(medio)) == hashlib.blake2b(medio.read_bytes(), digest_size=32).hexdigest()
+    # El orden de las opciones no cambia la clave; su valor sí
+    assert cache.calcular_clave("h", {"idioma": "es", "hablantes": True}) == cache.calcular_clave("h", {"hablantes": True, "idioma": "es"})
+    assert cache.calcular_clave("h", {"idioma": "es"}) != cache.calcular_clave("h", {"idioma": "en"})
+    assert cache.calcular_clave("h", {"idioma": "es"}) != cache.calcular_clave("g", {"idioma": "es"})
+
+
+def test_ida_y_vuelta_con_hablantes_y_palabras(cache_vacia):
+    cache_vacia.guardar("ab" + "0" * 62, _transcripcion())
+
+    recuperada = cache_vacia.obtener("ab" + "0" * 62)
+
+    assert recuperada.a_dict() == _transcripcion().a_dict()
+    assert recuperada.utterances[0].words[2].text == "todos"
+    assert cache_vacia.obtener("cd" + "0" * 62) is None
+
+
+def test_entrada_vencida_se_borra(cache_vacia, monkeypatch):
+    clave = "ab" + "1" * 62
+    cache_vacia.guardar(clave, _transcripcion())
+    ahora = time.time()
+
+    monkeypatch.setattr(cache.time, "time", lambda: ahora + 3601)
+
+    assert cache_vacia.obtener(clave) is None
+    assert _entradas(cache_vacia.directorio) == set()
+
+
+def test_desaloja_la_menos_usada_recientemente(cache_vacia):
+    claves = {nombre: nombre * 64 for nombre in "abcd"}
+    for nombre in "abc":
+        cache_vacia.guardar(claves[nombre], _transcripcion())
+    # a es la más antigua, pero se acaba de leer: la menos usada pasa a ser b
+    ahora = time.time()
+    for antiguedad, nombre in ((300, "a"), (200, "b"), (100, "c")):
+        os.utime(cache_vacia._ruta(claves[nombre]), (ahora - antiguedad, ahora - antiguedad))
+    assert cache_vacia.obtener(claves["a"]) is not None
+    tamano = os.path.getsize(cache_vacia._ruta(claves["a"]))
+    cache_vacia.max_bytes = int(tamano * 3.5)
+
+    cache_vacia.guardar(claves["d"], _transcripcion())
+
+    assert _entradas(cache_vacia.directorio) == {f"{claves[n]}.json.gz" for n in "acd"}
+    assert cache_vacia._total <= cache_vacia.max_bytes * cache.FRACCION_TRAS_DESALOJO
+
+
+def test_escritura_fallida_no_deja_entradas_a_medias(cache_vacia, monkeypatch):
+    clave = "ab" + "2" * 62
+    cache_vacia.guardar(clave, _transcripcion("versión buena"))
+
+    def _cortar(datos, archivo, **_kwargs):
+        archivo.write('{"creado": ')
+        raise OSError("disco lleno")
+
+    monkeypatch.setattr(cache.json, "dump", _cortar)
+    with pytest.raises(OSError):
+        cache_vacia.guardar(clave, _transcripcion("versión nueva"))
+    monkeypatch.undo()
+
+    # Ni un .tmp abandonado ni la entrada anterior pisada
+    assert _entradas(cache_vacia.directorio) == {f"{clave}.json.gz"}
+    assert cache_vacia.obtener(clave).text == "versión buena"
+
+
+def test_entrada_corrupta_es_un_fallo(cache_vacia):
+    clave = "ab" + "3" * 62
+    ruta = cache_vacia._ruta(clave)
+    os.makedirs(os.path.dirname(ruta))
+    with open(ruta, "wb") as f:
+        f.write(b"no es gzip")
+
+    assert cache_vacia.obtener(clave) is None
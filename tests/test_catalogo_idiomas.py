@@ -0,0 +1,69 @@
+"""
+Catálogo de idiomas: lectura del CSV, recarga al cambiar y ETag de la página de inicio.
+"""
+import os
+
+import app as aplicacion
+import catalogo_idiomas
+
+
+def _escribir_csv(ruta, filas, marca_ns: int | None = None) -> None:
+    lineas = ["Language,Language Code"] + [f"{nombre},{codigo}" for nombre, codigo in filas]
+    ruta.write_text("﻿" + "\n".join(lineas) + "\n", encoding="utf-8")
+    if marca_ns is not None:
+        os.utime(ruta, ns=(marca_ns, marca_ns))
+
+
+def test_lee_ordena_y_descarta_repetidos(tmp_path):
+    ruta = tmp_path / "idiomas.csv"
+    _escribir_csv(ruta, [("Spanish", "es"), ("English", "en"), ("Español otra vez", "es"), ("<b>Klingon</b>", "tlh"), ("Sin código", "")])
+    catalogo = catalogo_idiomas.CatalogoIdiomas(str(ruta))
+
+    # El BOM no estropea la primera cabecera; se ordena por nombre
+    assert catalogo.etiquetas() == ["tlh (<b>Klingon</b>)", "en (English)", "es (Spanish)"]
+    assert catalogo.buscar("es").nombre == "Spanish" and not catalogo.contiene("xx")
+    opciones, _ = catalogo.opciones_html()
+    assert '<option value="tlh">tlh (&lt;b&gt;Klingon&lt;/b&gt;)</option>' in opciones
+
+
+def test_respaldo_sin_csv_o_sin_columnas(tmp_path):
+    sin_columnas = tmp_path / "otro.csv"
+    sin_columnas.write_text("Nombre,Código\nEspañol,es\n", encoding="utf-8")
+
+    for ruta in (tmp_path / "no-existe.csv", sin_columnas):
+        catalogo = catalogo_idiomas.CatalogoIdiomas(str(ruta))
+        assert [e.codigo for e in catalogo.entradas()] == [c for c, _ in catalogo_idiomas.IDIOMAS_RESPALDO]
+        assert catalogo.version
+
+
+def test_recarga_solo_si_cambia_el_csv(tmp_path):
+    ruta = tmp_path / "idiomas.csv"
+    _escribir_csv(ruta, [("Spanish", "es")], marca_ns=1_000_000_000)
+    catalogo = catalogo_idiomas.CatalogoIdiomas(str(ruta))
+    entradas = catalogo.entradas()
+    version = catalogo.version
+
+    assert catalogo.entradas() is entradas
+    _escribir_csv(ruta, [("Spanish", "es"), ("French", "fr")], marca_ns=2_000_000_000)
+
+    assert catalogo.etiquetas() == ["fr (French)", "es (Spanish)"]
+    assert catalogo.version != version
+
+
+def test_etag_de_la_pagina_de_inicio(tmp_path, monkeypatch):
+    ruta = tmp_path / "idiomas.csv"
+    _escribir_csv(ruta, [("Spanish", "es")], marca_ns=1_000_000_000)
+    monkeypatch.setattr(catalogo_idiomas, "RUTA_CSV_POR_DEFECTO", str(ruta))
+    cliente = aplicacion.app.test_client()
+
+    primera = cliente.get("/")
+    etag = primera.headers["ETag"]
+    assert primera.status_code == 200 and b'<option value="es">' in primera.data
+    assert primera.headers["Cache-Control"] == "no-cache"
+    assert cliente.get("/", headers={"If-None-Match": etag}).status_code == 304
+
+    # Al cambiar el CSV cambian la página y su ETag
+    _escribir_csv(ruta, [("Spanish", "es"), ("French", "fr")], marca_ns=2_000_000_000)
+    nueva = cliente.get("/", headers={"If-None-Match": etag})
+    assert nueva.status_code == 200 and b'<option value="fr">' in nueva.data
+    assert nueva.headers["ETag"] != etag
@@ -0,0 +1,51 @@
+"""
+Clasificador canción/diálogo de una pasada frente a la implementación original.
+"""
+import random
+from types import SimpleNamespace
+
+import pytest
+
+import benchmark
+import transcribe
+
+
+_BORDES = (
+    "",
+    " \n\n ",
+    "Hola.\r\nQué tal?\r\n\r\nBien!",
+    "la la la\nla la la\rla la la la\nla la la",
+    "uno\x0bdos\x0ctres\x1ccuatro\x85cinco seis",
+    "¿Qué? ¡Sí! Vale... ñandú ÁRBOL árbol Árbol árbol",
+    "x\ty\n\n\n  z  \n",
+    "palabra " * 500,
+)
+
+
+def _aleatorios(cantidad: int, semilla: int = 3) -> list[str]:
+    azar = random.Random(semilla)
+    alfabeto = "ab c.\n?!\r Éé1 ,\t"
+    return ["".join(azar.choice(alfabeto) for _ in range(azar.randint(1, 200))) for _ in range(cantidad)]
+
+
+@pytest.mark.parametrize("tipo", ["diálogo", "canción"])
+def test_misma_decision_que_el_original(tipo):
+    for semilla in range(5):
+        texto = benchmark.texto_sintetico(50 * 1024, tipo, semilla)
+        assert transcribe._classify_transcript_simple(texto) == benchmark._clasificar_referencia(texto) == tipo
+
+
+def test_misma_decision_con_cualquier_corte_en_trozos():
+    # Los cortes caen dentro de palabras, de "\r\n" y de separadores de estrofa
+    for texto in _BORDES + tuple(_aleatorios(500)):
+        esperado = benchmark._clasificar_referencia(texto)
+        assert transcribe._classify_transcript_simple(texto) == esperado, repr(texto)
+        for tamano in (1, 2, 3, 7):
+            assert transcribe.clasificar_trozos(transcribe.trozos_de_texto(texto, tamano)) == esperado, (repr(texto), tamano)
+
+
+def test_clasifica_las_utterances_sin_unirlas():
+    texto = "Buenos días a todos. ¿Empezamos con el informe? Sí, adelante."
+    utterances = [SimpleNamespace(text=parte) for parte in texto.split(" ")]
+
+    assert transcribe.clasificar_trozos(transcribe.trozos_de_utterances(utterances)) == benchmark._clasificar_referencia(texto)
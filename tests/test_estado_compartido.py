@@ -0,0 +1,180 @@
+"""
+Un trabajo creado en otro proceso (otro worker de gunicorn) se ve desde este a
+través del estado compartido.
+"""
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from conftest import DIRECTORIO_SRC
+
+import app as aplicacion
+import estado_compartido
+import metricas
+import trabajos
+
+
+# Otro proceso con el mismo RUTA_ESTADO_COMPARTIDO: crea un trabajo, espera a que termine e imprime su id
+_OTRO_PROCESO = """
+import time
+import estado_compartido
+import trabajos
+
+gestor = trabajos.GestorTrabajos(estado=estado_compartido.estado_por_defecto())
+trabajo = gestor.enviar(lambda: {"texto": "hola desde otro proceso", "formatos": []}, nombre="otro.mp3")
+while not trabajo.terminado:
+    time.sleep(0.01)
+print(trabajo.id)
+"""
+
+
+def _trabajo_de_otro_proceso() -> str:
+    salida = subprocess.run(
+        [sys.executable, "-c", _OTRO_PROCESO], cwd=DIRECTORIO_SRC, env=os.environ.copy(),
+        capture_output=True, text=True, timeout=60, check=True,
+    )
+    return salida.stdout.strip()
+
+
+def test_trabajo_de_otro_proceso_visible_por_el_estado_compartido():
+    id_trabajo = _trabajo_de_otro_proceso()
+    # No es un trabajo de este proceso: solo puede venir de la base compartida
+    assert id_trabajo not in trabajos.gestor_por_defecto()._trabajos
+
+    respuesta = aplicacion.app.test_client().get(f"/jobs/{id_trabajo}", headers={"Accept": "application/json"})
+
+    assert respuesta.status_code == 200
+    datos = respuesta.get_json()
+    assert datos["estado"] == "completado"
+    assert datos["nombre"] == "otro.mp3"
+    assert datos["resultado"]["texto"] == "hola desde otro proceso"
+
+
+def test_trabajo_inexistente_no_aparece():
+    respuesta = aplicacion.app.test_client().get("/jobs/no-existe", headers={"Accept": "application/json"})
+    assert respuesta.status_code == 404
+
+
+def test_base_y_directorio_privados(tmp_path):
+    ruta = tmp_path / "privado" / "estado.sqlite3"
+    estado = estado_compartido.EstadoCompartido(str(ruta))
+    estado.secreto("webhook")
+
+    # Guarda el secreto de los webhooks: ni el directorio ni la base son legibles por otros usuarios
+    assert (ruta.parent.stat().st_mode & 0o777) == 0o700
+    for archivo in ruta.parent.iterdir():
+        assert (archivo.stat().st_mode & 0o777) == 0o600, archivo.name
+
+    # Una base anterior con permisos abiertos se restringe al abrirla
+    ruta.chmod(0o644)
+    estado_compartido.EstadoCompartido(str(ruta))
+    assert (ruta.stat().st_mode & 0o777) == 0o600
+
+
+def test_directorio_por_defecto_propio_del_usuario(tmp_path, monkeypatch):
+    monkeypatch.setattr(estado_compartido.tempfile, "tempdir", str(tmp_path))
+
+    directorio = estado_compartido.directorio_por_defecto()
+
+    assert directorio == str(tmp_path / f"transcriptor-{os.getuid()}")
+    assert (os.stat(directorio).st_mode & 0o777) == 0o700
+
+
+def test_importar_la_app_no_crea_el_estado(tmp_path):
+    ruta = tmp_path / "estado.sqlite3"
+    subprocess.run(
+        [sys.executable, "-c", "import app"], cwd=DIRECTORIO_SRC,
+        env=dict(os.environ, RUTA_ESTADO_COMPARTIDO=str(ruta)), check=True, timeout=60,
+    )
+    assert not ruta.exists()
+
+
+def test_importar_la_app_no_carga_estado_sesiones_indice_ni_exportaciones():
+    cargados = subprocess.run(
+        [sys.executable, "-c", "import sys, app; print(' '.join(sys.modules))"], cwd=DIRECTORIO_SRC,
+        env=os.environ.copy(), capture_output=True, text=True, check=True, timeout=60,
+    ).stdout.split()
+    for modulo in ("estado_compartido", "trabajos", "tiempo_real", "almacen", "exportacion", "analitica", "sqlite3"):
+        assert modulo not in cargados
+
+
+def _trabajo_activo(estado, id_trabajo: str, proceso: str, actualizado: float) -> None:
+    trabajo = trabajos.Trabajo("largo.mp3", id_trabajo)
+    trabajo.estado = trabajos.ESTADO_PROCESANDO
+    trabajo.actualizado = actualizado
+    fila = trabajo.a_fila()
+    fila["proceso"] = proceso
+    estado.guardar_trabajo(fila)
+
+
+def test_solo_vencen_los_trabajos_de_procesos_sin_latido(tmp_path):
+    estado = estado_compartido.EstadoCompartido(str(tmp_path / "estado.sqlite3"))
+    hace_dos_horas = time.time() - 7200
+    # Ambos llevan más que el TTL sin cambios; solo el dueño del primero sigue vivo
+    _trabajo_activo(estado, "vivo", "maquina:1", hace_dos_horas)
+    _trabajo_activo(estado, "huerfano", "maquina:2", hace_dos_horas)
+    estado.latido_proceso("maquina:1")
+    estado.latido_proceso("maquina:2")
+    with estado._conexion() as con:
+        con.execute("UPDATE procesos SET latido = ? WHERE proceso = 'maquina:2'", (time.time() - 120,))
+    gestor = trabajos.GestorTrabajos(ttl_segundos=3600, estado=estado)
+
+    gestor._purgar_compartidos()
+
+    assert estado.obtener_trabajo("vivo")["estado"] == trabajos.ESTADO_PROCESANDO
+    assert estado.obtener_trabajo("huerfano")["estado"] == trabajos.ESTADO_ERROR
+    # Un proceso que nunca latió tampoco atiende sus trabajos
+    _trabajo_activo(estado, "sin_latido", "maquina:3", time.time())
+    assert estado.vencer_trabajos(time.time() - 60, trabajos._ESTADOS_ACTIVOS, "maquina:1", "perdido") == 1
+
+
+def test_el_dueno_late_mientras_tiene_trabajos_activos(tmp_path, monkeypatch):
+    monkeypatch.setattr(trabajos, "_INTERVALO_LATIDO", 0)
+    estado = estado_compartido.EstadoCompartido(str(tmp_path / "estado.sqlite3"))
+    gestor = trabajos.GestorTrabajos(estado=estado, intervalo_avisos=0.01)
+    liberar = threading.Event()
+
+    trabajo = gestor.enviar(lambda: liberar.wait(5) and {"texto": "", "formatos": []})
+    try:
+        latidos = set()
+        fin = time.time() + 5
+        while len(latidos) < 3 and time.time() < fin:
+            fila = estado._conexion().execute(
+                "SELECT latido FROM procesos WHERE proceso = ?", (estado_compartido.proceso_actual(),),
+            ).fetchone()
+            latidos.add(fila[0])
+            time.sleep(0.02)
+        assert len(latidos) >= 3
+    finally:
+        liberar.set()
+    while not trabajo.terminado:
+        time.sleep(0.01)
+
+
+def _metricas_de_proceso(estado, proceso: str, errores: int, hace: float) -> None:
+    contador = metricas.ERRORES.vacia()
+    contador.incrementar(errores, origen="trabajo")
+    estado.publicar_metricas(proceso, {contador.nombre: contador.instantanea()})
+    with estado._conexion() as con:
+        con.execute("UPDATE metricas SET actualizado = ? WHERE proceso = ?", (time.time() - hace, proceso))
+
+
+def test_metricas_de_procesos_terminados_en_una_fila(tmp_path):
+    estado = estado_compartido.EstadoCompartido(str(tmp_path / "estado.sqlite3"))
+    # Workers reciclados por gunicorn (no publican desde hace una hora) y uno vivo
+    _metricas_de_proceso(estado, "maquina:1", 3, 3600)
+    _metricas_de_proceso(estado, "maquina:2", 4, 3600)
+    _metricas_de_proceso(estado, "maquina:3", 5, 1)
+    total = metricas.exportar(estado.metricas())
+
+    assert estado.plegar_metricas(time.time() - 600, metricas.sumar_instantaneas) == 2
+    assert len(estado.metricas()) == 2
+    assert metricas.exportar(estado.metricas()) == total
+
+    # El siguiente en terminar se suma a la misma fila
+    _metricas_de_proceso(estado, "maquina:3", 5, 3600)
+    assert estado.plegar_metricas(time.time() - 600, metricas.sumar_instantaneas) == 1
+    assert len(estado.metricas()) == 1
+    assert metricas.exportar(estado.metricas()) == total
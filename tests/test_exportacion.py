@@ -0,0 +1,111 @@
+"""
+Exportación en una pasada a txt, srt, vtt y json.
+"""
+import io
+import json
+
+import pytest
+
+import exportacion
+from modelos import Palabra, Segmento, TranscripcionLocal
+
+
+def _frase(texto: str, inicio: int, hablante: str, ms_por_palabra: int = 300) -> Segmento:
+    palabras = [
+        Palabra(t, inicio + i * ms_por_palabra, inicio + (i + 1) * ms_por_palabra - 50, 0.9, hablante)
+        for i, t in enumerate(texto.split())
+    ]
+    return Segmento(hablante, texto, palabras[0].start, palabras[-1].end, 0.9, palabras)
+
+
+def _conversacion() -> TranscripcionLocal:
+    utterances = [
+        _frase("Hola a todos.", 0, "A"),
+        _frase("¿Empezamos <ya> con R&D?", 1000, "B"),
+    ]
+    texto = " ".join(u.text for u in utterances)
+    return TranscripcionLocal(texto, utterances, [p for u in utterances for p in u.words], "es", 2.5, "t1")
+
+
+def _exportar(transcripcion, formatos=exportacion.FORMATOS, **kwargs) -> dict[str, str]:
+    archivos = {f: io.StringIO() for f in formatos}
+    kwargs.setdefault("texto", transcripcion.text)
+    exportacion.exportar(transcripcion, archivos, **kwargs)
+    return {f: a.getvalue() for f, a in archivos.items()}
+
+
+def test_leer_formatos():
+    assert exportacion.leer_formatos(" SRT, vtt,,srt ,json") == ["srt", "vtt", "json"]
+    with pytest.raises(ValueError, match="docx"):
+        exportacion.leer_formatos("txt,docx")
+
+
+def test_txt_con_una_linea_por_turno():
+    salida = _exportar(_conversacion(), ["txt"], con_speakers=True, mapa_nombres={"A": "Ana"})
+
+    assert salida["txt"] == "Ana: Hola a todos.\nSpeaker B: ¿Empezamos <ya> con R&D?"
+    # Sin hablantes, el texto ya formateado tal cual
+    assert _exportar(_conversacion(), ["txt"], texto="  formateado\n")["txt"] == "  formateado\n"
+
+
+def test_srt_y_vtt_con_hablantes():
+    salida = _exportar(_conversacion(), ["srt", "vtt"], con_speakers=True, mapa_nombres={"A": "Ana"})
+
+    assert salida["srt"] == (
+        "1\n00:00:00,000 --> 00:00:00,850\nAna: Hola a todos.\n\n"
+        "2\n00:00:01,000 --> 00:00:02,150\nSpeaker B: ¿Empezamos <ya> con R&D?\n\n"
+    )
+    assert salida["vtt"] == (
+        "WEBVTT\n\n"
+        "00:00:00.000 --> 00:00:00.850\n<v Ana>Hola a todos.\n\n"
+        "00:00:01.000 --> 00:00:02.150\n<v Speaker B>¿Empezamos &lt;ya&gt; con R&amp;D?\n\n"
+    )
+
+
+def test_json_con_segmentos_palabras_y_hablantes():
+    datos = json.loads(_exportar(_conversacion(), ["json"], tipo="diálogo", mapa_nombres={"A": "Ana"})["json"])
+
+    assert (datos["id"], datos["idioma"], datos["duracion_audio"], datos["tipo"]) == ("t1", "es", 2.5, "diálogo")
+    assert datos["texto"] == "Hola a todos. ¿Empezamos <ya> con R&D?"
+    assert datos["hablantes"] == {"A": "Ana", "B": "Speaker B"}
+    primero = datos["segmentos"][0]
+    assert (primero["hablante"], primero["etiqueta"], primero["inicio"], primero["fin"]) == ("Ana", "A", 0, 850)
+    assert primero["palabras"][1] == {"texto": "a", "inicio": 300, "fin": 550, "confianza": 0.9}
+
+
+def test_cues_cortados_por_longitud_duracion_y_oracion():
+    # Dos líneas de 42 caracteres como máximo por cue
+    largas = _frase(" ".join(["palabra"] * 30), 0, "A", ms_por_palabra=100)
+    # Más de 6 s en un cue
+    lentas = _frase("uno dos tres cuatro", 10_000, "A", ms_por_palabra=2500)
+    # Fin de oración con el cue ya a media línea
+    oraciones = _frase("Esta oración ya es bastante larga. Sigue otra", 30_000, "A")
+
+    for segmento in (largas, lentas, oraciones):
+        cues = list(exportacion._cues(segmento.words))
+        assert all(len(texto) <= 2 * exportacion.MAX_CARACTERES_LINEA for _, _, texto in cues)
+        assert all(fin - inicio <= exportacion.MAX_DURACION_CUE_MS for inicio, fin, _ in cues)
+        assert " ".join(texto for _, _, texto in cues) == segmento.text
+    assert [t for _, _, t in exportacion._cues(oraciones.words)] == ["Esta oración ya es bastante larga.", "Sigue otra"]
+    # Cada cue de más de una línea se parte en el espacio más cercano a la mitad
+    assert exportacion._partir_en_lineas("palabra " * 7 + "fin") == "palabra palabra palabra palabra\npalabra palabra palabra fin"
+
+
+def test_sin_palabras_ni_utterances_reparte_el_tiempo():
+    transcripcion = TranscripcionLocal("uno dos tres cuatro", audio_duration=4.0)
+
+    salida = _exportar(transcripcion, ["srt", "json"], con_speakers=True)
+
+    assert salida["srt"] == "1\n00:00:00,000 --> 00:00:04,000\nuno dos tres cuatro\n\n"
+    segmento = json.loads(salida["json"])["segmentos"][0]
+    assert (segmento["hablante"], segmento["inicio"], segmento["fin"], segmento["palabras"]) == (None, 0, 4000, [])
+
+
+def test_exportar_a_rutas(tmp_path):
+    rutas = {f: str(tmp_path / f"t.{f}") for f in exportacion.FORMATOS}
+
+    hablantes = exportacion.exportar_a_rutas(_conversacion(), rutas, texto="texto", con_speakers=True)
+
+    assert hablantes == {"A", "B"}
+    assert (tmp_path / "t.txt").read_text(encoding="utf-8").startswith("Speaker A: Hola a todos.")
+    assert json.loads((tmp_path / "t.json").read_text(encoding="utf-8"))["hablantes"] == {"A": "Speaker A", "B": "Speaker B"}
@@ -0,0 +1,79 @@
+"""
+Formateadores de letras y diálogo por trozos frente a los originales de texto completo.
+"""
+import random
+
+import pytest
+
+import benchmark
+import transcribe
+
+
+_CASOS = (
+    ("letras", benchmark._letras_referencia, transcribe.formatear_letras_incremental),
+    ("diálogo", benchmark._dialogo_referencia, transcribe.formatear_dialogo_incremental),
+)
+
+_BORDES = (
+    " ",
+    "\n\n\n",
+    "  primer verso\nsegundo verso\n\n\n\ntercera estrofa  \n  \n",
+    "Hola.\r\nQué tal?\r\n\r\nBien!",
+    "¿Sí?¡No!. Fin...   y más\tcosas\n\nseparadas",
+    "palabra" * 30 + " corta. " + "otra" * 25,
+)
+
+
+def _aleatorios(cantidad: int, semilla: int = 5) -> list[str]:
+    azar = random.Random(semilla)
+    alfabeto = "ab cd.\n\n?! ,\tÉ"
+    return ["".join(azar.choice(alfabeto) for _ in range(azar.randint(1, 300))) for _ in range(cantidad)]
+
+
+def _por_trozos(generador, texto: str, tamano: int) -> str:
+    return "\n".join(generador(transcribe.trozos_de_texto(texto, tamano)))
+
+
+@pytest.mark.parametrize("nombre, referencia, generador", _CASOS, ids=[c[0] for c in _CASOS])
+def test_misma_salida_con_cualquier_corte_en_trozos(nombre, referencia, generador):
+    for texto in _BORDES + tuple(_aleatorios(300)):
+        esperado = referencia(texto)
+        for tamano in (1, 2, 3, 7, 64):
+            assert _por_trozos(generador, texto, tamano) == esperado, (repr(texto), tamano)
+
+
+@pytest.mark.parametrize("tipo", ["diálogo", "canción"])
+def test_textos_largos_igual_que_el_original(tipo):
+    texto = benchmark.texto_sintetico(200 * 1024, tipo)
+
+    assert transcribe._format_as_lyrics(texto) == benchmark._letras_referencia(texto)
+    assert transcribe._format_as_dialogue(texto) == benchmark._dialogo_referencia(texto)
+
+
+def test_oracion_sin_puntuacion_mas_larga_que_el_umbral(monkeypatch):
+    # Se envuelve por partes en lugar de retener la oración entera
+    monkeypatch.setattr(transcribe, "_UMBRAL_ORACION_DIALOGO", 200)
+    azar = random.Random(1)
+    texto = " ".join(azar.choice(["a", "bb", "ccc", "palabra", "x" * 90]) for _ in range(3000))
+
+    for tamano in (5, 97, 1024):
+        assert _por_trozos(transcribe.formatear_dialogo_incremental, texto, tamano) == benchmark._dialogo_referencia(texto)
+
+
+def test_las_lineas_salen_antes_de_terminar_la_entrada():
+    leidos = []
+
+    def _trozos():
+        for trozo in ("Primera oración completa. ", "Segunda", " a medias"):
+            leidos.append(trozo)
+            yield trozo
+
+    lineas = transcribe.formatear_dialogo_incremental(_trozos())
+
+    assert next(lineas) == "Primera oración completa."
+    assert leidos == ["Primera oración completa. "]
+    assert list(lineas) == ["Segunda a medias"]
+
+
+def test_texto_vacio_sin_cambios():
+    assert transcribe._format_as_lyrics("") == "" and transcribe._format_as_dialogue("") == ""
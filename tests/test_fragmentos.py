@@ -0,0 +1,121 @@
+"""
+Transcripción por fragmentos: puntos de corte y unión sin duplicar el solapamiento.
+"""
+import math
+import shutil
+import struct
+import wave
+from types import SimpleNamespace
+
+import pytest
+
+import fragmentos
+import medios
+
+
+def _silencios_fijos(monkeypatch, silencios):
+    ventanas = []
+
+    def _detectar(_ruta, inicio, duracion):
+        ventanas.append((inicio, inicio + duracion))
+        return [(a, b) for a, b in silencios if inicio <= a and b <= inicio + duracion]
+
+    monkeypatch.setattr(medios, "detectar_silencios", _detectar)
+    return ventanas
+
+
+def test_sin_silencios_corta_en_el_punto_nominal(monkeypatch):
+    _silencios_fijos(monkeypatch, [])
+
+    assert fragmentos.planificar_cortes("a.mp3", 950, 300) == [0.0, 300, 600, 950]
+    # El último fragmento puede alargarse hasta un 25 % en lugar de quedar uno muy corto
+    assert fragmentos.planificar_cortes("a.mp3", 370, 300) == [0.0, 370]
+
+
+def test_corta_en_el_silencio_mas_cercano_dentro_de_la_ventana(monkeypatch):
+    ventanas = _silencios_fijos(monkeypatch, [(250, 252), (310, 311), (590, 600), (700, 702)])
+
+    cortes = fragmentos.planificar_cortes("a.mp3", 950, 300, ventana_busqueda=30)
+
+    # 310.5 está más cerca de 300 que 251; el silencio de 700 queda fuera de la ventana de 610
+    assert cortes == [0.0, 310.5, 595.0, 950]
+    assert ventanas[0] == (270, 330)
+
+
+def test_la_ventana_no_retrocede_mas_de_medio_fragmento(monkeypatch):
+    ventanas = _silencios_fijos(monkeypatch, [])
+
+    fragmentos.planificar_cortes("a.mp3", 100, 20, ventana_busqueda=30)
+
+    assert all(inicio >= corte + 10 for (inicio, _), corte in zip(ventanas, range(0, 100, 20)))
+
+
+def _palabras(*tramos):
+    # (texto, inicio_ms, fin_ms) relativos al fragmento
+    return [SimpleNamespace(text=t, start=i, end=f, confidence=0.9, speaker="A") for t, i, f in tramos]
+
+
+def test_union_sin_duplicar_el_solapamiento():
+    # Fragmento 1: 0-12 s (se conserva 0-10); fragmento 2: 8-20 s (se conserva 10-20)
+    primera = _palabras(("uno", 1000, 1500), ("dos", 8500, 9000), ("tres", 9800, 10400), ("cuatro", 11000, 11500))
+    segunda = _palabras(("dos", 500, 1000), ("tres", 1800, 2400), ("cuatro", 3000, 3500), ("cinco", 9000, 9500))
+    partes = [
+        (SimpleNamespace(words=primera, utterances=[SimpleNamespace(speaker="A", text="uno dos tres cuatro", start=1000, end=11500, words=primera)], language_code="es", text=""), 0.0, 0.0, 10.0),
+        (SimpleNamespace(words=segunda, utterances=[SimpleNamespace(speaker="B", text="dos tres cuatro cinco", start=500, end=9500, words=segunda)], language_code=None, text=""), 8.0, 10.0, 20.0),
+    ]
+
+    unida = fragmentos.unir_transcripciones(partes)
+
+    # "tres" cruza el corte: su punto medio (10.1 s) lo deja solo en el segundo fragmento
+    assert [(p.text, p.start, p.end) for p in unida.words] == [
+        ("uno", 1000, 1500), ("dos", 8500, 9000), ("tres", 9800, 10400), ("cuatro", 11000, 11500), ("cinco", 17000, 17500),
+    ]
+    assert [(u.speaker, u.text, u.start, u.end) for u in unida.utterances] == [
+        ("A", "uno dos", 1000, 9000), ("B", "tres cuatro cinco", 9800, 17500),
+    ]
+    assert unida.text == "uno dos tres cuatro cinco"
+    assert (unida.language_code, unida.audio_duration) == ("es", 20.0)
+
+
+def test_turnos_sin_palabras_se_asignan_por_su_punto_medio():
+    partes = [
+        (SimpleNamespace(words=None, utterances=[
+            SimpleNamespace(speaker="A", text="antes", start=0, end=4000, words=None),
+            SimpleNamespace(speaker="B", text="en el corte", start=9000, end=12000, words=None),
+        ]), 0.0, 0.0, 10.0),
+        (SimpleNamespace(words=None, utterances=[
+            SimpleNamespace(speaker="B", text="en el corte", start=1000, end=4000, words=None),
+        ]), 8.0, 10.0, 20.0),
+    ]
+
+    unida = fragmentos.unir_transcripciones(partes)
+
+    assert [(u.text, u.start, u.end) for u in unida.utterances] == [("antes", 0, 4000), ("en el corte", 9000, 12000)]
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="requiere ffmpeg")
+def test_fragmentos_reales_cortan_en_los_silencios(tmp_path):
+    # 30 s de tono con silencios de 1 s en torno a los 11 y los 19 s
+    ruta = tmp_path / "tono.wav"
+    tasa = 8000
+    muestras = (
+        0 if 10.5 <= n / tasa < 11.5 or 18.5 <= n / tasa < 19.5 else int(8000 * math.sin(2 * math.pi * 440 * n / tasa))
+        for n in range(30 * tasa)
+    )
+    with wave.open(str(ruta), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(tasa)
+        f.writeframes(b"".join(struct.pack("<h", m) for m in muestras))
+    duraciones = []
+
+    def _transcribir(fragmento):
+        duraciones.append(medios.duracion_segundos(fragmento))
+        return SimpleNamespace(words=[], utterances=[], text="x", language_code="es")
+
+    unida = fragmentos.transcribir_por_fragmentos(str(ruta), _transcribir, duracion_fragmento=10, solapamiento=1, concurrencia=2)
+
+    cortes = fragmentos.planificar_cortes(str(ruta), medios.duracion_segundos(str(ruta)), 10)
+    assert cortes[1] == pytest.approx(11, abs=0.1) and cortes[2] == pytest.approx(19, abs=0.1)
+    assert len(duraciones) == 3
+    assert unida.audio_duration == pytest.approx(30, abs=0.1)
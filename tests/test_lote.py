@@ -0,0 +1,95 @@
+"""
+Modo lote de la CLI: fuentes, nombres de salida y omisión de lo ya transcrito.
+"""
+import lote
+
+
+def _tocar(*rutas) -> None:
+    for ruta in rutas:
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        ruta.write_bytes(b"")
+
+
+def test_nombre_de_salida_sin_extension_aunque_haya_otro_medio_al_lado(tmp_path):
+    _tocar(tmp_path / "a.mp3", tmp_path / "a.wav")
+    fuente = str(tmp_path / "a.mp3")
+
+    # Fuera de un lote con ambos, el nombre de siempre
+    assert lote.rutas_salida(fuente, "diálogo") == {"txt": str(tmp_path / "a.transcripcion.diálogo.txt")}
+    _tocar(tmp_path / "a.transcripcion.diálogo.txt")
+    assert lote.ruta_salida_existente(fuente) == str(tmp_path / "a.transcripcion.diálogo.txt")
+
+
+def test_fuentes_del_lote_con_el_mismo_nombre_conservan_la_extension(tmp_path):
+    mp3, wav, otro = (str(tmp_path / n) for n in ("a.mp3", "a.wav", "b.mp3"))
+
+    assert lote.fuentes_con_base_repetida([mp3, wav, otro]) == {mp3, wav}
+    assert lote.fuentes_con_base_repetida([mp3, otro]) == set()
+    assert lote.rutas_salida(mp3, "diálogo", con_extension=True) == {"txt": f"{mp3}.transcripcion.diálogo.txt"}
+
+    # La salida de a.wav no cuenta como la de a.mp3
+    _tocar(tmp_path / "a.wav.transcripcion.diálogo.txt")
+    assert lote.ruta_salida_existente(mp3, con_extension=True) is None
+    assert lote.ruta_salida_existente(wav, con_extension=True) == f"{wav}.transcripcion.diálogo.txt"
+
+
+def test_expandir_directorios_patrones_y_duplicados(tmp_path, capsys):
+    _tocar(
+        tmp_path / "b.mp3", tmp_path / "a.wav", tmp_path / "notas.txt",
+        tmp_path / "sub" / "c.MP4", tmp_path / "sub" / "d.ogg",
+    )
+
+    fuentes = lote.expandir_fuentes([
+        str(tmp_path),
+        str(tmp_path / "sub" / "*.ogg"),  # ya incluido por el directorio
+        str(tmp_path / "no-existe.mp3"),
+    ])
+
+    # Recorrido recursivo y ordenado, solo medios, sin repetir
+    assert fuentes == [str(tmp_path / n) for n in ("a.wav", "b.mp3", "sub/c.MP4", "sub/d.ogg")]
+    assert "no-existe.mp3" in capsys.readouterr().err
+
+
+def test_manifiesto_relativo_a_su_directorio(tmp_path):
+    manifiesto = tmp_path / "lista.txt"
+    manifiesto.write_text("# reuniones\n\nlunes.mp3\n/abs/martes.mp3\n", encoding="utf-8")
+
+    assert lote.leer_manifiesto(str(manifiesto)) == [str(tmp_path / "lunes.mp3"), "/abs/martes.mp3"]
+
+
+def test_omite_solo_lo_que_tiene_todos_los_formatos(tmp_path, capsys):
+    _tocar(tmp_path / "hecho.mp3", tmp_path / "a_medias.mp3", tmp_path / "nuevo.mp3")
+    _tocar(tmp_path / "hecho.transcripcion.canción.txt", tmp_path / "hecho.transcripcion.canción.srt")
+    # Un formato de un tipo y otro de otro no es una transcripción completa
+    _tocar(tmp_path / "a_medias.transcripcion.diálogo.txt", tmp_path / "a_medias.transcripcion.canción.srt")
+    procesadas = []
+
+    resumen = lote.ejecutar_lote(
+        [str(tmp_path / n) for n in ("hecho.mp3", "a_medias.mp3", "nuevo.mp3")],
+        procesadas.append, concurrencia=2, formatos=["txt", "srt"],
+    )
+
+    assert sorted(procesadas) == [str(tmp_path / "a_medias.mp3"), str(tmp_path / "nuevo.mp3")]
+    assert (resumen["total"], resumen["omitidas"], resumen["correctas"], resumen["fallidas"]) == (3, 1, 2, 0)
+
+
+def test_lote_con_nombres_repetidos_no_se_omite_por_la_salida_del_otro(tmp_path):
+    _tocar(tmp_path / "a.mp3", tmp_path / "a.wav", tmp_path / "a.wav.transcripcion.diálogo.txt")
+    # Salida con el nombre sin extensión: ya no identifica a cuál de los dos pertenece
+    _tocar(tmp_path / "a.transcripcion.diálogo.txt")
+    procesadas = []
+
+    resumen = lote.ejecutar_lote([str(tmp_path / "a.mp3"), str(tmp_path / "a.wav")], procesadas.append)
+
+    assert procesadas == [str(tmp_path / "a.mp3")]
+    assert resumen["omitidas"] == 1
+
+
+def test_fallos_en_el_resumen(tmp_path):
+    def _procesar(fuente):
+        if fuente.endswith("malo.mp3"):
+            raise RuntimeError("audio corrupto")
+
+    resumen = lote.ejecutar_lote([str(tmp_path / "bueno.mp3"), str(tmp_path / "malo.mp3")], _procesar)
+
+    assert (resumen["correctas"], resumen["fallidas"]) == (1, 1)
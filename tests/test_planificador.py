@@ -0,0 +1,128 @@
+"""
+Reintentos con espera exponencial ante 429/5xx y contrapresión de la cola de admisión.
+"""
+import io
+
+import pytest
+
+import app as aplicacion
+import metricas
+import motores
+import planificador
+import trabajos
+
+
+class ErrorProveedor(Exception):
+    # Como TranscriptError del SDK: el código HTTP viaja en status_code
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def _falla_antes(veces: int, codigo: int):
+    llamadas = []
+
+    def _funcion():
+        llamadas.append(codigo)
+        if len(llamadas) <= veces:
+            raise ErrorProveedor(codigo)
+        return "ok"
+
+    return _funcion, llamadas
+
+
+def test_transcripcion_sobrevive_a_429_y_500_del_proveedor(proveedor, monkeypatch, tmp_path):
+    # Uno de cada dos envíos responde 429 y una de cada dos consultas de estado, 500
+    falso = proveedor(retardo=0.1, tasa_429=0.5, tasa_500=0.5)
+    plan = planificador.Planificador(tasa_por_segundo=0, max_reintentos=5, espera_base=0.01, espera_max=0.05)
+    monkeypatch.setattr(planificador, "_planificador_por_defecto", plan)
+    fuente = tmp_path / "audio.mp3"
+    fuente.write_bytes(b"\0" * 4096)
+    previos = metricas.REINTENTOS.valor()
+
+    transcripcion = motores.MotorAssemblyAI().transcribir(str(fuente), {})
+
+    assert transcripcion.text
+    assert falso.rechazos_429 >= 1 and falso.errores_500 >= 1
+    assert falso.envios == 1
+    assert metricas.REINTENTOS.valor() - previos == falso.rechazos_429 + falso.errores_500
+
+
+def test_espera_exponencial_acotada(monkeypatch):
+    esperas = []
+    monkeypatch.setattr(planificador.time, "sleep", esperas.append)
+    # Jitter completo: se fija en el máximo para ver la cota de cada intento
+    monkeypatch.setattr(planificador.random, "uniform", lambda _minimo, maximo: maximo)
+    plan = planificador.Planificador(tasa_por_segundo=0, max_reintentos=5, espera_base=0.1, espera_max=0.5)
+    funcion, llamadas = _falla_antes(4, 503)
+
+    assert plan.llamar(funcion) == "ok"
+    assert len(llamadas) == 5
+    assert esperas == pytest.approx([0.1, 0.2, 0.4, 0.5])
+
+
+def test_se_rinde_tras_max_reintentos(monkeypatch):
+    monkeypatch.setattr(planificador.time, "sleep", lambda _segundos: None)
+    plan = planificador.Planificador(tasa_por_segundo=0, max_reintentos=2, espera_base=0.01)
+    funcion, llamadas = _falla_antes(10, 429)
+
+    with pytest.raises(ErrorProveedor):
+        plan.llamar(funcion)
+    assert len(llamadas) == 3
+
+
+def test_post_no_idempotente_solo_reintenta_429(monkeypatch):
+    monkeypatch.setattr(planificador.time, "sleep", lambda _segundos: None)
+    plan = planificador.Planificador(tasa_por_segundo=0, max_reintentos=3, espera_base=0.01)
+
+    # Tras un 5xx el envío pudo quedar creado: repetirlo duplicaría la transcripción
+    funcion, llamadas = _falla_antes(1, 500)
+    with pytest.raises(ErrorProveedor):
+        plan.llamar(funcion, idempotente=False)
+    assert len(llamadas) == 1
+
+    funcion, llamadas = _falla_antes(1, 429)
+    assert plan.llamar(funcion, idempotente=False) == "ok"
+    assert len(llamadas) == 2
+
+
+def test_cola_llena_responde_429_con_retry_after(monkeypatch):
+    plan = planificador.Planificador(max_en_cola=1)
+    monkeypatch.setattr(aplicacion, "planificador", plan)
+    reserva = plan.reservar()
+    try:
+        respuesta = aplicacion.app.test_client().post(
+            "/transcribe/stream?nombre=a.mp3", data=b"\0" * 1024, headers={"Accept": "application/json"},
+        )
+    finally:
+        plan.liberar(reserva)
+
+    assert respuesta.status_code == 429
+    assert int(respuesta.headers["Retry-After"]) >= 1
+    assert "error" in respuesta.get_json()
+    # La plaza rechazada no quedó ocupada
+    assert plan.ocupadas == 0
+
+
+def test_fallo_al_encolar_libera_la_plaza_y_los_temporales(monkeypatch, tmp_path):
+    plan = planificador.Planificador(max_en_cola=1)
+    monkeypatch.setattr(aplicacion, "planificador", plan)
+    monkeypatch.setattr(aplicacion.tempfile, "tempdir", str(tmp_path))
+
+    def _fallar(*_args, **_kwargs):
+        raise RuntimeError("pool cerrado")
+
+    monkeypatch.setattr(trabajos.gestor_por_defecto(), "enviar", _fallar)
+    media_previa = plan._duracion_media
+
+    respuesta = aplicacion.app.test_client().post(
+        "/transcribe", data={"file": (io.BytesIO(b"\0" * 1024), "a.mp3"), "idioma": "es"},
+        content_type="multipart/form-data",
+    )
+
+    assert respuesta.status_code == 500
+    # Ni el archivo subido ni el directorio de exportaciones quedan en disco
+    assert list(tmp_path.iterdir()) == []
+    assert plan.ocupadas == 0
+    # La plaza se libera con su reserva: cuenta para la estimación de Retry-After
+    assert plan._duracion_media != media_previa
@@ -0,0 +1,91 @@
+"""
+Sesión en vivo contra el streaming falso: los turnos en curso llegan como
+"parcial" y cada fin de turno formateado como un único "final".
+"""
+import pytest
+
+from conftest import puerto_libre
+
+import proveedor_falso
+import tiempo_real
+
+
+# Audio que el servidor falso convierte en una palabra dictada
+_BYTES_POR_PALABRA = proveedor_falso._BYTES_POR_PALABRA
+
+
+@pytest.fixture
+def streaming_falso(monkeypatch):
+    puerto = puerto_libre()
+    servidor = proveedor_falso.servir_tiempo_real(puerto)
+    monkeypatch.setattr(tiempo_real, "URL_TIEMPO_REAL", f"ws://127.0.0.1:{puerto}")
+    yield
+    servidor.shutdown()
+
+
+@pytest.fixture
+def sesion(streaming_falso):
+    sesion = tiempo_real.SesionTiempoReal(mapa_nombres={"A": "Ana"}, idioma="es", clave_api="falsa")
+    sesion.conectar()
+    return sesion
+
+
+def _enviar_palabras(sesion, palabras: int) -> None:
+    audio = b"\0" * (palabras * _BYTES_POR_PALABRA)
+    for inicio in range(0, len(audio), tiempo_real.BYTES_POR_TRAMA):
+        sesion.enviar(audio[inicio:inicio + tiempo_real.BYTES_POR_TRAMA])
+
+
+def _eventos_hasta_fin(sesion) -> list[dict]:
+    eventos = []
+    for evento in sesion.eventos(espera=10):
+        assert evento is not None, "La sesión no terminó"
+        eventos.append(evento)
+    return eventos
+
+
+def test_parciales_y_finales_por_turno(sesion):
+    primera, segunda = proveedor_falso._FRASES[0], proveedor_falso._FRASES[1]
+    # La primera frase completa (cierra el turno de A) y dos palabras de la segunda
+    _enviar_palabras(sesion, len(primera.split()) + 2)
+    sesion.terminar()
+    eventos = _eventos_hasta_fin(sesion)
+
+    tipos = [e["tipo"] for e in eventos]
+    assert tipos[-1] == "fin"
+    finales = [e for e in eventos if e["tipo"] == "final"]
+    # Con format_turns el fin de turno llega dos veces; solo el formateado es "final"
+    assert len(finales) == 2
+    assert tipos.index("final") > tipos.index("parcial")
+
+    ana, otro = finales
+    assert ana["texto"] == primera
+    assert (ana["etiqueta"], ana["hablante"]) == ("A", "Ana")
+    assert ana["lineas"]
+    assert ana["inicio"] == 0 and ana["fin"] > ana["inicio"]
+    # Sin nombre en el mapa, la etiqueta del proveedor
+    assert otro["texto"] == segunda
+    assert (otro["etiqueta"], otro["hablante"]) == ("B", "Speaker B")
+
+    parciales = [e for e in eventos[:tipos.index("final")] if e["tipo"] == "parcial"]
+    assert all(p["hablante"] == "Ana" for p in parciales)
+    # Cada parcial reemplaza al anterior: el texto del turno crece
+    assert len(parciales[-1]["texto"]) > len(parciales[0]["texto"])
+
+
+def test_sesiones_terminadas_no_ocupan_plaza(streaming_falso, monkeypatch):
+    gestor = tiempo_real.GestorSesionesTiempoReal(max_sesiones=1)
+    primera = gestor.crear(clave_api="falsa")
+    # Termina por su cuenta (fin del audio o cierre del proveedor), sin pasar por el gestor
+    primera.terminar()
+
+    segunda = gestor.crear(clave_api="falsa")
+    with pytest.raises(tiempo_real.ColaLlenaError):
+        gestor.crear(clave_api="falsa")
+
+    # Pasado el margen para los lectores, la terminada se descarta
+    monkeypatch.setattr(tiempo_real, "_SEGUNDOS_TRAS_FIN", 0)
+    assert gestor._purgar() == [primera]
+    assert gestor.obtener(primera.id) is None
+    assert gestor.obtener(segunda.id) is segunda
+    gestor.terminar(segunda.id)
@@ -0,0 +1,55 @@
+"""
+Trabajos web completados por webhook: el proveedor avisa con la firma HMAC del
+trabajo y la app solo entonces descarga la transcripción (sin sondeo).
+"""
+import time
+
+from conftest import servir_en_hilo
+
+import app as aplicacion
+
+
+def _esperar_trabajo(cliente, id_trabajo: str, limite: float = 20) -> dict:
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        datos = cliente.get(f"/jobs/{id_trabajo}", headers={"Accept": "application/json"}).get_json()
+        if datos["estado"] in ("completado", "error"):
+            return datos
+        time.sleep(0.05)
+    raise AssertionError(f"El trabajo {id_trabajo} no terminó en {limite} s")
+
+
+def test_trabajo_se_completa_con_el_webhook_firmado(proveedor, monkeypatch):
+    falso = proveedor(retardo=0.2)
+    servidor, url_app = servir_en_hilo(aplicacion.app)
+    monkeypatch.setattr(aplicacion, "URL_PUBLICA_WEBHOOK", url_app)
+    cliente = aplicacion.app.test_client()
+    try:
+        respuesta = cliente.post(
+            "/transcribe/stream?nombre=reunion.mp3&idioma=es", data=b"\0" * 4096,
+            headers={"Accept": "application/json"},
+        )
+        assert respuesta.status_code == 202
+        datos = _esperar_trabajo(cliente, respuesta.get_json()["id"])
+    finally:
+        servidor.shutdown()
+
+    assert datos["estado"] == "completado"
+    assert falso.webhooks_entregados == 1 and falso.webhooks_fallidos == 0
+    # Una sola consulta: la que sigue al webhook
+    assert falso.consultas == 1
+
+
+def test_webhook_con_firma_incorrecta_se_rechaza():
+    cliente = aplicacion.app.test_client()
+    url = "/webhooks/assemblyai/trabajo-1"
+    aviso = {"transcript_id": "remoto-1", "status": "completed"}
+
+    sin_firma = cliente.post(url, json=aviso)
+    firma_ajena = cliente.post(url, json=aviso, headers={aplicacion.CABECERA_WEBHOOK: aplicacion._firma_webhook("otro")})
+    # Con la firma correcta pasa la verificación; el trabajo no existe
+    firmado = cliente.post(url, json=aviso, headers={aplicacion.CABECERA_WEBHOOK: aplicacion._firma_webhook("trabajo-1")})
+
+    assert sin_firma.status_code == 403
+    assert firma_ajena.status_code == 403
+    assert firmado.status_code == 404